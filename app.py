@@ -1,37 +1,59 @@
 import os
+import time
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 gi.require_version('Gst', '1.0')
 from gi.repository import Gtk, Adw, GLib, Gio, Gst, GdkPixbuf
 
-from player import AudioPlayer
+# Only what the first frame needs is imported here. MPRIS, notifications and
+# the background jobs start once the window is on screen, and the spectrum
+# analyzer, loudness analysis and duplicate search are imported on first use.
+import tracing
+from player import AudioPlayer, CrossfadePlayer
 from ui.player_controls import PlayerControls
 from ui.file_list import FileList
-from ui.spectrum_analyzer import SpectrumAnalyzer
-from utils import extract_album_art, save_setting, load_setting
-from mpris import MPRISInterface
+from utils import save_setting, load_setting
+from metadata_cache import get_metadata_cache
+from library import LibraryIndexer
+from prefetch import Prefetcher
+
+# Number of upcoming tracks whose files and metadata are prefetched
+PREFETCH_TRACKS = 2
+
+# Prefetching starts halfway through a track, or this many seconds before its end
+PREFETCH_LEAD_SECONDS = 30
 
 class FolderAudioPlayerApp(Adw.Application):
     """Main application class for the Folder Audio Player."""
 
-    def __init__(self):
+    def __init__(self, start_time=None):
+        """
+        Initialize the application.
+
+        Args:
+            start_time: time.perf_counter() value at process start, used to
+                        report the time to the first frame
+        """
         super().__init__(application_id="dev.ivan-larionov.FolderAudioPlayer",
                          flags=Gio.ApplicationFlags.FLAGS_NONE)
 
-        # Initialize GStreamer
-        if not Gst.is_initialized():
-            Gst.init(None)
+        self.start_time = start_time if start_time is not None else time.perf_counter()
 
         self.connect("activate", self.on_activate)
+        self.connect("shutdown", self.on_shutdown)
 
         # Initialize state variables
         # Use GNOME music folder as default, fallback to home directory if not available
         music_dir = GLib.get_user_special_dir(GLib.UserDirectory.DIRECTORY_MUSIC)
         if music_dir and os.path.exists(music_dir):
             self.current_folder = music_dir
+            self.library_indexer = LibraryIndexer(
+                music_dir, sniff=load_setting("sniff_audio_content", False))
         else:
             self.current_folder = GLib.get_home_dir()
+            # Don't index the whole home directory
+            self.library_indexer = None
         self.current_file = None
         self.current_track_index = -1
         self.current_track_title = "No song selected"
@@ -45,17 +67,36 @@ class FolderAudioPlayerApp(Adw.Application):
         # Spectrum analyzer state
         self.spectrum_enabled = load_setting("spectrum_enabled", True)
 
-        # Create the audio player
-        self.player = AudioPlayer()
+        # Create the audio player; it initializes GStreamer
+        self.player = self.create_player()
         self.player.set_on_message_callback(self.on_player_message)
-
-        # Initialize MPRIS interface
-        self.mpris = MPRISInterface(self.get_application_id(), self)
-
-        # Set up notification actions
-        self.create_notification_actions()
+        self.player.set_seeked_callback(self.on_seeked)
+
+        # Warms the caches for the next tracks partway through the current one
+        self.prefetcher = Prefetcher(loaded_callback=self.on_track_prefetched)
+        self.prefetch_started = False
+
+        # Created after the first frame, see on_first_frame
+        self.mpris = None
+        # Created the first time it is shown, see show_spectrum
+        self.spectrum_analyzer = None
+
+    def create_player(self):
+        """Create a crossfading player if a crossfade length is set, a gapless one otherwise."""
+        replaygain_mode = load_setting("replaygain_mode", "track")
+        low_latency = load_setting("low_latency_switch", True)
+        crossfade_seconds = load_setting("crossfade_seconds", 0.0)
+        if crossfade_seconds > 0:
+            try:
+                return CrossfadePlayer(replaygain_mode=replaygain_mode, overlap=crossfade_seconds,
+                                       low_latency=low_latency)
+            except ValueError as e:
+                print(f"Crossfade not available, playing gaplessly: {e}")
+        return AudioPlayer(replaygain_mode=replaygain_mode, low_latency=low_latency)
 
     def on_activate(self, app):
+        activate_time = time.perf_counter()
+
         # Create the main window
         self.win = Adw.ApplicationWindow(application=app)
         self.win.set_default_size(900, 600)
@@ -75,6 +116,21 @@ class FolderAudioPlayerApp(Adw.Application):
         self.spectrum_toggle_button.connect("toggled", self.on_spectrum_toggle)
         header.pack_end(self.spectrum_toggle_button)
 
+        # Measure the loudness of the current folder for ReplayGain
+        self.replaygain_analyzer = None
+        self.analyze_button = Gtk.Button()
+        self.analyze_button.set_icon_name("audio-volume-high-symbolic")
+        self.analyze_button.set_tooltip_text("Analyze Loudness")
+        self.analyze_button.connect("clicked", self.on_analyze_clicked)
+        header.pack_end(self.analyze_button)
+
+        # Find files with the same audio across the library
+        duplicates_button = Gtk.Button()
+        duplicates_button.set_icon_name("edit-copy-symbolic")
+        duplicates_button.set_tooltip_text("Find Duplicates")
+        duplicates_button.connect("clicked", self.on_find_duplicates_clicked)
+        header.pack_end(duplicates_button)
+
         main_box.append(header)
 
         # Create the content area
@@ -94,11 +150,6 @@ class FolderAudioPlayerApp(Adw.Application):
         )
         self.player_controls.set_vexpand(False)
 
-        # Spectrum analyzer
-        self.spectrum_analyzer = SpectrumAnalyzer()
-        # Initially hide the analyzer since nothing is playing
-        self.spectrum_analyzer.hide_analyzer()
-
         # Set the initial state of the spectrum toggle button
         self.spectrum_toggle_button.set_active(self.spectrum_enabled)
 
@@ -109,21 +160,118 @@ class FolderAudioPlayerApp(Adw.Application):
         # Bottom row: File list
         self.file_list = FileList()
         self.file_list.set_file_activated_callback(self.on_file_activated)
+        self.file_list.set_playlist_changed_callback(self.on_playlist_changed)
         self.file_list.set_vexpand(True)
 
-        # Add components to the content box
+        # Add components to the content box; the spectrum analyzer goes
+        # between the two once it is shown
+        self.content_box = content_box
         content_box.append(self.player_controls)
-        content_box.append(self.spectrum_analyzer)
         content_box.append(self.file_list)
 
         main_box.append(content_box)
 
         self.win.set_content(main_box)
+
+        # Everything else waits until the window has been painted once
+        frame_clock_handler = None
+
+        def on_after_paint(frame_clock):
+            frame_clock.disconnect(frame_clock_handler)
+            self.on_first_frame(activate_time)
+
+        def on_realize(window):
+            nonlocal frame_clock_handler
+            frame_clock = window.get_frame_clock()
+            frame_clock_handler = frame_clock.connect("after-paint", on_after_paint)
+
+        self.win.connect("realize", on_realize)
         self.win.present()
 
+    def on_first_frame(self, activate_time):
+        """Report the startup time and start everything the first frame didn't need."""
+        now = time.perf_counter()
+        print(f"Startup: first frame after {(now - self.start_time) * 1000:.0f} ms "
+              f"({(activate_time - self.start_time) * 1000:.0f} ms to activate, "
+              f"{(now - activate_time) * 1000:.0f} ms to build and paint the window)")
+
         # Initialize the file list with the current folder
         self.file_list.update_file_list(self.current_folder)
 
+        # Playback controls in the desktop shell
+        from mpris import MPRISInterface
+        self.mpris = MPRISInterface(self.get_application_id(), self)
+        self.create_notification_actions()
+
+        # Bring the library catalog up to date in the background
+        if self.library_indexer:
+            self.library_indexer.index_in_background(self.on_library_indexed)
+
+    def on_shutdown(self, app):
+        """Stop background work before the application exits."""
+        from discoverer import shutdown_duration_prober
+
+        if hasattr(self, 'file_list'):
+            self.file_list.scanner.shutdown()
+        shutdown_duration_prober()
+        self.prefetcher.shutdown()
+        if self.library_indexer:
+            self.library_indexer.cancel()
+        if getattr(self, 'replaygain_analyzer', None):
+            self.replaygain_analyzer.cancel()
+
+    def on_analyze_clicked(self, button):
+        """Measure ReplayGain values for the library, or the current folder, in the background."""
+        if self.replaygain_analyzer is not None:
+            return
+        # The library's albums are analyzed in parallel, one per core; tracks
+        # the indexer hasn't reached yet are left for the next run
+        if self.library_indexer:
+            root, recursive = self.library_indexer.root, True
+        else:
+            root, recursive = self.file_list.current_folder, False
+        if not root:
+            return
+
+        from replaygain import ReplayGainAnalyzer
+        self.replaygain_analyzer = ReplayGainAnalyzer(
+            write_tags=load_setting("replaygain_write_tags", False))
+        button.set_sensitive(False)
+        self.replaygain_analyzer.analyze_in_background(root, self.on_loudness_analyzed,
+                                                       recursive=recursive)
+
+    def on_find_duplicates_clicked(self, button):
+        """Open a window listing duplicates in the library, or the current folder tree."""
+        if self.library_indexer:
+            root = self.library_indexer.root
+        else:
+            root = self.file_list.current_folder
+        if not root:
+            return
+
+        from ui.duplicates_window import DuplicatesWindow
+        window = DuplicatesWindow(self.win, root, self.on_duplicates_removed)
+        window.present()
+
+    def on_duplicates_removed(self, paths):
+        """Drop duplicates moved to the trash from the file list."""
+        for path in paths:
+            self.file_list.remove_file(path)
+
+    def on_loudness_analyzed(self, stats):
+        """Report the result of a loudness analysis run."""
+        print(f"Loudness analyzed: {stats.tracks} tracks in {stats.albums} albums "
+              f"({stats.skipped} already known, {stats.failed} failed) in {stats.seconds:.1f}s")
+        self.replaygain_analyzer = None
+        self.analyze_button.set_sensitive(True)
+        return False
+
+    def on_library_indexed(self, stats):
+        """Report the result of a library indexing run."""
+        print(f"Library indexed: {stats.directories} directories "
+              f"({stats.unchanged} unchanged), {stats.tracks} tracks checked, "
+              f"{stats.removed} removed in {stats.seconds:.1f}s")
+        return False
 
     def on_file_activated(self, file_path, file_type):
         """Handle file activation."""
@@ -133,11 +281,34 @@ class FolderAudioPlayerApp(Adw.Application):
         elif file_type == "Audio":
             self.play_audio_file(file_path)
 
+    def on_playlist_changed(self, old_playlist):
+        """Keep the current track index and shuffle order in sync when files come and go."""
+        import random
+
+        playlist = self.file_list.get_playlist()
+        if self.current_file:
+            self.current_track_index = self.file_list.get_track_index(self.current_file)
+
+        if self.shuffle_enabled and self.shuffle_indices:
+            # Keep the existing shuffle order for tracks that are still there
+            new_indices = {path: i for i, path in enumerate(playlist)}
+            order = [new_indices[old_playlist[i]] for i in self.shuffle_indices
+                     if i < len(old_playlist) and old_playlist[i] in new_indices]
+
+            # New tracks are shuffled in after the existing ones
+            known = set(order)
+            added = [i for i in range(len(playlist)) if i not in known]
+            random.shuffle(added)
+            self.shuffle_indices = order + added
+
+        # The track after the current one may have come or gone
+        self._queue_next_track()
+
+        # Update MPRIS properties
+        self.update_mpris()
+
     def play_audio_file(self, file_path):
         """Play an audio file."""
-        self.current_file = file_path
-        file_name = os.path.basename(file_path)
-
         # Find the index of this file in the playlist
         self.current_track_index = self.file_list.get_track_index(file_path)
 
@@ -145,6 +316,55 @@ class FolderAudioPlayerApp(Adw.Application):
         if self.shuffle_enabled and self.current_track_index >= 0:
             self._generate_shuffle_indices()
 
+        track, playlist_info = self._show_current_track(file_path)
+
+        # Start playing, with the loudness measured for the track if its tags have none
+        if track is not None:
+            self.player.play(file_path, track.track_gain, track.album_gain)
+        else:
+            self.player.play(file_path)
+        self.player_controls.update_play_button_state(True)
+
+        # Start updating the progress bar
+        self.player.set_progress_update_callback(self.update_progress)
+
+        # Show and start the spectrum analyzer animation if enabled
+        if self.spectrum_enabled:
+            self.show_spectrum()
+
+        # Update notification
+        self.update_notification()
+
+        # Update MPRIS properties
+        self.update_mpris()
+
+        # Line up the following track so it starts without a gap
+        self._queue_next_track()
+
+        print(f"Playing: {file_path} ({playlist_info})")
+
+    def on_gapless_track_started(self, file_path):
+        """Follow a queued track that the player continued with at the end of the last one."""
+        self.current_track_index = self.file_list.get_track_index(file_path)
+        track, playlist_info = self._show_current_track(file_path)
+
+        # The pipeline kept playing; only what shows the track changes
+        self.update_notification()
+        self.update_mpris()
+        self._queue_next_track()
+
+        print(f"Playing next track without a gap: {file_path} ({playlist_info})")
+
+    def _show_current_track(self, file_path):
+        """
+        Show a track as the current one in the player controls and the file list.
+
+        Returns:
+            A (CachedTrack or None, playlist info text) tuple
+        """
+        self.current_file = file_path
+        file_name = os.path.basename(file_path)
+
         # Update the UI
         folder_name = os.path.basename(self.current_folder)
         track_info = f"From: {folder_name}"
@@ -158,33 +378,47 @@ class FolderAudioPlayerApp(Adw.Application):
 
         self.player_controls.update_track_info(file_name, track_info)
 
-        # Extract and display album art if available
-        album_art = extract_album_art(file_path, 128)  # Use higher resolution for player controls
+        # Extract and display album art if available, prefetched while the
+        # previous track played if it was up next
+        prefetched = self.prefetcher.take(file_path)
+        if prefetched is not None:
+            track, album_art = prefetched
+        else:
+            metadata_cache = get_metadata_cache()
+            track = metadata_cache.get_track(file_path)
+            album_art = metadata_cache.get_cover_pixbuf(track, 128)  # Use higher resolution for player controls
         self.current_album_art = album_art
         self.player_controls.update_album_art(album_art)
 
         # Update the file list to highlight the currently playing file
         self.file_list.set_currently_playing(file_path)
 
-        # Start playing
-        self.player.play(file_path)
-        self.player_controls.update_play_button_state(True)
+        return track, playlist_info
 
-        # Start updating the progress bar
-        self.player.set_progress_update_callback(self.update_progress)
+    def _queue_next_track(self):
+        """Tell the player which track follows the current one, in playback order."""
+        # The upcoming tracks may have changed; prefetch again once it's time
+        self.prefetcher.cancel()
+        self.prefetch_started = False
 
-        # Show and start the spectrum analyzer animation if enabled
-        if self.spectrum_enabled:
-            self.spectrum_analyzer.show_analyzer()
-            self.spectrum_analyzer.start_animation()
-
-        # Update notification
-        self.update_notification()
+        playlist = self.file_list.get_playlist()
+        next_index = self._get_next_index() if playlist and self.current_file else None
+        if next_index is None or not 0 <= next_index < len(playlist):
+            self.player.set_next_track(None)
+            return
 
-        # Update MPRIS properties
-        self.mpris.update_properties()
+        # Probing the file here would stall the UI. Use the row the scanner
+        # already loaded; otherwise on_track_prefetched fills in the gains.
+        file_path = playlist[next_index]
+        track = self.file_list.get_cached_track(file_path)
+        if track is not None:
+            self.player.set_next_track(file_path, track.track_gain, track.album_gain)
+        else:
+            self.player.set_next_track(file_path)
 
-        print(f"Playing: {file_path} ({playlist_info})")
+    def on_track_prefetched(self, file_path, track):
+        """Give the player the ReplayGain of an upcoming track once it's loaded."""
+        self.player.update_next_track_gain(file_path, track.track_gain, track.album_gain)
 
     def update_progress(self):
         """Update the progress bar."""
@@ -197,6 +431,12 @@ class FolderAudioPlayerApp(Adw.Application):
         if duration > 0:
             self.player_controls.update_progress(position, duration)
 
+            # Partway through the track, warm the caches for the next ones
+            if (not self.prefetch_started and
+                    (position >= duration / 2 or duration - position <= PREFETCH_LEAD_SECONDS)):
+                self.prefetch_started = True
+                self.prefetcher.prefetch(self._get_upcoming_paths(PREFETCH_TRACKS))
+
         return True
 
     def on_player_message(self, bus, message):
@@ -209,22 +449,23 @@ class FolderAudioPlayerApp(Adw.Application):
             print(f"Error: {err}, {debug}")
             self.player_controls.update_play_button_state(False)
             # Stop spectrum analyzer animation and hide it
-            self.spectrum_analyzer.stop_animation()
-            self.spectrum_analyzer.hide_analyzer()
+            self.hide_spectrum()
             # Update notification to reflect stopped state
             self.update_notification()
 
             # Update MPRIS properties
-            self.mpris.update_properties()
+            self.update_mpris()
 
         elif t == Gst.MessageType.EOS:
             # End of stream, play the next track
             print("End of stream, playing next track")
+            tracing.begin("eos_to_next_track", "player")
             # Reset the current player state
             self.player.stop()
             self.player_controls.update_play_button_state(False)
             # Stop spectrum analyzer animation temporarily
-            self.spectrum_analyzer.stop_animation()
+            if self.spectrum_analyzer:
+                self.spectrum_analyzer.stop_animation()
 
             # Play the next track if there's a playlist
             playlist = self.file_list.get_playlist()
@@ -233,12 +474,23 @@ class FolderAudioPlayerApp(Adw.Application):
                 self.on_next_clicked()
             else:
                 # If no next track, hide the analyzer and update notification
-                self.spectrum_analyzer.stop_animation()
-                self.spectrum_analyzer.hide_analyzer()
+                tracing.end("eos_to_next_track", "player")
+                self.hide_spectrum()
                 self.update_notification()
 
                 # Update MPRIS properties
-                self.mpris.update_properties()
+                self.update_mpris()
+
+        elif t == Gst.MessageType.STREAM_START:
+            # The next track's data has reached the sinks
+            tracing.end("eos_to_next_track", "player")
+
+            # A track queued in about-to-finish has started; the pipeline
+            # was never stopped, so only the UI follows it
+            file_path = self.player.take_started_track()
+            if file_path is not None:
+                tracing.end("about_to_finish_to_stream_start", "player")
+                self.on_gapless_track_started(file_path)
 
     def on_play_clicked(self):
         """Handle play/pause button click."""
@@ -253,19 +505,17 @@ class FolderAudioPlayerApp(Adw.Application):
                     self.player.set_progress_update_callback(self.update_progress)
                     # Show and start spectrum analyzer animation if enabled
                     if self.spectrum_enabled:
-                        self.spectrum_analyzer.show_analyzer()
-                        self.spectrum_analyzer.start_animation()
+                        self.show_spectrum()
                 else:
                     print(f"Paused: {self.current_file}")
                     # Stop spectrum analyzer animation and hide it
-                    self.spectrum_analyzer.stop_animation()
-                    self.spectrum_analyzer.hide_analyzer()
+                    self.hide_spectrum()
 
                 # Update notification with new playback state
                 self.update_notification()
 
                 # Update MPRIS properties
-                self.mpris.update_properties()
+                self.update_mpris()
 
     def on_prev_clicked(self):
         """Play the previous track in the playlist."""
@@ -310,50 +560,79 @@ class FolderAudioPlayerApp(Adw.Application):
         if not playlist:
             return
 
+        next_index = self._get_next_index()
+        if next_index is None:
+            # Current track not in shuffle order, regenerate shuffle indices
+            self._generate_shuffle_indices()
+            if not self.shuffle_indices:
+                return
+            next_index = self.shuffle_indices[0]
+        self.current_track_index = next_index
+        self.play_audio_file(playlist[next_index])
+
+        print(f"Playing next track: {self.current_track_index + 1} of {len(playlist)}")
+
+    def _get_next_index(self, index=None):
+        """
+        Get the playlist index of the track after the current one, in shuffle
+        order if shuffle is on, wrapping around at the end.
+
+        Args:
+            index: Playlist index to start from instead of the current track's
+
+        Returns:
+            The index, or None if the track isn't in the shuffle order
+        """
+        if index is None:
+            index = self.current_track_index
+
         if self.shuffle_enabled and self.shuffle_indices:
-            # Find the current position in the shuffle order
             try:
-                current_pos = self.shuffle_indices.index(self.current_track_index)
-                if current_pos < len(self.shuffle_indices) - 1:
-                    # Go to next track in shuffle order
-                    next_index = self.shuffle_indices[current_pos + 1]
-                else:
-                    # Wrap around to the first track in shuffle order
-                    next_index = self.shuffle_indices[0]
-                self.current_track_index = next_index
-                self.play_audio_file(playlist[next_index])
+                current_pos = self.shuffle_indices.index(index)
             except ValueError:
-                # Current track not in shuffle order, regenerate shuffle indices
-                self._generate_shuffle_indices()
-                if self.shuffle_indices:
-                    self.current_track_index = self.shuffle_indices[0]
-                    self.play_audio_file(playlist[self.current_track_index])
-        else:
-            # Normal sequential playback
-            if self.current_track_index < len(playlist) - 1:
-                # Go to next track
-                self.current_track_index += 1
-                self.play_audio_file(playlist[self.current_track_index])
-            else:
-                # Wrap around to the first track
-                self.current_track_index = 0
-                self.play_audio_file(playlist[self.current_track_index])
+                return None
+            # Wrap around to the first track in shuffle order
+            return self.shuffle_indices[(current_pos + 1) % len(self.shuffle_indices)]
 
-        print(f"Playing next track: {self.current_track_index + 1} of {len(playlist)}")
+        # Normal sequential playback, wrapping around to the first track
+        if index < len(self.file_list.get_playlist()) - 1:
+            return index + 1
+        return 0
 
-    def on_progress_changed(self, value):
-        """Handle progress bar change to seek in the audio file."""
+    def _get_upcoming_paths(self, count):
+        """Get the paths of up to count tracks after the current one, in playback order."""
+        playlist = self.file_list.get_playlist()
+        paths = []
+        index = self.current_track_index
+        while len(paths) < min(count, len(playlist) - 1):
+            index = self._get_next_index(index)
+            if index is None or not 0 <= index < len(playlist):
+                break
+            paths.append(playlist[index])
+        return paths
+
+    def on_progress_changed(self, value, scrubbing=False):
+        """Handle progress bar change to seek in the audio file.
+
+        Args:
+            value: Position to seek to in seconds
+            scrubbing: Whether the slider is being dragged; seeks then go to
+                       the nearest keyframe, and the release seeks accurately
+        """
         if not self.player.playing or not self.current_file:
             return False
 
-        # Seek to the new position
-        self.player.seek(value)
+        # Seek to the new position; the player coalesces seeks while one is in flight
+        self.player.seek(value, accurate=not scrubbing)
+        return True
 
+    def on_seeked(self, position):
+        """Handle a completed seek."""
         # Emit the Seeked signal for MPRIS
-        self.mpris.emit_seeked(value)
+        if self.mpris:
+            self.mpris.emit_seeked(position)
 
-        print(f"Seeking to {value:.2f} seconds")
-        return True
+        print(f"Seeked to {position:.2f} seconds")
 
     def on_shuffle_toggled(self, is_shuffled):
         """Handle shuffle button toggle."""
@@ -370,6 +649,9 @@ class FolderAudioPlayerApp(Adw.Application):
             self.shuffle_indices = []
             print("Shuffle disabled")
 
+        # The track after the current one changed
+        self._queue_next_track()
+
     def on_trash_clicked(self):
         """Handle trash button click to delete the currently playing file."""
         if not self.current_file:
@@ -415,8 +697,7 @@ class FolderAudioPlayerApp(Adw.Application):
         # Stop playback
         self.player.stop()
         # Stop spectrum analyzer animation and hide it
-        self.spectrum_analyzer.stop_animation()
-        self.spectrum_analyzer.hide_analyzer()
+        self.hide_spectrum()
 
         # Get the next track to play after deletion
         next_track = None
@@ -450,8 +731,8 @@ class FolderAudioPlayerApp(Adw.Application):
             os.remove(self.current_file)
             print(f"Deleted file: {self.current_file}")
 
-            # Update the file list to reflect the deletion
-            self.file_list.update_file_list(self.current_folder)
+            # Remove the row right away instead of rescanning the folder
+            self.file_list.remove_file(self.current_file)
 
             # Play the next track if available
             if next_track and os.path.exists(next_track):
@@ -470,7 +751,7 @@ class FolderAudioPlayerApp(Adw.Application):
                 self.update_notification()
 
                 # Update MPRIS properties
-                self.mpris.update_properties()
+                self.update_mpris()
         except Exception as e:
             # Show error dialog if deletion fails
             error_dialog = Gtk.MessageDialog(
@@ -542,14 +823,32 @@ class FolderAudioPlayerApp(Adw.Application):
         # If music is playing, show/hide the analyzer based on the toggle state
         if self.player.playing:
             if self.spectrum_enabled:
-                self.spectrum_analyzer.show_analyzer()
-                self.spectrum_analyzer.start_animation()
+                self.show_spectrum()
             else:
-                self.spectrum_analyzer.stop_animation()
-                self.spectrum_analyzer.hide_analyzer()
+                self.hide_spectrum()
 
         print(f"Spectrum analyzer {'enabled' if self.spectrum_enabled else 'disabled'}")
 
+    def show_spectrum(self):
+        """Show and animate the spectrum analyzer, creating it on first use."""
+        if self.spectrum_analyzer is None:
+            from ui.spectrum_analyzer import SpectrumAnalyzer
+            self.spectrum_analyzer = SpectrumAnalyzer()
+            self.content_box.insert_child_after(self.spectrum_analyzer, self.player_controls)
+        self.spectrum_analyzer.show_analyzer()
+        self.spectrum_analyzer.start_animation()
+
+    def hide_spectrum(self):
+        """Stop and hide the spectrum analyzer, if it was ever shown."""
+        if self.spectrum_analyzer is not None:
+            self.spectrum_analyzer.stop_animation()
+            self.spectrum_analyzer.hide_analyzer()
+
+    def update_mpris(self):
+        """Update the MPRIS properties, once the interface has been set up."""
+        if self.mpris:
+            self.mpris.update_properties()
+
     def update_notification(self):
         """Update the notification with current track information and controls."""
         if not self.current_file:
@@ -0,0 +1,205 @@
+import os
+import struct
+import threading
+
+try:
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    GST_AVAILABLE = True
+except (ImportError, ValueError):
+    GST_AVAILABLE = False
+
+# Used when the GStreamer registry cannot be read
+DEFAULT_EXTENSIONS = frozenset(['.mp3', '.wav', '.ogg', '.flac', '.m4a'])
+
+# Container formats that also hold video. Their typefinders claim video
+# extensions as well, so only these extensions are taken from them.
+CONTAINER_AUDIO_EXTENSIONS = {
+    "application/ogg": (".ogg", ".oga", ".opus", ".spx"),
+    "application/x-ape": (".ape",),
+    "video/quicktime": (".m4a", ".m4b"),
+    "video/x-ms-asf": (".wma",),
+    "video/x-matroska": (".mka",),
+}
+
+# Bytes read from the start of a file when sniffing its content
+SNIFF_SIZE = 64
+
+# ASF header object GUID, at the start of every WMA file
+ASF_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+
+
+class AudioFormats:
+    """
+    The audio formats that can be played with the installed GStreamer plugins.
+
+    Built once from the decoder, demuxer and typefinder factories in the
+    GStreamer registry: a format is playable if some element accepts its
+    media type, and its file extensions are the ones its typefinder claims.
+    Files can also be recognized by their first bytes, for files with a
+    missing or wrong extension.
+    """
+
+    def __init__(self):
+        """Read the playable formats from the GStreamer registry."""
+        self.media_types = set()   # Media types that can be played
+        self.extensions = set()    # Extensions of playable formats
+        self.mime_types = set()    # MIME types of playable formats
+        self.other_extensions = set()  # Extensions typefinders claim for other formats
+
+        if GST_AVAILABLE:
+            try:
+                self._read_registry()
+            except Exception as e:
+                print(f"Error reading GStreamer registry: {e}")
+
+        if not self.extensions:
+            self.extensions = set(DEFAULT_EXTENSIONS)
+        self.other_extensions -= self.extensions
+
+    def _read_registry(self):
+        """Collect media types and extensions from the registry's factories."""
+        if not Gst.is_initialized():
+            Gst.init(None)
+        registry = Gst.Registry.get()
+
+        # Media types accepted by audio decoders, and by demuxers for containers
+        decodable = set()
+        for factory in registry.get_feature_list(Gst.ElementFactory):
+            klass = factory.get_metadata("klass") or ""
+            if not ("Demuxer" in klass or ("Decoder" in klass and "Audio" in klass)):
+                continue
+            for template in factory.get_static_pad_templates():
+                if template.direction != Gst.PadDirection.SINK:
+                    continue
+                caps = template.get_caps()
+                if caps.is_any():
+                    continue
+                for index in range(caps.get_size()):
+                    decodable.add(caps.get_structure(index).get_name())
+
+        for typefinder in registry.get_feature_list(Gst.TypeFindFactory):
+            caps = typefinder.get_caps()
+            extensions = ["." + extension.lower()
+                          for extension in typefinder.get_extensions() or []]
+            if caps is None or caps.is_any() or caps.get_size() == 0:
+                self.other_extensions.update(extensions)
+                continue
+
+            media_type = caps.get_structure(0).get_name()
+            if media_type not in decodable:
+                self.other_extensions.update(extensions)
+            elif media_type in CONTAINER_AUDIO_EXTENSIONS:
+                self.media_types.add(media_type)
+                self.mime_types.add(media_type)
+                self.extensions.update(CONTAINER_AUDIO_EXTENSIONS[media_type])
+            elif media_type.startswith("audio/"):
+                self.media_types.add(media_type)
+                self.mime_types.add(media_type)
+                self.extensions.update(extensions)
+            else:
+                self.other_extensions.update(extensions)
+
+    def is_audio_file(self, filename):
+        """Check if a file name has the extension of a playable format."""
+        return os.path.splitext(filename)[1].lower() in self.extensions
+
+    def should_sniff(self, filename):
+        """Check if a file's content could be audio despite its extension.
+
+        Files whose extension belongs to a known non-audio format, such as
+        cover images and playlists, are not worth reading.
+        """
+        return os.path.splitext(filename)[1].lower() not in self.other_extensions
+
+    def sniff_file(self, file_path):
+        """Recognize a playable audio file from its first bytes.
+
+        Only the start of the file is read, plus the start of the audio data
+        for files that begin with an ID3v2 tag.
+
+        Returns:
+            The file's media type, or None if it is not playable audio
+        """
+        try:
+            with open(file_path, "rb") as f:
+                header = f.read(SNIFF_SIZE)
+                if header[:3] == b"ID3" and len(header) >= 10:
+                    # Skip the tag: its size is a 28 bit "syncsafe" integer
+                    size = 0
+                    for byte in header[6:10]:
+                        size = (size << 7) | (byte & 0x7f)
+                    footer = 10 if header[5] & 0x10 else 0
+                    f.seek(10 + size + footer)
+                    header = f.read(SNIFF_SIZE)
+                    # A tag followed by anything else is still most likely MPEG audio
+                    media_type = self.sniff(header) or "audio/mpeg"
+                    return media_type if media_type in self.media_types else None
+        except OSError as e:
+            print(f"Error reading file: {e}")
+            return None
+
+        return self.sniff(header)
+
+    def sniff(self, header):
+        """Recognize a playable audio format from the first bytes of a file.
+
+        Args:
+            header: At least the first SNIFF_SIZE bytes of the file
+
+        Returns:
+            The format's media type, or None if it is not playable audio
+        """
+        media_type = _match_magic(header)
+        if media_type in self.media_types:
+            return media_type
+        return None
+
+
+def _match_magic(header):
+    """Map the first bytes of a file to a media type, or None."""
+    if header[:4] == b"fLaC":
+        return "audio/x-flac"
+    if header[:4] == b"OggS":
+        return "application/ogg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "audio/x-wav"
+    if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "audio/x-aiff"
+    if header[4:8] == b"ftyp" and header[8:12] in (b"M4A ", b"M4B "):
+        return "audio/x-m4a"
+    if header[:4] == b"MAC ":
+        return "application/x-ape"
+    if header[:4] == b"wvpk":
+        return "audio/x-wavpack"
+    if header[:16] == ASF_GUID:
+        return "video/x-ms-asf"
+
+    if len(header) >= 4 and header[0] == 0xff and header[1] & 0xe0 == 0xe0:
+        (frame_header,) = struct.unpack(">I", header[:4])
+        layer = (frame_header >> 17) & 0x3
+        if layer == 0:
+            # AAC in ADTS frames, which GStreamer also calls audio/mpeg
+            if header[1] & 0xf6 == 0xf0:
+                return "audio/mpeg"
+            return None
+        version = (frame_header >> 19) & 0x3
+        bitrate_index = (frame_header >> 12) & 0xf
+        sample_rate_index = (frame_header >> 10) & 0x3
+        if version != 1 and bitrate_index != 0xf and sample_rate_index != 0x3:
+            return "audio/mpeg"
+    return None
+
+
+_formats = None
+_formats_lock = threading.Lock()
+
+def get_audio_formats():
+    """Get the shared AudioFormats instance, reading the registry on first use."""
+    global _formats
+    if _formats is None:
+        with _formats_lock:
+            if _formats is None:
+                _formats = AudioFormats()
+    return _formats
@@ -0,0 +1,2 @@
+# Performance benchmarks. Run the modules with `python -m benchmarks.<name>`
+# from the repository root; results are printed as JSON.
@@ -0,0 +1,118 @@
+"""Measure decode time and peak memory for album art.
+
+Compares decoding a cover at full resolution and scaling it afterwards with
+decoding it directly at the target size (utils.load_cover_pixbuf). Each mode
+runs in its own process so the peak RSS numbers don't affect each other.
+
+Usage:
+    python -m benchmarks.cover_decode [--image-size 3000] [--target 128] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("full_then_scale", "decode_at_size")
+
+
+def make_cover(path, image_size):
+    """Write a square JPEG cover of the given size."""
+    import gi
+    gi.require_version('GdkPixbuf', '2.0')
+    from gi.repository import GdkPixbuf
+
+    pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, image_size, image_size)
+    pixbuf.fill(0x3584E4FF)
+    pixbuf.savev(path, "jpeg", ["quality"], ["90"])
+
+
+def decode_full_then_scale(image_data, size):
+    """Decode at full resolution, then scale (the previous behaviour)."""
+    from gi.repository import GdkPixbuf
+    from utils import scale_pixbuf
+
+    loader = GdkPixbuf.PixbufLoader()
+    loader.write(image_data)
+    loader.close()
+    return scale_pixbuf(loader.get_pixbuf(), size)
+
+
+def decode_at_size(image_data, size):
+    """Decode directly at the target size."""
+    from utils import load_cover_pixbuf
+    return load_cover_pixbuf(image_data, size)
+
+
+def peak_rss_kb():
+    """Get the peak resident set size of this process in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_mode(mode, path, size, repeat):
+    """Decode the cover repeatedly in this process and return the measurements."""
+    decode = decode_full_then_scale if mode == "full_then_scale" else decode_at_size
+    with open(path, "rb") as f:
+        image_data = f.read()
+
+    # Warm up imports and loader modules before taking the baseline
+    import utils  # noqa: F401
+    baseline_rss = peak_rss_kb()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pixbuf = decode(image_data, size)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "output_size": [pixbuf.get_width(), pixbuf.get_height()],
+        "decode_ms_min": min(timings) * 1000,
+        "decode_ms_mean": sum(timings) / len(timings) * 1000,
+        "peak_rss_delta_kb": peak_rss_kb() - baseline_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-size", type=int, default=3000, help="cover width and height in pixels")
+    parser.add_argument("--target", type=int, default=128, help="thumbnail size in pixels")
+    parser.add_argument("--repeat", type=int, default=5, help="decodes per mode")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path = args.child
+        print(json.dumps(run_mode(mode, path, args.target, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "cover.jpg")
+        make_cover(path, args.image_size)
+        cover_bytes = os.path.getsize(path)
+
+        results = []
+        for mode in MODES:
+            output = subprocess.check_output([
+                sys.executable, "-m", "benchmarks.cover_decode",
+                "--target", str(args.target), "--repeat", str(args.repeat),
+                "--child", mode, path,
+            ])
+            results.append(json.loads(output))
+
+    print(json.dumps({
+        "benchmark": "cover_decode",
+        "image_size": args.image_size,
+        "cover_bytes": cover_bytes,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Generate a synthetic library of tagged audio files for benchmarks.
+
+A short template file is encoded once per format with GStreamer's
+audiotestsrc, then copied and tagged with mutagen for every track, so
+generating thousands of files takes seconds. Tracks are grouped in albums
+of ten, each album with its own cover if covers are enabled.
+
+Usage:
+    python -m benchmarks.library_generator DIR [--count 1000] [--formats mp3,flac,m4a]
+                                               [--cover-size 1200] [--layout flat]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import Gst, GdkPixbuf
+
+from mutagen.id3 import ID3, TPE1, TALB, TIT2, TRCK, TPOS, APIC
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4, MP4Cover
+
+# Encoders tried for each format, in order of preference, and the muxer
+ENCODERS = {
+    "mp3": (["lamemp3enc"], None),
+    "flac": (["flacenc"], None),
+    "m4a": (["fdkaacenc", "avenc_aac", "voaacenc", "faac"], "mp4mux"),
+}
+
+TRACKS_PER_ALBUM = 10
+
+
+def encode_template(path, file_format, seconds=1.0):
+    """
+    Encode a short sine tone with audiotestsrc.
+
+    Returns:
+        True if an encoder for the format is installed and the file was written
+    """
+    if not Gst.is_initialized():
+        Gst.init(None)
+
+    encoders, muxer = ENCODERS[file_format]
+    encoder = next((name for name in encoders if Gst.ElementFactory.find(name)), None)
+    if encoder is None or (muxer and not Gst.ElementFactory.find(muxer)):
+        return False
+
+    buffers = max(1, int(seconds * 44100 / 1024))
+    description = (f"audiotestsrc num-buffers={buffers} samplesperbuffer=1024 wave=sine ! "
+                   f"audio/x-raw,rate=44100,channels=2 ! audioconvert ! {encoder} ! ")
+    if muxer:
+        description += f"{muxer} ! "
+    description += f'filesink location="{path}"'
+
+    pipeline = Gst.parse_launch(description)
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(
+        Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+    return message.type == Gst.MessageType.EOS
+
+
+def make_cover(size, seed):
+    """Encode a square JPEG cover whose bytes differ for every seed."""
+    pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, size, size)
+    pixbuf.fill(((seed * 2654435761) & 0xFFFFFF00) | 0xFF)
+    # Vary a strip of pixels as well, so even covers of the same color differ
+    band = pixbuf.new_subpixbuf(0, 0, size, max(1, size // 16))
+    band.fill(((seed * 40503) & 0xFFFFFF00) | 0xFF)
+    success, data = pixbuf.save_to_bufferv("jpeg", ["quality"], ["90"])
+    return data
+
+
+def tag_file(path, file_format, artist, album, title, track_number, disc_number, cover):
+    """Write tags, and the cover if given, with mutagen."""
+    if file_format == "mp3":
+        tags = ID3()
+        tags.add(TPE1(encoding=3, text=[artist]))
+        tags.add(TALB(encoding=3, text=[album]))
+        tags.add(TIT2(encoding=3, text=[title]))
+        tags.add(TRCK(encoding=3, text=[str(track_number)]))
+        tags.add(TPOS(encoding=3, text=[str(disc_number)]))
+        if cover:
+            tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=cover))
+        tags.save(path)
+    elif file_format == "flac":
+        audio = FLAC(path)
+        audio["artist"] = artist
+        audio["album"] = album
+        audio["title"] = title
+        audio["tracknumber"] = str(track_number)
+        audio["discnumber"] = str(disc_number)
+        if cover:
+            picture = Picture()
+            picture.type = 3
+            picture.mime = "image/jpeg"
+            picture.data = cover
+            audio.add_picture(picture)
+        audio.save()
+    else:
+        audio = MP4(path)
+        audio["©ART"] = [artist]
+        audio["©alb"] = [album]
+        audio["©nam"] = [title]
+        audio["trkn"] = [(track_number, TRACKS_PER_ALBUM)]
+        audio["disk"] = [(disc_number, 1)]
+        if cover:
+            audio["covr"] = [MP4Cover(cover, imageformat=MP4Cover.FORMAT_JPEG)]
+        audio.save()
+
+
+def generate_library(root, count, formats=("mp3", "flac", "m4a"), cover_size=None,
+                     layout="flat"):
+    """
+    Generate a library of tagged audio files.
+
+    Args:
+        root: Folder to write the files to
+        count: Number of files
+        formats: File formats, used round-robin. Formats without an
+                 installed encoder are left out.
+        cover_size: Width and height of the embedded covers, or None for no covers
+        layout: "flat" puts every file in root; "albums" makes a folder per
+                artist and album
+
+    Returns:
+        A dictionary describing the generated library
+    """
+    os.makedirs(root, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        templates = {}
+        for file_format in formats:
+            path = os.path.join(temp_dir, f"template.{file_format}")
+            if encode_template(path, file_format):
+                templates[file_format] = path
+        if not templates:
+            raise RuntimeError("no GStreamer encoder found for any of the formats")
+
+        formats = [file_format for file_format in formats if file_format in templates]
+        cover = None
+        for index in range(count):
+            album_index, track_index = divmod(index, TRACKS_PER_ALBUM)
+            artist = f"Artist {album_index // 3 + 1}"
+            album = f"Album {album_index + 1}"
+            title = f"Track {track_index + 1} of {album}"
+            file_format = formats[index % len(formats)]
+
+            if cover_size and track_index == 0:
+                cover = make_cover(cover_size, album_index)
+
+            folder = root if layout == "flat" else os.path.join(root, artist, album)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"{index + 1:05d} - {title}.{file_format}")
+            shutil.copyfile(templates[file_format], path)
+            tag_file(path, file_format, artist, album, title, track_index + 1, 1, cover)
+
+    return {
+        "root": root,
+        "files": count,
+        "formats": formats,
+        "cover_size": cover_size,
+        "layout": layout,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="folder to generate the library in")
+    parser.add_argument("--count", type=int, default=1000, help="number of files")
+    parser.add_argument("--formats", default="mp3,flac,m4a", help="comma-separated formats")
+    parser.add_argument("--cover-size", type=int, default=0,
+                        help="embedded cover size in pixels (0 for no covers)")
+    parser.add_argument("--layout", choices=["flat", "albums"], default="flat")
+    args = parser.parse_args()
+
+    info = generate_library(args.root, args.count, args.formats.split(","),
+                            args.cover_size or None, args.layout)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
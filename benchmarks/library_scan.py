@@ -0,0 +1,285 @@
+"""Measure folder listing, tag probing and the metadata cache on synthetic libraries.
+
+For every library size, with and without large embedded covers, a library
+is generated with benchmarks.library_generator and then measured:
+
+- the tag and art helpers in utils, per file
+- cover decoding and scaling
+- probing every file through the metadata cache and indexing the library,
+  first with an empty cache (cold) and then with the cache filled (warm)
+- FileList.update_file_list until every row is listed and the visible rows
+  have their metadata, cold and warm (skipped without a display)
+
+Every measurement runs in its own process, with its own cache and config
+directories, so no run benefits from another's memory.
+
+Usage:
+    python -m benchmarks.library_scan [--sizes 100,1000,10000] [--cover-size 1200]
+                                      [--library-dir DIR] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Files timed per helper; the helpers are per file, so a sample is enough
+HELPER_SAMPLE = 200
+
+# Give up waiting for the file list after this many seconds
+FILE_LIST_TIMEOUT = 300
+
+
+def get_version():
+    """Get the package version from setup.py."""
+    with open(os.path.join(REPO_ROOT, "setup.py")) as f:
+        match = re.search(r'version="([^"]+)"', f.read())
+    return match.group(1) if match else None
+
+
+def list_audio_files(folder):
+    """List the audio files below a folder, sorted."""
+    paths = []
+    for folder_path, folders, files in os.walk(folder):
+        paths.extend(os.path.join(folder_path, name) for name in files)
+    return sorted(paths)
+
+
+def time_per_file(function, paths):
+    """Call function(path) for each path and return the mean and total in milliseconds."""
+    start = time.perf_counter()
+    for path in paths:
+        function(path)
+    total = time.perf_counter() - start
+    return {"mean_ms": total / len(paths) * 1000, "total_ms": total * 1000, "files": len(paths)}
+
+
+def run_helpers(folder):
+    """Time the tag and art helpers in utils."""
+    from utils import get_audio_metadata, extract_album_art, get_audio_duration, probe_track
+
+    paths = list_audio_files(folder)[:HELPER_SAMPLE]
+    return {
+        "get_audio_metadata": time_per_file(get_audio_metadata, paths),
+        "extract_album_art": time_per_file(extract_album_art, paths),
+        "get_audio_duration": time_per_file(get_audio_duration, paths),
+        "probe_track": time_per_file(probe_track, paths),
+    }
+
+
+def run_covers(folder):
+    """Time decoding covers at thumbnail sizes and scaling them down."""
+    from utils import probe_track, load_cover_pixbuf, scale_pixbuf
+
+    covers = []
+    for path in list_audio_files(folder):
+        cover_data = probe_track(path).cover_data
+        if cover_data:
+            covers.append(cover_data)
+        if len(covers) >= 20:
+            break
+    if not covers:
+        return {"skipped": "no covers"}
+
+    results = {"covers": len(covers), "cover_bytes": len(covers[0])}
+    for size in (32, 128):
+        start = time.perf_counter()
+        pixbufs = [load_cover_pixbuf(cover_data, size) for cover_data in covers]
+        results[f"decode_{size}_mean_ms"] = (time.perf_counter() - start) / len(covers) * 1000
+
+    start = time.perf_counter()
+    for pixbuf in pixbufs:
+        scale_pixbuf(pixbuf, 32)
+    results["scale_128_to_32_mean_ms"] = (time.perf_counter() - start) / len(pixbufs) * 1000
+    return results
+
+
+def run_cache(folder):
+    """Probe every file through the metadata cache, then index the library."""
+    from metadata_cache import get_metadata_cache
+    from library import LibraryIndexer
+
+    metadata_cache = get_metadata_cache()
+    paths = list_audio_files(folder)
+
+    start = time.perf_counter()
+    cached_tracks = {}
+    for folder_path in sorted({os.path.dirname(path) for path in paths}):
+        cached_tracks.update(metadata_cache.lookup_folder(folder_path))
+    for path in paths:
+        metadata_cache.get_track(path, cached=cached_tracks.get(path))
+    get_track_seconds = time.perf_counter() - start
+
+    stats = LibraryIndexer(folder, metadata_cache=metadata_cache).index()
+    return {
+        "files": len(paths),
+        "get_track_total_ms": get_track_seconds * 1000,
+        "get_track_mean_ms": get_track_seconds / len(paths) * 1000,
+        "index_ms": stats.seconds * 1000,
+        "index_unchanged_directories": stats.unchanged,
+    }
+
+
+def run_file_list(folder):
+    """Time FileList.update_file_list until the folder is listed and visible rows are filled."""
+    import gi
+    gi.require_version('Gtk', '4.0')
+    from gi.repository import Gtk, GLib
+
+    if not Gtk.init_check():
+        return {"skipped": "no display"}
+
+    from ui.file_list import FileList
+
+    expected = len(list_audio_files(folder))
+    file_list = FileList()
+    window = Gtk.Window()
+    window.set_default_size(900, 600)
+    window.set_child(file_list)
+    window.present()
+
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + FILE_LIST_TIMEOUT
+
+    def wait_until(condition):
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError("file list did not finish in time")
+            context.iteration(True)
+        return (time.perf_counter() - start) * 1000
+
+    def visible_rows_filled():
+        items = [row.item for row in file_list.bound_rows if row.item is not None]
+        return bool(items) and all(item.validated for item in items if item.kind == "audio")
+
+    start = time.perf_counter()
+    file_list.update_file_list(folder)
+    results = {
+        "first_rows_ms": wait_until(lambda: file_list.playlist),
+        "all_rows_ms": wait_until(lambda: len(file_list.playlist) >= expected),
+        "visible_rows_filled_ms": wait_until(visible_rows_filled),
+    }
+
+    file_list.scanner.shutdown()
+    window.destroy()
+    return results
+
+
+CHILD_MODES = {
+    "helpers": run_helpers,
+    "covers": run_covers,
+    "cache": run_cache,
+    "file_list": run_file_list,
+}
+
+
+def run_child(mode, folder, state_dir):
+    """Run one measurement in a fresh process with its own cache and config."""
+    environment = dict(os.environ,
+                       XDG_CACHE_HOME=os.path.join(state_dir, "cache"),
+                       XDG_CONFIG_HOME=os.path.join(state_dir, "config"))
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.library_scan", "--child", mode, folder],
+        cwd=REPO_ROOT, env=environment, stdout=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        return {"error": f"exited with status {process.returncode}"}
+    # Only the last line is the result; the app may print messages before it
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run_case(folder, files, cover_size):
+    """Measure one library."""
+    with tempfile.TemporaryDirectory() as state_dir:
+        cache = {"cold": run_child("cache", folder, state_dir)}
+        cache["warm"] = run_child("cache", folder, state_dir)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        file_list = {"cold": run_child("file_list", folder, state_dir)}
+        file_list["warm"] = run_child("file_list", folder, state_dir)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        helpers = run_child("helpers", folder, state_dir)
+        covers = run_child("covers", folder, state_dir) if cover_size else None
+
+    return {
+        "files": files,
+        "cover_size": cover_size,
+        "helpers": helpers,
+        "covers": covers,
+        "cache": cache,
+        "file_list": file_list,
+    }
+
+
+def get_environment():
+    """Describe the versions the results were measured with."""
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    import mutagen
+
+    return {
+        "version": get_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "gstreamer": Gst.version_string(),
+        "mutagen": mutagen.version_string,
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="comma-separated numbers of files per library")
+    parser.add_argument("--cover-size", type=int, default=1200,
+                        help="size of the large covers in pixels")
+    parser.add_argument("--formats", default="mp3,flac,m4a", help="comma-separated formats")
+    parser.add_argument("--library-dir",
+                        help="keep generated libraries here and reuse them on later runs")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, folder = args.child
+        print(json.dumps(CHILD_MODES[mode](folder)))
+        return
+
+    from benchmarks.library_generator import generate_library
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        library_dir = args.library_dir or temp_dir
+        results = []
+        for files in [int(size) for size in args.sizes.split(",")]:
+            for cover_size in (None, args.cover_size):
+                folder = os.path.join(library_dir, f"{files}-covers-{cover_size or 0}")
+                if not os.path.isdir(folder):
+                    # Generate next to the final folder so an interrupted run isn't reused
+                    start = time.perf_counter()
+                    generate_library(folder + ".partial", files, args.formats.split(","),
+                                     cover_size)
+                    os.rename(folder + ".partial", folder)
+                    print(f"Generated {folder} in {time.perf_counter() - start:.1f}s",
+                          file=sys.stderr)
+                results.append(run_case(folder, files, cover_size))
+
+    output = json.dumps({
+        "benchmark": "library_scan",
+        "environment": get_environment(),
+        "results": results,
+    }, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import list_directory, load_setting
+from metadata_cache import CachedTrack, get_metadata_cache
+
+# Fields written for every track; sort_name is internal to the cache
+RECORD_FIELDS = [field for field in CachedTrack._fields if field != 'sort_name']
+
+
+class RecordWriter:
+    """Writes track records to a stream as JSON Lines or CSV."""
+
+    def __init__(self, stream, output_format):
+        """
+        Initialize the writer.
+
+        Args:
+            stream: Text stream to write to
+            output_format: "jsonl", "csv" or "none"
+        """
+        self.stream = stream
+        self.output_format = output_format
+        self.csv_writer = None
+        if output_format == "csv":
+            self.csv_writer = csv.writer(stream)
+            self.csv_writer.writerow(RECORD_FIELDS)
+
+    def write(self, track):
+        """Write a CachedTrack record."""
+        if self.output_format == "jsonl":
+            record = {field: getattr(track, field) for field in RECORD_FIELDS}
+            record['duration_exact'] = bool(record['duration_exact'])
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif self.output_format == "csv":
+            self.csv_writer.writerow([getattr(track, field) for field in RECORD_FIELDS])
+
+    def flush(self):
+        """Push the records written so far to the reader."""
+        self.stream.flush()
+
+
+def _probe(path, cached, warm):
+    """Get a file's metadata through the cache on a worker thread."""
+    metadata_cache = get_metadata_cache()
+    track = metadata_cache.get_track(path, cached=cached)
+    if track is None or not warm:
+        return track
+
+    # Leave nothing for the UI to do: measure estimated durations and
+    # restore evicted thumbnails
+    if not track.duration_exact:
+        from discoverer import get_duration_prober
+        duration = get_duration_prober().discover_duration(path)
+        track = metadata_cache.store_duration(track, duration)
+    metadata_cache.get_cover_pixbuf(track)
+    return track
+
+
+def scan(root, writer, jobs, recursive=True, warm=False, sniff=False):
+    """
+    Probe every audio file below a folder and write a record for each.
+
+    Records are written as soon as each file is probed, so output starts
+    right away and memory use does not grow with the size of the library.
+
+    Args:
+        root: Folder to scan
+        writer: A RecordWriter
+        jobs: Number of files probed in parallel
+        recursive: Also scan subfolders
+        warm: Also measure estimated durations and write missing thumbnails
+        sniff: Also recognize audio files by content
+
+    Returns:
+        A (tracks written, files that failed) tuple
+    """
+    metadata_cache = get_metadata_cache()
+    sniffer = metadata_cache.sniff_files if sniff else None
+    written = failed = 0
+
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="scan") as executor:
+        pending = set()
+
+        def collect(return_when):
+            nonlocal pending, written, failed
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                try:
+                    track = future.result()
+                except Exception as e:
+                    print(f"Error probing track: {e}")
+                    track = None
+                if track is None:
+                    failed += 1
+                    continue
+                writer.write(track)
+                written += 1
+
+        folders_left = [root]
+        while folders_left:
+            folder_path = folders_left.pop()
+            try:
+                folders, audio_files = list_directory(folder_path, sniffer)
+            except OSError as e:
+                print(f"Error listing directory: {e}")
+                continue
+            if recursive:
+                # Visit subfolders in alphabetical order
+                folders_left.extend(path for name, path in reversed(folders))
+
+            # One query for everything the cache knows about the folder
+            cached_tracks = metadata_cache.lookup_folder(folder_path)
+            for name, path in audio_files:
+                pending.add(executor.submit(_probe, path, cached_tracks.get(path), warm))
+                # Keep a bounded number of files in flight
+                if len(pending) >= jobs * 4:
+                    collect(FIRST_COMPLETED)
+            writer.flush()
+
+        while pending:
+            collect(FIRST_COMPLETED)
+        writer.flush()
+
+    return written, failed
+
+
+def scan_main(argv):
+    """
+    Run the "scan" subcommand.
+
+    Args:
+        argv: Command line arguments after "scan"
+
+    Returns:
+        The process exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog="folder-audio-player scan",
+        description="Probe the audio files in a folder through the metadata cache "
+                    "and print a record per track.")
+    parser.add_argument("folder", help="folder to scan")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv", "none"], default="jsonl",
+                        help="output format (default: jsonl); none only fills the cache")
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="number of files probed in parallel")
+    parser.add_argument("--no-recursive", dest="recursive", action="store_false",
+                        help="only scan the folder itself, not its subfolders")
+    parser.add_argument("--warm", action="store_true",
+                        help="also measure estimated durations and write missing cover "
+                             "thumbnails, so the player has nothing left to probe")
+    parser.add_argument("--sniff", action="store_true",
+                        default=load_setting("sniff_audio_content", False),
+                        help="also recognize audio files with missing or wrong extensions")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"not a folder: {args.folder}")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    # Records go to stdout; the cache layer's error messages are sent to stderr
+    writer = RecordWriter(sys.stdout, args.format)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            written, failed = scan(os.path.abspath(args.folder), writer, args.jobs,
+                                   args.recursive, args.warm, args.sniff)
+    except BrokenPipeError:
+        # The reader went away, e.g. output piped into head. Point stdout at
+        # /dev/null so flushing it on exit doesn't fail again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except KeyboardInterrupt:
+        return 130
+
+    print(f"Scanned {written} tracks, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,136 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstPbutils', '1.0')
+gi.require_version('GLib', '2.0')
+from gi.repository import Gst, GstPbutils, GLib
+
+from metadata_cache import get_metadata_cache
+
+
+class DurationProber:
+    """
+    Measures durations mutagen could only estimate, using GStreamer's Discoverer.
+
+    Files are discovered on a small pool of worker threads, each with its
+    own Discoverer, so only a few files are decoded at a time. Every file
+    gets a fixed time to be discovered. Results are written to the metadata
+    cache, where the track is then marked exact and never discovered again
+    until the file changes.
+    """
+
+    def __init__(self, max_workers=2, timeout=5):
+        """
+        Initialize the prober.
+
+        Args:
+            max_workers: Number of files discovered at the same time
+            timeout: Seconds after which discovering a file is given up
+        """
+        if not Gst.is_initialized():
+            Gst.init(None)
+
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="duration-prober")
+
+        # Discoverers are not shared between threads
+        self.local = threading.local()
+
+        # Files queued or being discovered
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def probe(self, track, done_callback=None):
+        """
+        Measure a track's duration in the background.
+
+        Tracks whose duration is already exact and tracks that are already
+        queued are ignored.
+
+        Args:
+            track: A CachedTrack record
+            done_callback: Called as done_callback(track) on the GLib main loop
+                           with the updated CachedTrack record
+        """
+        if track.duration_exact:
+            return
+
+        with self.lock:
+            if track.path in self.pending:
+                return
+            self.pending.add(track.path)
+        self.executor.submit(self._probe, track, done_callback)
+
+    def shutdown(self):
+        """Stop the worker threads once the files being discovered are done."""
+        self.executor.shutdown(wait=False)
+
+    def _get_discoverer(self):
+        """Get the calling worker thread's Discoverer."""
+        discoverer = getattr(self.local, "discoverer", None)
+        if discoverer is None:
+            discoverer = GstPbutils.Discoverer.new(int(self.timeout * Gst.SECOND))
+            self.local.discoverer = discoverer
+        return discoverer
+
+    def _probe(self, track, done_callback):
+        """Discover a single file on a worker thread."""
+        try:
+            duration = self.discover_duration(track.path)
+            track = get_metadata_cache().store_duration(track, duration)
+        except Exception as e:
+            print(f"Error measuring duration of {track.path}: {e}")
+            return
+        finally:
+            with self.lock:
+                self.pending.discard(track.path)
+
+        if done_callback and duration is not None:
+            GLib.idle_add(done_callback, track)
+
+    def discover_duration(self, file_path):
+        """
+        Measure a file's duration, blocking until it is known.
+
+        Args:
+            file_path: Path to the audio file
+
+        Returns:
+            Duration in seconds, or None if the file could not be discovered
+            within the timeout
+        """
+        try:
+            info = self._get_discoverer().discover_uri(Gst.filename_to_uri(os.path.abspath(file_path)))
+        except GLib.Error as e:
+            print(f"Error discovering {file_path}: {e.message}")
+            return None
+
+        if info.get_result() != GstPbutils.DiscovererResult.OK:
+            return None
+
+        duration = info.get_duration()
+        if duration <= 0 or duration == Gst.CLOCK_TIME_NONE:
+            return None
+        return duration / Gst.SECOND
+
+
+_prober = None
+_prober_lock = threading.Lock()
+
+def get_duration_prober():
+    """Get the shared DurationProber instance, creating it on first use."""
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = DurationProber()
+    return _prober
+
+def shutdown_duration_prober():
+    """Stop the shared DurationProber, if it was ever started."""
+    if _prober is not None:
+        _prober.shutdown()
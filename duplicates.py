@@ -0,0 +1,403 @@
+import os
+import mmap
+import hashlib
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import is_audio_file
+
+# Files whose audio payloads are byte for byte identical. payload_size is
+# the number of payload bytes and digest their SHA-1.
+DuplicateGroup = namedtuple('DuplicateGroup', ['digest', 'payload_size', 'paths'])
+
+
+def _read_uint(data, byteorder="big"):
+    """Read an unsigned integer from a bytes object."""
+    return int.from_bytes(data, byteorder)
+
+
+def _skip_id3v2(mm, offset):
+    """Get the offset after an ID3v2 tag at offset, or offset if there is none."""
+    if mm[offset:offset + 3] != b"ID3" or len(mm) < offset + 10:
+        return offset
+    # The tag size is a 28 bit "syncsafe" integer
+    size = 0
+    for byte in mm[offset + 6:offset + 10]:
+        size = (size << 7) | (byte & 0x7f)
+    footer = 10 if mm[offset + 5] & 0x10 else 0
+    return min(offset + 10 + size + footer, len(mm))
+
+
+def _strip_trailing_tags(mm, start, end):
+    """Get the end of the data before any ID3v1, APEv2 and Lyrics3v2 tags."""
+    while end > start:
+        if end - start >= 128 and mm[end - 128:end - 125] == b"TAG":
+            tag_size = 128
+        elif end - start >= 32 and mm[end - 32:end - 24] == b"APETAGEX":
+            # The size covers the items and the footer; a header is extra
+            size = _read_uint(mm[end - 20:end - 16], "little")
+            flags = _read_uint(mm[end - 12:end - 8], "little")
+            if size < 32:
+                break  # Corrupt footer
+            tag_size = size + (32 if flags & 0x80000000 else 0)
+        elif end - start >= 15 and mm[end - 9:end] == b"LYRICS200":
+            length = mm[end - 15:end - 9]
+            if not length.isdigit():
+                break  # Corrupt size field
+            tag_size = int(length) + 15
+        else:
+            break
+
+        # A tag can't be larger than what is left; stop at a truncated one
+        if tag_size > end - start:
+            break
+        end -= tag_size
+    return end
+
+
+def _flac_audio_start(mm, offset):
+    """Get the offset of the first audio frame after FLAC's metadata blocks."""
+    offset += 4  # "fLaC"
+    while offset + 4 <= len(mm):
+        header = mm[offset]
+        offset += 4 + _read_uint(mm[offset + 1:offset + 4])
+        if header & 0x80:  # Last metadata block
+            break
+    return offset
+
+
+def _ogg_pages(mm, offset, end):
+    """Iterate over the (page offset, body offset, page end) of the Ogg pages in a range."""
+    while offset + 27 <= end and mm[offset:offset + 4] == b"OggS":
+        segments = mm[offset + 26]
+        body = offset + 27 + segments
+        page_end = body + sum(mm[offset + 27:body])
+        if page_end > end:
+            break
+        yield offset, body, page_end
+        offset = page_end
+
+
+def _ogg_audio_start(mm, offset, end):
+    """Get the offset of the first Ogg page after the codec's header packets.
+
+    The header packets include the Vorbis comment (or OpusTags) packet with
+    the tags and any embedded cover art. Every codec starts its audio on a
+    fresh page.
+    """
+    header_packets = None
+    packets = 0
+    for page, body, page_end in _ogg_pages(mm, offset, end):
+        if header_packets is None:
+            first_packet = mm[body:body + 9]
+            if first_packet[:7] == b"\x01vorbis":
+                header_packets = 3
+            elif first_packet[:8] == b"OpusHead":
+                header_packets = 2
+            elif first_packet[:5] == b"\x7fFLAC":
+                header_packets = 1 + _read_uint(first_packet[7:9])
+            else:
+                # Unknown codec, only skip pages that carry no audio position
+                header_packets = 0
+
+        if header_packets:
+            # A lacing value below 255 ends a packet
+            packets += sum(1 for lacing in mm[page + 27:body] if lacing < 255)
+            if packets >= header_packets:
+                return page_end
+        elif _read_uint(mm[page + 6:page + 14], "little") not in (0, 0xffffffffffffffff):
+            return page
+    return end
+
+
+def _mp4_audio_ranges(mm, offset, end):
+    """Get the ranges of the mdat boxes of an MP4 file; everything else is metadata."""
+    ranges = []
+    while offset + 8 <= end:
+        size = _read_uint(mm[offset:offset + 4])
+        box_type = mm[offset + 4:offset + 8]
+        header = 8
+        if size == 1:
+            size = _read_uint(mm[offset + 8:offset + 16])
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            break
+        if box_type == b"mdat":
+            ranges.append((offset + header, min(offset + size, end)))
+        offset += size
+    return ranges
+
+
+def _chunk_range(mm, offset, end, chunk_id, byteorder):
+    """Get the range of a RIFF or IFF chunk, or None if it is missing."""
+    while offset + 8 <= end:
+        size = _read_uint(mm[offset + 4:offset + 8], byteorder)
+        if mm[offset:offset + 4] == chunk_id:
+            return offset + 8, min(offset + 8 + size, end)
+        offset += 8 + size + (size & 1)  # Chunks are padded to an even size
+    return None
+
+
+def find_payload(mm):
+    """
+    Locate the audio payload of a file, skipping its metadata.
+
+    Args:
+        mm: The file's contents, typically a memory map
+
+    Returns:
+        A (ranges, paged) tuple. ranges is a list of (start, end) offsets of
+        the payload. If paged is True the payload is Ogg pages, and only
+        their bodies should be hashed, since page headers carry sequence
+        numbers that shift when the tags grow.
+    """
+    start = _skip_id3v2(mm, 0)
+    end = _strip_trailing_tags(mm, start, len(mm))
+    magic = mm[start:start + 12]
+
+    if magic[:4] == b"fLaC":
+        return [(_flac_audio_start(mm, start), end)], False
+    if magic[:4] == b"OggS":
+        return [(_ogg_audio_start(mm, start, end), end)], True
+    if magic[4:8] == b"ftyp":
+        ranges = _mp4_audio_ranges(mm, start, end)
+        if ranges:
+            return ranges, False
+    if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+        data = _chunk_range(mm, start + 12, end, b"data", "little")
+        if data:
+            return [data], False
+    if magic[:4] == b"FORM" and magic[8:12] in (b"AIFF", b"AIFC"):
+        data = _chunk_range(mm, start + 12, end, b"SSND", "big")
+        if data:
+            return [data], False
+
+    # MPEG audio and other formats: everything between the tags
+    return [(start, end)], False
+
+
+def _iter_payload(mm, ranges, paged):
+    """Iterate over the (start, end) offsets of the payload bytes to hash."""
+    for start, end in ranges:
+        if paged:
+            for page, body, page_end in _ogg_pages(mm, start, end):
+                yield body, page_end
+        else:
+            yield start, end
+
+
+def _open_map(file_path):
+    """Memory-map a file for reading, or return None if it is empty."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mm, "madvise"):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return mm
+
+
+def measure_payload(file_path):
+    """
+    Measure the size of a file's audio payload, reading only its headers.
+
+    Returns:
+        A (file path, payload size) tuple; the size is None if the file
+        cannot be read
+    """
+    try:
+        mm = _open_map(file_path)
+        if mm is None:
+            return file_path, 0
+        with mm:
+            ranges, paged = find_payload(mm)
+            return file_path, sum(end - start for start, end in ranges)
+    except (OSError, ValueError) as e:
+        print(f"Error reading {file_path}: {e}")
+        return file_path, None
+
+
+def hash_payload(file_path, limit=None):
+    """
+    Hash a file's audio payload.
+
+    Args:
+        file_path: Path to the audio file
+        limit: Only hash this many bytes from the start of the payload
+
+    Returns:
+        A (file path, hex digest) tuple; the digest is None if the file
+        cannot be read
+    """
+    hasher = hashlib.sha1()
+    try:
+        mm = _open_map(file_path)
+        if mm is None:
+            return file_path, hasher.hexdigest()
+        with mm, memoryview(mm) as view:
+            remaining = limit
+            for start, end in _iter_payload(mm, *find_payload(mm)):
+                if remaining is not None:
+                    end = min(end, start + remaining)
+                    remaining -= end - start
+                hasher.update(view[start:end])
+                if remaining is not None and remaining <= 0:
+                    break
+    except (OSError, ValueError) as e:
+        print(f"Error reading {file_path}: {e}")
+        return file_path, None
+    return file_path, hasher.hexdigest()
+
+
+def _hash_partial(file_path):
+    """Hash the start of a file's payload, for the process pool."""
+    return hash_payload(file_path, DuplicateFinder.PARTIAL_SIZE)
+
+
+def _group_by(results, key):
+    """Group (path, value) results by key(path, value), dropping unreadable files
+    and groups of one."""
+    groups = {}
+    for file_path, value in results:
+        if value is not None:
+            groups.setdefault(key(file_path, value), []).append(file_path)
+    return {group_key: paths for group_key, paths in groups.items() if len(paths) > 1}
+
+
+class DuplicateFinder:
+    """
+    Finds audio files with identical audio payloads, whatever their tags.
+
+    Only the audio data is compared: ID3, APE and Lyrics3 tags, FLAC
+    metadata blocks, Ogg header packets and everything in MP4 files except
+    the mdat boxes are skipped. Files are narrowed down in three rounds,
+    each run on a process pool with memory-mapped reads: payload sizes,
+    read from the file headers alone; a hash of the first PARTIAL_SIZE
+    bytes of the payload; and finally a hash of the whole payload.
+    """
+
+    # Payload bytes hashed in the second round
+    PARTIAL_SIZE = 64 * 1024
+
+    def __init__(self, max_workers=None):
+        """
+        Initialize the finder.
+
+        Args:
+            max_workers: Number of worker processes (one per core by default)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cancelled = False
+
+    def find(self, paths, progress_callback=None):
+        """
+        Find duplicates among files, blocking until it is done.
+
+        Args:
+            paths: Paths of the audio files to compare
+            progress_callback: Called as progress_callback(stage, files) when a
+                               round starts, where stage is "size", "partial"
+                               or "full" and files the number of files it reads
+
+        Returns:
+            A list of DuplicateGroup records, largest payloads first. Empty if
+            the search was cancelled.
+        """
+        self.cancelled = False
+        paths = list(paths)
+
+        # Forking a process that runs GStreamer and GLib threads can deadlock
+        # the child on a lock one of them held, so workers start fresh
+        start_method = ("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                        else "spawn")
+        with ProcessPoolExecutor(max_workers=self.max_workers,
+                                 mp_context=multiprocessing.get_context(start_method)) as executor:
+            def run(stage, function, paths):
+                if self.cancelled:
+                    return []
+                if progress_callback:
+                    progress_callback(stage, len(paths))
+                chunksize = max(1, len(paths) // (self.max_workers * 4))
+                return list(executor.map(function, paths, chunksize=chunksize))
+
+            # Files can only be duplicates if their payloads have the same size
+            sizes = _group_by(run("size", measure_payload, paths),
+                              lambda path, size: size)
+            candidates = [path for group in sizes.values() for path in group]
+            payload_sizes = {path: size for size, group in sizes.items() for path in group}
+
+            partial = _group_by(run("partial", _hash_partial, candidates),
+                                lambda path, digest: (payload_sizes[path], digest))
+
+            # Payloads no longer than the partial hash are already fully hashed
+            groups = []
+            candidates = []
+            for (size, digest), group in partial.items():
+                if size <= self.PARTIAL_SIZE:
+                    groups.append(DuplicateGroup(digest, size, sorted(group)))
+                else:
+                    candidates.extend(group)
+
+            full = _group_by(run("full", hash_payload, candidates),
+                             lambda path, digest: (payload_sizes[path], digest))
+            for (size, digest), group in full.items():
+                groups.append(DuplicateGroup(digest, size, sorted(group)))
+
+        if self.cancelled:
+            return []
+        groups.sort(key=lambda group: (-group.payload_size, group.paths))
+        return groups
+
+    def find_in_folder(self, root, progress_callback=None):
+        """
+        Find duplicates among all audio files below a folder.
+
+        Args:
+            root: Folder to search
+            progress_callback: See find()
+
+        Returns:
+            A list of DuplicateGroup records
+        """
+        paths = []
+        for folder_path, folders, files in os.walk(root):
+            # Skip hidden folders and files
+            folders[:] = [name for name in folders if not name.startswith('.')]
+            paths.extend(os.path.join(folder_path, name) for name in files
+                         if not name.startswith('.') and is_audio_file(name))
+        return self.find(paths, progress_callback)
+
+    def find_in_background(self, root, done_callback, progress_callback=None):
+        """
+        Find duplicates below a folder on a background thread.
+
+        Args:
+            root: Folder to search
+            done_callback: Called with the list of DuplicateGroup records on
+                           the GLib main loop
+            progress_callback: Called on the GLib main loop; see find()
+        """
+        from gi.repository import GLib
+
+        def on_progress(stage, files):
+            GLib.idle_add(progress_callback, stage, files)
+
+        def run():
+            try:
+                groups = self.find_in_folder(root, on_progress if progress_callback else None)
+            except Exception as e:
+                print(f"Error finding duplicates: {e}")
+                groups = []
+            GLib.idle_add(done_callback, groups)
+
+        thread = threading.Thread(target=run, name="duplicate-finder", daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self):
+        """Stop after the current round."""
+        self.cancelled = True
@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import list_directory
+from metadata_cache import get_metadata_cache
+
+# Summary of an indexing run
+IndexStats = namedtuple('IndexStats', [
+    'directories', 'unchanged', 'tracks', 'removed', 'seconds', 'cancelled',
+])
+
+
+class LibraryIndexer:
+    """
+    Indexes every audio file below a music root into the metadata cache.
+
+    Directories are walked in parallel by a pool of workers. Each directory's
+    mtime is recorded, and on later runs a directory whose mtime has not
+    changed is not listed again: its subdirectories come from the catalog
+    and its files are assumed unchanged. A rescan of an unchanged library
+    therefore costs one stat per directory.
+    """
+
+    def __init__(self, root, max_workers=None, metadata_cache=None, sniff=False):
+        """
+        Initialize the indexer.
+
+        Args:
+            root: Directory to index
+            max_workers: Number of directories processed in parallel
+            metadata_cache: MetadataCache to write to (the shared one by default)
+            sniff: Also recognize audio files by their content, for files
+                   with a missing or wrong extension
+        """
+        self.sniff = sniff
+        self.root = os.path.abspath(root)
+        self.max_workers = max_workers or min(16, (os.cpu_count() or 1) * 2)
+        self.metadata_cache = metadata_cache or get_metadata_cache()
+
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        """Reset the per-run state."""
+        self.directories = 0
+        self.unchanged = 0
+        self.tracks = 0
+        self.removed = 0
+        self.visited = set()  # (st_dev, st_ino) of directories, guards against symlink loops
+
+    def index(self, full=False, progress_callback=None):
+        """
+        Index the library, blocking until it is done.
+
+        Args:
+            full: Revisit every directory and revalidate every file, even if
+                  directory mtimes say nothing changed. This catches files
+                  whose tags were rewritten in place.
+            progress_callback: Called from worker threads as
+                               progress_callback(directories_done, tracks_seen)
+
+        Returns:
+            An IndexStats record
+        """
+        self.cancelled = False
+        self._reset_counters()
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="library-indexer") as executor:
+            pending = {executor.submit(self._index_directory, self.root, full, progress_callback)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        subdirectories = future.result()
+                    except Exception as e:
+                        print(f"Error indexing directory: {e}")
+                        continue
+
+                    if self.cancelled:
+                        continue
+                    for path in subdirectories:
+                        pending.add(executor.submit(self._index_directory, path, full,
+                                                    progress_callback))
+
+        return IndexStats(
+            directories=self.directories,
+            unchanged=self.unchanged,
+            tracks=self.tracks,
+            removed=self.removed,
+            seconds=time.monotonic() - start,
+            cancelled=self.cancelled,
+        )
+
+    def index_in_background(self, done_callback=None, full=False):
+        """
+        Index the library on a background thread.
+
+        Args:
+            done_callback: Called with the IndexStats on the GLib main loop
+            full: See index()
+        """
+        def run():
+            stats = self.index(full=full)
+            if done_callback:
+                from gi.repository import GLib
+                GLib.idle_add(done_callback, stats)
+
+        thread = threading.Thread(target=run, name="library-index", daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self):
+        """Stop indexing after the directories currently being processed."""
+        self.cancelled = True
+
+    def _index_directory(self, folder_path, full, progress_callback):
+        """Index one directory and return the subdirectories to visit next."""
+        if self.cancelled:
+            return []
+
+        try:
+            stat_result = os.stat(folder_path)
+        except OSError:
+            # The directory is gone, drop it from the catalog
+            self.metadata_cache.forget_directory(folder_path)
+            return []
+
+        with self.lock:
+            key = (stat_result.st_dev, stat_result.st_ino)
+            if key in self.visited:
+                return []
+            self.visited.add(key)
+            self.directories += 1
+
+        known_mtime = self.metadata_cache.lookup_directory(folder_path)
+        if not full and known_mtime == stat_result.st_mtime_ns:
+            # Nothing was added, removed or renamed here since the last run
+            with self.lock:
+                self.unchanged += 1
+            return self.metadata_cache.get_subdirectories(folder_path)
+
+        try:
+            folders, audio_files = list_directory(
+                folder_path, self.metadata_cache.sniff_files if self.sniff else None)
+        except OSError as e:
+            print(f"Error listing directory: {e}")
+            return []
+
+        # Probe new and changed files; unchanged ones only cost a stat
+        cached_tracks = self.metadata_cache.lookup_folder(folder_path)
+        for name, file_path in audio_files:
+            if self.cancelled:
+                return []
+            self.metadata_cache.get_track(file_path, cached=cached_tracks.get(file_path))
+
+        # Drop files and directories that no longer exist
+        removed = 0
+        present_files = {file_path for name, file_path in audio_files}
+        for file_path in cached_tracks:
+            if file_path not in present_files:
+                self.metadata_cache.forget(file_path)
+                removed += 1
+
+        present_folders = [path for name, path in folders]
+        for path in set(self.metadata_cache.get_subdirectories(folder_path)) - set(present_folders):
+            self.metadata_cache.forget_directory(path)
+            removed += 1
+
+        # Only record the directory once its files are indexed, so an
+        # interrupted run is picked up again next time. Its subdirectories
+        # are recorded as not indexed yet until they are visited themselves.
+        self.metadata_cache.store_directory(folder_path, stat_result.st_mtime_ns, present_folders)
+
+        with self.lock:
+            self.tracks += len(audio_files)
+            self.removed += removed
+            directories, tracks = self.directories, self.tracks
+        if progress_callback:
+            progress_callback(directories, tracks)
+
+        return present_folders
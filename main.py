@@ -1,10 +1,48 @@
 #!/usr/bin/env python3
 
-from app import FolderAudioPlayerApp
+import time
+# Taken before anything else is imported, for the startup time report
+START_TIME = time.perf_counter()
 
-def main():
-    app = FolderAudioPlayerApp()
-    app.run(None)
+import sys
+
+def pop_trace_option(argv):
+    """
+    Remove a "--trace FILE" or "--trace=FILE" option from the arguments.
+
+    Returns:
+        The trace file path, or None if the option wasn't given
+    """
+    for index, arg in enumerate(argv):
+        if arg.startswith("--trace="):
+            del argv[index]
+            return arg[len("--trace="):]
+        if arg == "--trace" and index + 1 < len(argv):
+            path = argv[index + 1]
+            del argv[index:index + 2]
+            return path
+    return None
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    argv = list(argv)
+
+    # Record a Chrome trace-event file of the session, also possible by
+    # setting FOLDER_AUDIO_PLAYER_TRACE. Enabled before anything traced runs.
+    trace_path = pop_trace_option(argv)
+    if trace_path:
+        import tracing
+        tracing.enable(trace_path)
+
+    # Headless subcommands don't load GTK or build the UI
+    if argv and argv[0] == "scan":
+        from cli import scan_main
+        return scan_main(argv[1:])
+
+    from app import FolderAudioPlayerApp
+    app = FolderAudioPlayerApp(start_time=START_TIME)
+    return app.run(None)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
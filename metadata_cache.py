@@ -0,0 +1,495 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+
+from utils import probe_track, natural_sort_key, get_cache_dir
+from audio_formats import get_audio_formats
+from thumbnail_cache import get_thumbnail_cache
+
+# Bump this whenever the schema changes; older databases are rebuilt.
+SCHEMA_VERSION = 8
+
+# Directory mtime_ns recorded for subdirectories that haven't been indexed yet
+UNINDEXED_MTIME = -1
+
+# A cached track. cover_ref is the SHA-1 of the embedded cover bytes (or None)
+# and names the cover's thumbnails in the ThumbnailCache. sort_name is the
+# precomputed natural sort key of the file name. duration_exact is False
+# while the duration is only mutagen's estimate; the DurationProber then
+# measures it once and marks it exact. The ReplayGain values come from the
+# file's tags or from the ReplayGainAnalyzer, and are None until known.
+CachedTrack = namedtuple('CachedTrack', [
+    'path', 'size', 'mtime_ns', 'artist', 'album', 'title', 'track_number',
+    'disc_number', 'duration', 'duration_exact', 'codec', 'cover_ref', 'sort_name',
+    'track_gain', 'track_peak', 'album_gain', 'album_peak',
+])
+
+_COLUMNS = ', '.join(CachedTrack._fields)
+
+
+class MetadataCache:
+    """Persistent track metadata cache backed by SQLite.
+
+    Entries are keyed by path and validated against the file's size and
+    mtime_ns, so a folder that has been seen before only costs a stat per
+    file. Covers are stored once per unique image in the ThumbnailCache.
+    Directories indexed by the LibraryIndexer are recorded with their
+    mtime_ns so unchanged parts of the library can be skipped on rescans.
+    Artist, album, title and path are kept in an FTS5 index for search.
+    The results of content sniffing are kept too, so each file is only
+    sniffed again once it changes.
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path: Path to the SQLite file. Defaults to metadata.db in the
+                     application's cache directory.
+        """
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), "metadata.db")
+        self.db_path = db_path
+
+        # The connection is shared between the UI and scanner threads
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE only fires the delete triggers that keep the
+        # search index in sync when recursive triggers are enabled
+        self.connection.execute("PRAGMA recursive_triggers=ON")
+        self.fts_available = False
+        self._init_schema()
+
+    def _init_schema(self):
+        """Create the tables, rebuilding them if the schema is out of date."""
+        with self.lock, self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS tracks")
+                self.connection.execute("DROP TABLE IF EXISTS covers")
+                self.connection.execute("DROP TABLE IF EXISTS directories")
+                self.connection.execute("DROP TABLE IF EXISTS tracks_fts")
+                self.connection.execute("DROP TABLE IF EXISTS sniffed")
+
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS tracks (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    artist TEXT,
+                    album TEXT,
+                    title TEXT,
+                    track_number INTEGER,
+                    disc_number INTEGER,
+                    duration REAL,
+                    duration_exact INTEGER NOT NULL DEFAULT 0,
+                    codec TEXT,
+                    cover_ref TEXT,
+                    sort_name TEXT,
+                    track_gain REAL,
+                    track_peak REAL,
+                    album_gain REAL,
+                    album_peak REAL
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS tracks_folder ON tracks (folder)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS directories (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT,
+                    mtime_ns INTEGER NOT NULL
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS sniffed (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    media_type TEXT
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS sniffed_folder ON sniffed (folder)")
+            self.fts_available = self._init_search_index()
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _init_search_index(self):
+        """Create the full-text search index. Called with the lock held.
+
+        Returns:
+            False if this SQLite build has no FTS5 support
+        """
+        try:
+            # External content table over tracks, with prefix indexes so
+            # filter-as-you-type queries on short prefixes stay fast
+            self.connection.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+                    artist, album, title, path,
+                    content='tracks', content_rowid='rowid', prefix='1 2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search not available, falling back to LIKE: {e}")
+            return False
+
+        self.connection.executescript("""
+            CREATE TRIGGER IF NOT EXISTS tracks_fts_insert AFTER INSERT ON tracks BEGIN
+                INSERT INTO tracks_fts (rowid, artist, album, title, path)
+                VALUES (new.rowid, new.artist, new.album, new.title, new.path);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_fts_delete AFTER DELETE ON tracks BEGIN
+                INSERT INTO tracks_fts (tracks_fts, rowid, artist, album, title, path)
+                VALUES ('delete', old.rowid, old.artist, old.album, old.title, old.path);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_fts_update
+            AFTER UPDATE OF artist, album, title, path ON tracks BEGIN
+                INSERT INTO tracks_fts (tracks_fts, rowid, artist, album, title, path)
+                VALUES ('delete', old.rowid, old.artist, old.album, old.title, old.path);
+                INSERT INTO tracks_fts (rowid, artist, album, title, path)
+                VALUES (new.rowid, new.artist, new.album, new.title, new.path);
+            END;
+        """)
+        return True
+
+    def lookup_folder(self, folder_path):
+        """Load all cached entries for a folder with a single query.
+
+        Args:
+            folder_path: Folder whose direct children should be loaded
+
+        Returns:
+            A dictionary mapping file paths to CachedTrack records
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {_COLUMNS} FROM tracks WHERE folder = ?",
+                (folder_path,)).fetchall()
+        return {row[0]: CachedTrack(*row) for row in rows}
+
+    def lookup(self, file_path):
+        """Get the cached entry for a file without validating it.
+
+        Returns:
+            A CachedTrack record, or None if the file is not cached
+        """
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT {_COLUMNS} FROM tracks WHERE path = ?",
+                (file_path,)).fetchone()
+        return CachedTrack(*row) if row else None
+
+    def get_track(self, file_path, stat_result=None, cached=None):
+        """Get metadata for a file, probing it only if the cache is stale.
+
+        Args:
+            file_path: Path to the audio file
+            stat_result: Result of os.stat() for the file, if already known
+            cached: A previously looked-up CachedTrack for the file, if any
+
+        Returns:
+            A CachedTrack record, or None if the file cannot be accessed
+        """
+        if stat_result is None:
+            try:
+                stat_result = os.stat(file_path)
+            except OSError as e:
+                print(f"Error reading file status: {e}")
+                return None
+
+        if cached is None:
+            cached = self.lookup(file_path)
+
+        if cached is not None and is_fresh(cached, stat_result):
+            return cached
+
+        return self.store(probe_track(file_path), stat_result)
+
+    def store(self, track, stat_result):
+        """Store a freshly probed track.
+
+        Args:
+            track: A TrackInfo record from probe_track()
+            stat_result: Result of os.stat() taken before the file was probed
+
+        Returns:
+            The CachedTrack record that was written
+        """
+        cover_ref = None
+        if track.cover_data:
+            cover_ref = hashlib.sha1(track.cover_data).hexdigest()
+            # Identical covers are only decoded and written once
+            if not get_thumbnail_cache().store(cover_ref, track.cover_data):
+                cover_ref = None
+
+        entry = CachedTrack(
+            path=track.path,
+            size=stat_result.st_size,
+            mtime_ns=stat_result.st_mtime_ns,
+            artist=track.artist,
+            album=track.album,
+            title=track.title,
+            track_number=track.track_number,
+            disc_number=track.disc_number,
+            duration=track.duration,
+            duration_exact=track.duration_exact,
+            codec=track.codec,
+            cover_ref=cover_ref,
+            sort_name=natural_sort_key(os.path.basename(track.path)),
+            track_gain=track.track_gain,
+            track_peak=track.track_peak,
+            album_gain=track.album_gain,
+            album_peak=track.album_peak,
+        )
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO tracks (folder, {_COLUMNS}) "
+                f"VALUES (?, {', '.join('?' * len(CachedTrack._fields))})",
+                (os.path.dirname(track.path),) + tuple(entry))
+        return entry
+
+    def store_duration(self, track, duration):
+        """Record a duration measured by decoding a file, marking it exact.
+
+        Nothing is written if the file changed since the track was cached.
+
+        Args:
+            track: The CachedTrack record the duration was measured for
+            duration: Duration in seconds, or None to keep the current one.
+                      The track is marked exact either way, so files that
+                      could not be measured are not tried again.
+
+        Returns:
+            The updated CachedTrack record
+        """
+        if duration is None:
+            duration = track.duration
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE tracks SET duration = ?, duration_exact = 1 "
+                "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (duration, track.path, track.size, track.mtime_ns))
+        return track._replace(duration=duration, duration_exact=True)
+
+    def store_replaygain(self, track, track_gain, track_peak, album_gain, album_peak):
+        """Record the ReplayGain values measured for a track.
+
+        Nothing is written if the file changed since the track was cached.
+
+        Args:
+            track: The CachedTrack record the values were measured for
+            track_gain: Track gain in dB
+            track_peak: Track peak amplitude, where 1.0 is full scale
+            album_gain: Album gain in dB, or None
+            album_peak: Album peak amplitude, or None
+
+        Returns:
+            The updated CachedTrack record
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE tracks SET track_gain = ?, track_peak = ?, album_gain = ?, album_peak = ? "
+                "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (track_gain, track_peak, album_gain, album_peak,
+                 track.path, track.size, track.mtime_ns))
+        return track._replace(track_gain=track_gain, track_peak=track_peak,
+                              album_gain=album_gain, album_peak=album_peak)
+
+    def lookup_tree(self, folder_path):
+        """Load the cached entries of every file below a folder.
+
+        Returns:
+            A list of CachedTrack records, sorted by path
+        """
+        low = folder_path.rstrip("/") + "/"
+        high = folder_path.rstrip("/") + "0"
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {_COLUMNS} FROM tracks WHERE path >= ? AND path < ? ORDER BY path",
+                (low, high)).fetchall()
+        return [CachedTrack(*row) for row in rows]
+
+    def forget(self, file_path):
+        """Remove a file from the cache."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM tracks WHERE path = ?", (file_path,))
+            self.connection.execute("DELETE FROM sniffed WHERE path = ?", (file_path,))
+
+    def sniff_files(self, folder_path, candidates):
+        """Find the files of a folder that hold audio despite their extension.
+
+        Files are only read if they are new or changed since they were last
+        sniffed; the results for a folder are loaded and stored in one batch.
+        Can be passed to utils.list_directory() as its sniffer.
+
+        Args:
+            folder_path: Folder the files are in
+            candidates: A list of (name, full path, stat result) tuples
+
+        Returns:
+            A list of (name, full path) tuples of the audio files
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, size, mtime_ns, media_type FROM sniffed WHERE folder = ?",
+                (folder_path,)).fetchall()
+        known = {row[0]: row[1:] for row in rows}
+
+        audio_formats = get_audio_formats()
+        audio_files = []
+        sniffed = []
+        for name, file_path, stat_result in candidates:
+            entry = known.get(file_path)
+            if entry is not None and entry[:2] == (stat_result.st_size, stat_result.st_mtime_ns):
+                media_type = entry[2]
+            else:
+                media_type = audio_formats.sniff_file(file_path)
+                sniffed.append((file_path, folder_path, stat_result.st_size,
+                                stat_result.st_mtime_ns, media_type))
+            if media_type:
+                audio_files.append((name, file_path))
+
+        if sniffed:
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO sniffed (path, folder, size, mtime_ns, media_type) "
+                    "VALUES (?, ?, ?, ?, ?)", sniffed)
+        return audio_files
+
+    def search(self, text, limit=500):
+        """Find cached tracks whose artist, album, title or path match a query.
+
+        Every word of the query has to match the start of a word in one of
+        those fields, so results narrow down as the user types.
+
+        Args:
+            text: The search text
+            limit: Maximum number of results
+
+        Returns:
+            A list of CachedTrack records
+        """
+        words = text.split()
+        if not words:
+            return []
+
+        if self.fts_available:
+            # Quote each word so FTS5 syntax characters are taken literally
+            query = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+            sql = (f"SELECT {', '.join('tracks.' + c for c in CachedTrack._fields)} "
+                   "FROM tracks_fts JOIN tracks ON tracks.rowid = tracks_fts.rowid "
+                   "WHERE tracks_fts MATCH ? LIMIT ?")
+            params = (query, limit)
+        else:
+            clause = "(artist LIKE ? OR album LIKE ? OR title LIKE ? OR path LIKE ?)"
+            sql = (f"SELECT {_COLUMNS} FROM tracks WHERE "
+                   f"{' AND '.join([clause] * len(words))} LIMIT ?")
+            params = tuple(f"%{word}%" for word in words for _ in range(4)) + (limit,)
+
+        try:
+            with self.lock:
+                rows = self.connection.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Error searching: {e}")
+            return []
+        return [CachedTrack(*row) for row in rows]
+
+    def lookup_directory(self, folder_path):
+        """Get the mtime_ns a directory had when it was last indexed, or None."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT mtime_ns FROM directories WHERE path = ?", (folder_path,)).fetchone()
+        return row[0] if row else None
+
+    def get_subdirectories(self, folder_path):
+        """Get the indexed direct subdirectories of a directory."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path FROM directories WHERE parent = ?", (folder_path,)).fetchall()
+        return [row[0] for row in rows]
+
+    def store_directory(self, folder_path, mtime_ns, subdirectories=()):
+        """Record that a directory has been indexed at the given mtime_ns.
+
+        Args:
+            folder_path: The indexed directory
+            mtime_ns: Its mtime_ns when it was listed
+            subdirectories: Its direct subdirectories. Those not indexed yet
+                            are recorded with an mtime_ns of UNINDEXED_MTIME,
+                            which matches no directory, so they are visited
+                            on the next run even if this one is unchanged.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO directories (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                (folder_path, os.path.dirname(folder_path), mtime_ns))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO directories (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                [(path, folder_path, UNINDEXED_MTIME) for path in subdirectories])
+
+    def forget_directory(self, folder_path):
+        """Remove a directory and everything below it from the cache."""
+        # Every path below folder_path sorts between "folder_path/" and
+        # "folder_path0", as "0" is the character after "/"
+        low = folder_path.rstrip("/") + "/"
+        high = folder_path.rstrip("/") + "0"
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+                (folder_path, low, high))
+            self.connection.execute(
+                "DELETE FROM tracks WHERE path >= ? AND path < ?", (low, high))
+            self.connection.execute(
+                "DELETE FROM sniffed WHERE path >= ? AND path < ?", (low, high))
+
+    def get_cover_pixbuf(self, track, size=32):
+        """Get a cached track's album art at one of the thumbnail sizes.
+
+        Args:
+            track: A CachedTrack record
+            size: Thumbnail size in pixels (32 or 128)
+
+        Returns:
+            A GdkPixbuf.Pixbuf object, or None if the track has no cover
+        """
+        if track is None or not track.cover_ref:
+            return None
+
+        thumbnails = get_thumbnail_cache()
+        pixbuf = thumbnails.load_pixbuf(track.cover_ref, size)
+        if pixbuf is None:
+            # The thumbnail was evicted, extract the cover again
+            cover_data = probe_track(track.path).cover_data
+            if cover_data and thumbnails.store(track.cover_ref, cover_data):
+                pixbuf = thumbnails.load_pixbuf(track.cover_ref, size)
+        return pixbuf
+
+
+def is_fresh(cached, stat_result):
+    """Check whether a cache entry still matches the file on disk."""
+    return (cached.size == stat_result.st_size and
+            cached.mtime_ns == stat_result.st_mtime_ns)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_metadata_cache():
+    """Get the shared MetadataCache instance, opening it on first use."""
+    global _cache
+    if _cache is None:
+        # Worker threads can ask for it at the same time; only one may create it
+        with _cache_lock:
+            if _cache is None:
+                _cache = MetadataCache()
+    return _cache
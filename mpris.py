@@ -2,6 +2,8 @@ import gi
 gi.require_version('GLib', '2.0')
 from gi.repository import GLib, Gio
 
+import tracing
+
 class MPRISInterface:
     """
     Implements the MPRIS (Media Player Remote Interfacing Specification) interface
@@ -30,13 +32,23 @@ class MPRISInterface:
         self.root_interface_id = None
         self.player_interface_id = None
         
-        # Initialize D-Bus connection
-        self._init_dbus()
+        # Connect to D-Bus without blocking the main loop; until the
+        # connection is up, property updates are skipped
+        Gio.bus_get(Gio.BusType.SESSION, None, self._on_bus_ready)
+        
+    def _on_bus_ready(self, source, result):
+        """Finish connecting to the session bus and register the interfaces."""
+        try:
+            connection = Gio.bus_get_finish(result)
+        except GLib.Error as e:
+            print(f"MPRIS not available: {e.message}")
+            return
+        self._init_dbus(connection)
+        self.update_properties()
         
-    def _init_dbus(self):
-        """Initialize the D-Bus connection and register interfaces."""
-        # Get the session bus
-        self.connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+    def _init_dbus(self, connection):
+        """Register the interfaces on a D-Bus connection and own the MPRIS name."""
+        self.connection = connection
         
         # Register the root interface
         root_xml = self._get_root_interface_xml()
@@ -134,18 +146,20 @@ class MPRISInterface:
         
     def _handle_root_method_call(self, connection, sender, object_path, interface_name, method_name, parameters, invocation):
         """Handle method calls on the root interface."""
-        if method_name == 'Raise':
-            # Bring the application window to the front
-            self.app.win.present()
-            invocation.return_value(None)
-        elif method_name == 'Quit':
-            # Quit the application
-            self.app.quit()
-            invocation.return_value(None)
-        else:
-            invocation.return_error_literal(Gio.dbus_error_quark(), Gio.DBusError.UNKNOWN_METHOD,
-                                           f"Method {method_name} not implemented")
+        with tracing.span(method_name, "mpris"):
+            if method_name == 'Raise':
+                # Bring the application window to the front
+                self.app.win.present()
+                invocation.return_value(None)
+            elif method_name == 'Quit':
+                # Quit the application
+                self.app.quit()
+                invocation.return_value(None)
+            else:
+                invocation.return_error_literal(Gio.dbus_error_quark(), Gio.DBusError.UNKNOWN_METHOD,
+                                               f"Method {method_name} not implemented")
     
+    @tracing.traced("mpris")
     def _handle_root_get_property(self, connection, sender, object_path, interface_name, property_name):
         """Handle property get requests on the root interface."""
         if property_name == 'CanQuit':
@@ -171,43 +185,45 @@ class MPRISInterface:
     
     def _handle_player_method_call(self, connection, sender, object_path, interface_name, method_name, parameters, invocation):
         """Handle method calls on the player interface."""
-        if method_name == 'Next':
-            self.app.on_next_clicked()
-            invocation.return_value(None)
-        elif method_name == 'Previous':
-            self.app.on_prev_clicked()
-            invocation.return_value(None)
-        elif method_name == 'Pause':
-            if self.app.player.playing:
-                self.app.on_play_clicked()
-            invocation.return_value(None)
-        elif method_name == 'PlayPause':
-            self.app.on_play_clicked()
-            invocation.return_value(None)
-        elif method_name == 'Stop':
-            self.app.player.stop()
-            self.app.player_controls.update_play_button_state(False)
-            self.app.update_notification()
-            invocation.return_value(None)
-        elif method_name == 'Play':
-            if not self.app.player.playing and self.app.current_file:
+        with tracing.span(method_name, "mpris"):
+            if method_name == 'Next':
+                self.app.on_next_clicked()
+                invocation.return_value(None)
+            elif method_name == 'Previous':
+                self.app.on_prev_clicked()
+                invocation.return_value(None)
+            elif method_name == 'Pause':
+                if self.app.player.playing:
+                    self.app.on_play_clicked()
+                invocation.return_value(None)
+            elif method_name == 'PlayPause':
                 self.app.on_play_clicked()
-            invocation.return_value(None)
-        elif method_name == 'Seek':
-            offset_us = parameters.unpack()[0]  # Microseconds
-            offset_s = offset_us / 1000000.0    # Convert to seconds
-            current_pos = self.app.player.get_position()
-            self.app.player.seek(current_pos + offset_s)
-            invocation.return_value(None)
-        elif method_name == 'SetPosition':
-            track_id, position_us = parameters.unpack()
-            position_s = position_us / 1000000.0  # Convert to seconds
-            self.app.player.seek(position_s)
-            invocation.return_value(None)
-        else:
-            invocation.return_error_literal(Gio.dbus_error_quark(), Gio.DBusError.UNKNOWN_METHOD,
-                                           f"Method {method_name} not implemented")
+                invocation.return_value(None)
+            elif method_name == 'Stop':
+                self.app.player.stop()
+                self.app.player_controls.update_play_button_state(False)
+                self.app.update_notification()
+                invocation.return_value(None)
+            elif method_name == 'Play':
+                if not self.app.player.playing and self.app.current_file:
+                    self.app.on_play_clicked()
+                invocation.return_value(None)
+            elif method_name == 'Seek':
+                offset_us = parameters.unpack()[0]  # Microseconds
+                offset_s = offset_us / 1000000.0    # Convert to seconds
+                current_pos = self.app.player.get_position()
+                self.app.player.seek(current_pos + offset_s)
+                invocation.return_value(None)
+            elif method_name == 'SetPosition':
+                track_id, position_us = parameters.unpack()
+                position_s = position_us / 1000000.0  # Convert to seconds
+                self.app.player.seek(position_s)
+                invocation.return_value(None)
+            else:
+                invocation.return_error_literal(Gio.dbus_error_quark(), Gio.DBusError.UNKNOWN_METHOD,
+                                               f"Method {method_name} not implemented")
     
+    @tracing.traced("mpris")
     def _handle_player_get_property(self, connection, sender, object_path, interface_name, property_name):
         """Handle property get requests on the player interface."""
         if property_name == 'PlaybackStatus':
@@ -288,6 +304,7 @@ class MPRISInterface:
         
         return GLib.Variant('a{sv}', metadata)
     
+    @tracing.traced("mpris")
     def update_properties(self):
         """
         Update MPRIS properties when the player state changes.
@@ -330,6 +347,7 @@ class MPRISInterface:
             ])
         )
     
+    @tracing.traced("mpris")
     def emit_seeked(self, position):
         """
         Emit the Seeked signal.
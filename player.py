@@ -1,21 +1,112 @@
+import time
+import threading
+
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
 
+import tracing
+
 class AudioPlayer:
-    """Audio player class that handles playback using GStreamer."""
+    """
+    Audio player class that handles playback using GStreamer.
+
+    Tracks queued with set_next_track() follow the current one gaplessly:
+    playbin's about-to-finish signal hands it the next URI while the current
+    track is still playing, so the pipeline is never torn down between them.
+
+    Switching tracks with play() while playing takes the same path: a
+    flushing seek to the end of the current track drains it, and playbin
+    picks up the new one without leaving PLAYING, so the audio sink stays
+    open. Otherwise the pipeline only goes down to READY, which keeps the
+    sink's connection to the sound server.
+    """
+
+    # How long a switch may wait for about-to-finish before the pipeline is
+    # restarted instead, in milliseconds
+    SWITCH_TIMEOUT = 500
+
+    # How long a seek may wait for ASYNC_DONE before the next one is issued
+    # anyway, in milliseconds
+    SEEK_TIMEOUT = 1000
     
-    def __init__(self):
+    def __init__(self, replaygain_mode="track", fade=False, low_latency=True):
+        """
+        Initialize the player.
+
+        Args:
+            replaygain_mode: "track" or "album" to normalize loudness with
+                             ReplayGain, "off" to play files unchanged
+            fade: Add a volume element named "fade" after the ReplayGain
+                  stages, for CrossfadePlayer's volume ramps
+            low_latency: Switch tracks without closing the audio sink. When
+                         False, every play() restarts the pipeline from NULL.
+        """
         # Initialize GStreamer if not already initialized
         if not Gst.is_initialized():
             Gst.init(None)
         
         # Create GStreamer player
         self.player = Gst.ElementFactory.make("playbin", "player")
+        self.low_latency = low_latency
+
+        # The sink playbin would pick anyway, made here so the time to the
+        # first sample can be measured on its pad
+        self.audio_sink = Gst.ElementFactory.make("autoaudiosink", "audio-sink")
+        self.player.set_property("audio-sink", self.audio_sink)
+        self.first_sample_probe = None
+
+        # Loudness normalization. rgvolume applies the gain from the file's
+        # ReplayGain tags, or the fallback gain we set from the metadata
+        # cache for files that were analyzed without writing tags.
+        self.replaygain_mode = replaygain_mode
+        self.replaygain = None
+        self.fade = None
+        fade_stage = " ! volume name=fade" if fade else ""
+        audio_filter = None
+        if replaygain_mode != "off":
+            try:
+                audio_filter = Gst.parse_bin_from_description(
+                    "rgvolume name=replaygain ! rglimiter" + fade_stage, True)
+                self.replaygain = audio_filter.get_by_name("replaygain")
+                self.replaygain.set_property("album-mode", replaygain_mode == "album")
+                # A gaplessly queued track's fallback gain is set when its
+                # stream starts, so the end of the current track keeps its own
+                self.replaygain.get_static_pad("sink").add_probe(
+                    Gst.PadProbeType.EVENT_DOWNSTREAM, self._on_replaygain_event)
+            except GLib.Error as e:
+                print(f"ReplayGain not available: {e.message}")
+        if audio_filter is None and fade:
+            audio_filter = Gst.parse_bin_from_description("volume name=fade", True)
+        if audio_filter is not None:
+            self.fade = audio_filter.get_by_name("fade")
+            self.player.set_property("audio-filter", audio_filter)
+
+        # Gapless playback. about-to-finish is emitted from a streaming
+        # thread, so the queued track is handed over under a lock.
+        self.player.connect("about-to-finish", self._on_about_to_finish)
+        self.lock = threading.Lock()
+        self.next_track = None  # (path, fallback gain) to continue with
+        self.switch_track = None  # (path, fallback gain) play() is switching to
+        self.started_file = None  # Queued file whose stream is starting
+        self.started_gain = None  # Fallback gain for that stream
         
         # Create a bus to get events from the player
         self.bus = self.player.get_bus()
         self.bus.add_signal_watch()
+        if tracing.enabled():
+            self.bus.connect("message::state-changed", self._on_state_changed)
+
+        # Seek coalescing. While a seek is in flight, later requests only
+        # replace the target it continues with once ASYNC_DONE arrives.
+        self.bus.connect("message::async-done", self._on_async_done)
+        # A seek that ends in EOS or an error never gets its ASYNC_DONE
+        self.bus.connect("message::eos", self._on_seek_interrupted)
+        self.bus.connect("message::error", self._on_seek_interrupted)
+        self.seeking = False
+        self.seek_timeout_id = None
+        self.pending_seek = None  # (position in seconds, accurate) to seek to next
+        self.seeked_callback = None
         
         # State variables
         self.current_file = None
@@ -25,25 +116,147 @@ class AudioPlayer:
     def set_on_message_callback(self, callback):
         """Set callback for bus messages."""
         self.bus.connect("message", callback)
+
+    def set_seeked_callback(self, callback):
+        """Set callback called with the new position in seconds once a seek completes."""
+        self.seeked_callback = callback
         
-    def play(self, file_path):
-        """Play an audio file."""
+    def play(self, file_path, track_gain=None, album_gain=None):
+        """Play an audio file.
+
+        Args:
+            file_path: Path to the audio file
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        gain = self._get_fallback_gain(track_gain, album_gain)
+        if self.low_latency and self.playing and self._switch(file_path, gain):
+            self._measure_first_sample("switch")
+            return True
+
+        self._restart(file_path, gain)
+        self._measure_first_sample("restart" if self.low_latency else "reopen")
+        return True
+
+    def _restart(self, file_path, gain):
+        """Play an audio file by restarting the pipeline."""
         self.current_file = file_path
         
-        # Stop any current playback
-        self.player.set_state(Gst.State.NULL)
+        # Stop any current playback. READY keeps the audio sink's connection
+        # open; NULL closes it.
+        self._set_state(Gst.State.READY if self.low_latency else Gst.State.NULL)
+        self._clear_next_track()
+        self._clear_seek()
+
+        if self.replaygain is not None:
+            self.replaygain.set_property("fallback-gain", gain)
         
         # Set the URI to play
         self.player.set_property("uri", f"file://{file_path}")
         
         # Start playing
-        self.player.set_state(Gst.State.PLAYING)
+        self._set_state(Gst.State.PLAYING)
         
         # Set playing state
         self.playing = True
-        
+
+    def _switch(self, file_path, gain):
+        """
+        Switch to an audio file without leaving PLAYING.
+
+        Returns:
+            True if the switch was started, False if the current track can't be
+            drained or the queued track was already handed to playbin
+        """
+        success, duration = self.player.query_duration(Gst.Format.TIME)
+        if not success or duration <= 0:
+            return False
+
+        with self.lock:
+            if self.started_file is not None:
+                # playbin already took the queued track in about-to-finish;
+                # draining now would play that one instead
+                return False
+            self.next_track = None
+            self.switch_track = (file_path, gain)
+            self.started_gain = None
+        # The drain's ASYNC_DONE must not complete a seek in the old track
+        self._clear_seek()
+
+        # Seeking to the end drains the current track, and playbin asks for
+        # the next one in about-to-finish
+        if not self.player.seek_simple(Gst.Format.TIME, Gst.SeekFlags.FLUSH, duration):
+            with self.lock:
+                self.switch_track = None
+            return False
+
+        self.current_file = file_path
+        GLib.timeout_add(self.SWITCH_TIMEOUT, self._on_switch_timeout, file_path)
         return True
+
+    def _on_switch_timeout(self, file_path):
+        """Restart the pipeline if playbin never asked for the track being switched to."""
+        with self.lock:
+            pending = self.switch_track
+            if pending is None or pending[0] != file_path:
+                return False
+            self.switch_track = None
+        print(f"Switching to {file_path} without a restart timed out")
+        self._restart(*pending)
+        return False
+
+    def _measure_first_sample(self, method):
+        """Report the time from play() until the new track's first buffer reaches the sink."""
+        pad = self.audio_sink.get_static_pad("sink")
+        if self.first_sample_probe is not None:
+            pad.remove_probe(self.first_sample_probe)
+
+        start = time.perf_counter()
+        tracing.begin("click_to_first_sample", "player", method=method)
+        stream_started = False
+
+        def on_pad_data(pad, info):
+            nonlocal stream_started
+            if info.type & Gst.PadProbeType.EVENT_DOWNSTREAM:
+                # Buffers before the new stream's start are the old track's tail
+                if info.get_event().type == Gst.EventType.STREAM_START:
+                    stream_started = True
+                return Gst.PadProbeReturn.OK
+            if not stream_started:
+                return Gst.PadProbeReturn.OK
+
+            milliseconds = (time.perf_counter() - start) * 1000
+            tracing.end("click_to_first_sample", "player")
+            print(f"Track switch ({method}): first sample after {milliseconds:.0f} ms")
+            self.first_sample_probe = None
+            return Gst.PadProbeReturn.REMOVE
+
+        self.first_sample_probe = pad.add_probe(
+            Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM, on_pad_data)
         
+    def preload(self, file_path, track_gain=None, album_gain=None):
+        """Open an audio file and decode up to its first samples, without playing it.
+
+        Set the pipeline to PLAYING afterwards to start playback right away.
+
+        Args:
+            file_path: Path to the audio file
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        self.current_file = file_path
+        self._set_state(Gst.State.READY if self.low_latency else Gst.State.NULL)
+        self._clear_next_track()
+        self._clear_seek()
+
+        if self.replaygain is not None:
+            self.replaygain.set_property("fallback-gain",
+                                         self._get_fallback_gain(track_gain, album_gain))
+
+        self.player.set_property("uri", f"file://{file_path}")
+        self._set_state(Gst.State.PAUSED)
+        self.playing = False
+
     def toggle_playback(self):
         """Toggle between play and pause."""
         if not self.current_file:
@@ -53,10 +266,10 @@ class AudioPlayer:
         
         if self.playing:
             # Resume playback
-            self.player.set_state(Gst.State.PLAYING)
+            self._set_state(Gst.State.PLAYING)
         else:
             # Pause playback
-            self.player.set_state(Gst.State.PAUSED)
+            self._set_state(Gst.State.PAUSED)
             
         return True
         
@@ -66,24 +279,204 @@ class AudioPlayer:
             GLib.source_remove(self.timeout_id)
             self.timeout_id = None
             
-        self.player.set_state(Gst.State.NULL)
+        self._set_state(Gst.State.NULL)
+        self._clear_next_track()
+        self._clear_seek()
         self.playing = False
         self.current_file = None
         
-    def seek(self, position_seconds):
-        """Seek to a position in the current track."""
+    def set_next_track(self, file_path, track_gain=None, album_gain=None):
+        """Queue the track to continue with when the current one ends.
+
+        Args:
+            file_path: Path to the audio file, or None to stop at the end
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        with self.lock:
+            if file_path is None:
+                self.next_track = None
+            else:
+                self.next_track = (file_path, self._get_fallback_gain(track_gain, album_gain))
+
+    def update_next_track_gain(self, file_path, track_gain=None, album_gain=None):
+        """Set the cached ReplayGain of a queued track, once it is known.
+
+        Unlike set_next_track(), this never queues a track again that
+        playback has already continued with.
+
+        Args:
+            file_path: Path of the queued track; other tracks are ignored
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        gain = self._get_fallback_gain(track_gain, album_gain)
+        with self.lock:
+            if self.next_track is not None and self.next_track[0] == file_path:
+                self.next_track = (file_path, gain)
+            elif self.started_file == file_path and self.started_gain is not None:
+                # Handed over, but its stream hasn't started yet
+                self.started_gain = gain
+
+    def take_started_track(self):
+        """Check whether a stream that just started is a queued track.
+
+        Call it when the pipeline posts STREAM_START. The queued track then
+        becomes the current one.
+
+        Returns:
+            The path of the queued track, or None if the stream was started by play()
+        """
+        with self.lock:
+            file_path = self.started_file
+            self.started_file = None
+        if file_path is not None:
+            self.current_file = file_path
+        return file_path
+
+    def _clear_next_track(self):
+        """Forget the queued track, e.g. when playback is stopped or restarted."""
+        with self.lock:
+            self.next_track = None
+            self.switch_track = None
+            self.started_file = None
+            self.started_gain = None
+
+    def _get_fallback_gain(self, track_gain, album_gain):
+        """Pick the cached gain rgvolume applies to files without ReplayGain tags."""
+        if self.replaygain_mode == "album" and album_gain is not None:
+            return album_gain
+        return track_gain or 0.0
+
+    def _on_about_to_finish(self, playbin):
+        """Hand playbin the queued track while the current one is still playing."""
+        with self.lock:
+            if self.switch_track is not None:
+                # play() is switching tracks; it already made this one current
+                file_path, gain = self.switch_track
+                self.switch_track = None
+            elif self.next_track is not None:
+                file_path, gain = self.next_track
+                self.next_track = None
+                self.started_file = file_path
+                tracing.begin("about_to_finish_to_stream_start", "player")
+            else:
+                # Nothing queued; the pipeline posts EOS at the end
+                return
+            self.started_gain = gain
+        playbin.set_property("uri", f"file://{file_path}")
+
+    def _on_replaygain_event(self, pad, info):
+        """Apply the queued track's fallback gain as its stream reaches rgvolume."""
+        if info.get_event().type == Gst.EventType.STREAM_START:
+            with self.lock:
+                gain = self.started_gain
+                self.started_gain = None
+            if gain is not None:
+                self.replaygain.set_property("fallback-gain", gain)
+        return Gst.PadProbeReturn.OK
+
+    def _set_state(self, state):
+        """Change the pipeline state, tracing the change until it completes."""
+        with tracing.span("set_state", "player", state=state.value_nick):
+            result = self.player.set_state(state)
+        if result == Gst.StateChangeReturn.ASYNC:
+            # Ended by _on_state_changed once the pipeline gets there
+            tracing.begin("state_change", "player", state=state.value_nick)
+        return result
+
+    def _on_state_changed(self, bus, message):
+        """End the traced state change once the pipeline has no state change pending."""
+        if message.src != self.player:
+            return
+        old_state, new_state, pending_state = message.parse_state_changed()
+        if pending_state == Gst.State.VOID_PENDING:
+            tracing.end("state_change", "player", state=new_state.value_nick)
+
+    def seek(self, position_seconds, accurate=True):
+        """Seek to a position in the current track.
+
+        Only one seek is in flight at a time. A seek requested before the
+        previous one completed is queued, replacing any queued before it,
+        so a burst of seeks costs at most two flushes.
+
+        Args:
+            position_seconds: Position to seek to
+            accurate: Seek to exactly that position. Otherwise the seek goes
+                      to the nearest keyframe, which is faster, e.g. while scrubbing.
+
+        Returns:
+            True if the seek was started or queued
+        """
         if not self.current_file:
             return False
-            
+
+        if self.seeking:
+            self.pending_seek = (position_seconds, accurate)
+            return True
+        return self._start_seek(position_seconds, accurate)
+
+    def _start_seek(self, position_seconds, accurate):
+        """Issue a flushing seek, completed by the pipeline's ASYNC_DONE."""
+        flags = Gst.SeekFlags.FLUSH
+        flags |= Gst.SeekFlags.ACCURATE if accurate else Gst.SeekFlags.KEY_UNIT
+
         # Convert seconds to nanoseconds for GStreamer
         position_ns = int(position_seconds * Gst.SECOND)
-        
-        # Seek to the new position
-        return self.player.seek_simple(
-            Gst.Format.TIME,
-            Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT,
-            position_ns
-        )
+        if not self.player.seek_simple(Gst.Format.TIME, flags, position_ns):
+            return False
+
+        self.seeking = True
+        self.seek_timeout_id = GLib.timeout_add(self.SEEK_TIMEOUT, self._on_seek_timeout)
+        tracing.begin("seek", "player", position=position_seconds, accurate=accurate)
+        return True
+
+    def _on_async_done(self, bus, message):
+        """Complete the seek in flight once the pipeline has prerolled at its target."""
+        if message.src != self.player or not self.seeking:
+            return
+        self._finish_seek()
+
+    def _on_seek_timeout(self):
+        """Stop waiting for a seek the demuxer dropped without an error."""
+        self.seek_timeout_id = None
+        if self.seeking:
+            self._finish_seek()
+        return False
+
+    def _on_seek_interrupted(self, bus, message):
+        """Forget the seeks of a track that ended or failed."""
+        if self.seeking:
+            self._clear_seek()
+
+    def _finish_seek(self):
+        """Issue the latest queued seek, or report the position the seeks ended at."""
+        self._remove_seek_timeout()
+        self.seeking = False
+        tracing.end("seek", "player")
+
+        if self.pending_seek is not None:
+            position_seconds, accurate = self.pending_seek
+            self.pending_seek = None
+            if self._start_seek(position_seconds, accurate):
+                return
+
+        if self.seeked_callback:
+            self.seeked_callback(self.get_position())
+
+    def _clear_seek(self):
+        """Forget the seek in flight and the queued one, e.g. when the track changes."""
+        if self.seeking:
+            tracing.end("seek", "player")
+        self._remove_seek_timeout()
+        self.seeking = False
+        self.pending_seek = None
+
+    def _remove_seek_timeout(self):
+        """Remove the timeout of the seek in flight, if there is one."""
+        if self.seek_timeout_id is not None:
+            GLib.source_remove(self.seek_timeout_id)
+            self.seek_timeout_id = None
         
     def get_position(self):
         """Get the current playback position in seconds."""
@@ -105,4 +498,332 @@ class AudioPlayer:
             GLib.source_remove(self.timeout_id)
             
         self.timeout_id = GLib.timeout_add(interval, callback)
-        return self.timeout_id
\ No newline at end of file
+        return self.timeout_id
+
+class CrossfadePlayer:
+    """
+    Plays tracks on two AudioPlayer decks, fading each one into the next.
+
+    The queued next track is opened on the idle deck and prerolled well
+    before the fade, so its decoder has data ready however slow the storage
+    is. Both pipelines run on the system clock, and the incoming pipeline's
+    base time is set to the clock time the fade starts at, so both ramps run
+    against the same clock. Each deck's "fade" volume element is driven by a
+    GstController control source, evaluated for every sample. The audio
+    server mixes the two decks as separate streams, which keeps seeking, EOS
+    and ReplayGain separate for each track, but the fade is only as aligned
+    as the clock: each sink's latency can shift its deck slightly.
+
+    It offers the same interface as AudioPlayer, with set_next_track()
+    queueing the track to fade into and take_started_track() reporting it
+    once the fade has started.
+    """
+
+    # How long before the fade the next track is opened and prerolled, in seconds
+    PRELOAD_SECONDS = 10
+
+    # How often the position of the playing track is checked, in milliseconds
+    POLL_INTERVAL = 100
+
+    def __init__(self, replaygain_mode="track", overlap=5.0, low_latency=True):
+        """
+        Initialize the player.
+
+        Args:
+            replaygain_mode: "track" or "album" to normalize loudness with
+                             ReplayGain, "off" to play files unchanged
+            overlap: Length of the crossfade in seconds; shortened to half
+                     of the outgoing track for short tracks
+            low_latency: Switch tracks without closing the audio sink, see AudioPlayer
+
+        Raises:
+            ValueError: If the GstController library is not installed
+        """
+        gi.require_version('GstController', '1.0')
+        from gi.repository import GstController
+
+        self.overlap = overlap
+        self.clock = Gst.SystemClock.obtain()
+        self.decks = [AudioPlayer(replaygain_mode, fade=True, low_latency=low_latency)
+                      for i in range(2)]
+        self.fade_controls = {}  # deck -> control source of its fade volume
+        for deck in self.decks:
+            deck.player.use_clock(self.clock)
+            control_source = GstController.InterpolationControlSource()
+            control_source.set_property("mode", GstController.InterpolationMode.LINEAR)
+            deck.fade.add_control_binding(GstController.DirectControlBinding.new_absolute(
+                deck.fade, "volume", control_source))
+            self.fade_controls[deck] = control_source
+            deck.bus.connect("message", self._on_deck_message, deck)
+            deck.set_seeked_callback(
+                lambda position, deck=deck: self._on_deck_seeked(deck, position))
+
+        self.active = self.decks[0]  # Deck whose track is the current one
+        self.incoming = None  # Deck the next track is prerolled on
+        self.incoming_ready = False  # Whether the incoming deck finished prerolling
+        self.outgoing = None  # Deck fading out once the fade has started
+        self.next_track = None  # (path, track gain, album gain) to fade into
+        self.started_file = None  # Track the last fade started, until taken
+        self.message_callback = None
+        self.seeked_callback = None
+        self.poll_id = None
+        self.timeout_id = None
+
+    @property
+    def current_file(self):
+        """Path of the current track."""
+        return self.active.current_file
+
+    @property
+    def playing(self):
+        """Whether the current track is playing."""
+        return self.active.playing
+
+    def set_on_message_callback(self, callback):
+        """Set callback for bus messages of the current track's pipeline."""
+        self.message_callback = callback
+
+    def set_seeked_callback(self, callback):
+        """Set callback called with the new position in seconds once a seek completes."""
+        self.seeked_callback = callback
+
+    def play(self, file_path, track_gain=None, album_gain=None):
+        """Play an audio file, cutting off any fade in progress.
+
+        Args:
+            file_path: Path to the audio file
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        self._cancel_fade()
+        self._set_volume(self.active, 1.0)
+        self.active.play(file_path, track_gain, album_gain)
+        if self.poll_id is None:
+            self.poll_id = GLib.timeout_add(self.POLL_INTERVAL, self._on_poll)
+        return True
+
+    def toggle_playback(self):
+        """Toggle between play and pause."""
+        result = self.active.toggle_playback()
+        if result and self.outgoing is not None:
+            # Pause and resume the track fading out along with the new one
+            self.outgoing._set_state(Gst.State.PLAYING if self.active.playing
+                                     else Gst.State.PAUSED)
+        return result
+
+    def stop(self):
+        """Stop playback on both decks."""
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+        if self.poll_id:
+            GLib.source_remove(self.poll_id)
+            self.poll_id = None
+
+        self._cancel_fade()
+        self.active.stop()
+
+    def seek(self, position_seconds, accurate=True):
+        """Seek in the current track, ending any fade in progress.
+
+        Args:
+            position_seconds: Position to seek to
+            accurate: Seek to exactly that position rather than the nearest keyframe
+        """
+        if self.outgoing is not None:
+            self._finish_fade()
+        return self.active.seek(position_seconds, accurate)
+
+    def get_position(self):
+        """Get the current playback position in seconds."""
+        return self.active.get_position()
+
+    def get_duration(self):
+        """Get the duration of the current track in seconds."""
+        return self.active.get_duration()
+
+    def set_progress_update_callback(self, callback, interval=1000):
+        """Set a callback to update progress at regular intervals."""
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+
+        self.timeout_id = GLib.timeout_add(interval, callback)
+        return self.timeout_id
+
+    def set_next_track(self, file_path, track_gain=None, album_gain=None):
+        """Queue the track to fade into at the end of the current one.
+
+        Args:
+            file_path: Path to the audio file, or None to stop at the end
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        self.next_track = (file_path, track_gain, album_gain) if file_path else None
+
+        # A prerolled track that is no longer next is dropped
+        if self.incoming is not None and self.incoming.current_file != file_path:
+            self._cancel_preload()
+
+    def update_next_track_gain(self, file_path, track_gain=None, album_gain=None):
+        """Set the cached ReplayGain of the track queued to fade into, once it is known.
+
+        Args:
+            file_path: Path of the queued track; other tracks are ignored
+            track_gain: Cached ReplayGain track gain in dB, used if the file has no tags
+            album_gain: Cached ReplayGain album gain in dB, used in album mode
+        """
+        if self.next_track is None or self.next_track[0] != file_path:
+            return
+        self.next_track = (file_path, track_gain, album_gain)
+
+        # Already prerolled; the gain still applies from its first sample on
+        if self.incoming is not None and self.incoming.replaygain is not None:
+            self.incoming.replaygain.set_property(
+                "fallback-gain", self.incoming._get_fallback_gain(track_gain, album_gain))
+
+    def take_started_track(self):
+        """Check whether the current track was started by a fade.
+
+        Returns:
+            The path of the track faded into, or None if the track was started by play()
+        """
+        file_path = self.started_file
+        self.started_file = None
+        return file_path
+
+    def _on_poll(self):
+        """Preroll the next track and start the fade when the current track gets there."""
+        if self.outgoing is not None or not self.active.playing:
+            return True
+
+        duration = self.active.get_duration()
+        if duration <= 0:
+            return True
+        position = self.active.get_position()
+        fade_start = duration - min(self.overlap, duration / 2)
+
+        if self.incoming is None:
+            if self.next_track is not None and position >= fade_start - self.PRELOAD_SECONDS:
+                self._preload()
+        elif self.incoming_ready and position >= fade_start - 2 * self.POLL_INTERVAL / 1000:
+            # Scheduled on the clock, so polling late only shortens the fade
+            self._start_fade(max(fade_start, position), duration, position)
+        return True
+
+    def _preload(self):
+        """Open and preroll the next track on the idle deck."""
+        file_path, track_gain, album_gain = self.next_track
+        self.incoming = self.decks[1] if self.active is self.decks[0] else self.decks[0]
+        self.incoming_ready = False
+        self._set_volume(self.incoming, 0.0)
+        self.incoming.preload(file_path, track_gain, album_gain)
+
+    def _start_fade(self, fade_start, fade_end, position):
+        """
+        Start the prerolled next track so it fades in while the current one fades out.
+
+        Args:
+            fade_start: Position in the current track the fade starts at, in seconds
+            fade_end: Position the fade ends at, normally the end of the track
+            position: Current position in the current track
+        """
+        incoming = self.incoming
+        length = fade_end - fade_start
+        if length > 0:
+            self._set_ramp(self.active, fade_start, fade_end, 1.0, 0.0)
+            self._set_ramp(incoming, 0, length, 0.0, 1.0)
+
+            # Running time zero of the incoming pipeline is the moment the
+            # fade starts; its sink holds the first sample until then
+            pipeline = incoming.player
+            pipeline.set_start_time(Gst.CLOCK_TIME_NONE)
+            pipeline.set_base_time(self.clock.get_time() +
+                                   int(max(0, fade_start - position) * Gst.SECOND))
+            incoming._set_state(Gst.State.PLAYING)
+            # Let the pipeline keep its base time up to date across pauses again
+            pipeline.set_start_time(0)
+        else:
+            self._set_volume(incoming, 1.0)
+            incoming._set_state(Gst.State.PLAYING)
+        incoming.playing = True
+
+        self.outgoing = self.active
+        self.active = incoming
+        self.incoming = None
+        self.next_track = None
+        self.started_file = incoming.current_file
+
+        # The current track changed; report it like a gapless switch
+        if self.message_callback:
+            self.message_callback(incoming.bus, Gst.Message.new_stream_start(incoming.player))
+
+    def _finish_fade(self):
+        """Stop the deck that faded out and hold the new track at full volume."""
+        deck = self.outgoing
+        self.outgoing = None
+        deck.stop()
+        self._set_volume(deck, 1.0)
+        # Its fade-in ramp would otherwise play again after a seek into its start
+        self._set_volume(self.active, 1.0)
+
+    def _cancel_preload(self):
+        """Drop the prerolled next track."""
+        deck = self.incoming
+        self.incoming = None
+        deck.stop()
+        self._set_volume(deck, 1.0)
+
+    def _cancel_fade(self):
+        """Stop any track being prerolled or faded out."""
+        if self.incoming is not None:
+            self._cancel_preload()
+        if self.outgoing is not None:
+            self._finish_fade()
+        self.started_file = None
+
+    def _set_ramp(self, deck, start, end, from_volume, to_volume):
+        """Ramp a deck's volume linearly between two positions of its track, in seconds."""
+        control_source = self.fade_controls[deck]
+        control_source.unset_all()
+        control_source.set(int(start * Gst.SECOND), from_volume)
+        control_source.set(int(end * Gst.SECOND), to_volume)
+
+    def _set_volume(self, deck, volume):
+        """Hold a deck's volume at one level."""
+        control_source = self.fade_controls[deck]
+        control_source.unset_all()
+        control_source.set(0, volume)
+
+    def _on_deck_seeked(self, deck, position):
+        """Pass on completed seeks in the current track."""
+        if deck is self.active and self.seeked_callback:
+            self.seeked_callback(position)
+
+    def _on_deck_message(self, bus, message, deck):
+        """Pass on the current track's messages and follow the other deck's progress."""
+        t = message.type
+
+        if deck is self.active:
+            if t == Gst.MessageType.EOS and self.incoming is not None:
+                # The track ended before the fade could start, e.g. because
+                # the next one prerolled late: continue without a fade
+                self._start_fade(0, 0, 0)
+                self._finish_fade()
+                return
+            if self.message_callback:
+                self.message_callback(bus, message)
+
+        elif deck is self.incoming:
+            if t == Gst.MessageType.ASYNC_DONE:
+                self.incoming_ready = True
+            elif t == Gst.MessageType.ERROR:
+                err, debug = message.parse_error()
+                print(f"Error preloading {deck.current_file}: {err}")
+                # Don't retry; the current track ends normally and the app
+                # moves on from there
+                self.next_track = None
+                self._cancel_preload()
+
+        elif deck is self.outgoing:
+            if t in (Gst.MessageType.EOS, Gst.MessageType.ERROR):
+                self._finish_fade()
@@ -0,0 +1,136 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from metadata_cache import get_metadata_cache, is_fresh
+
+# Read size when the whole file is read to get it into the page cache
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Album art size shown in the player controls
+ART_SIZE = 128
+
+
+class Prefetcher:
+    """
+    Warms caches for the tracks that play next, on a background thread.
+
+    For each track the file's data is pulled into the OS page cache, with
+    posix_fadvise(WILLNEED) where available and by reading it otherwise, so
+    playback doesn't stall on a cold read from a slow disk or network share.
+    Its metadata and player-sized album art are then loaded and kept in
+    memory until take() hands them to the player. Starting a new prefetch
+    or calling cancel() stops the work in progress at the next step.
+    """
+
+    def __init__(self, metadata_cache=None, loaded_callback=None):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            metadata_cache: MetadataCache to load tracks through, the shared one by default
+            loaded_callback: Called on the GLib main loop as loaded_callback(path, track)
+                             with the CachedTrack of each prefetched track
+        """
+        self.metadata_cache = metadata_cache or get_metadata_cache()
+        self.loaded_callback = loaded_callback
+        # One thread: prefetching must never compete with the folder scanner
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+        # Incremented whenever the queue changes, so stale work can be recognized
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.paths = []  # Tracks of the current prefetch, in queue order
+        self.loaded = {}  # path -> (CachedTrack, album art pixbuf or None)
+
+    def prefetch(self, paths):
+        """
+        Start warming the caches for upcoming tracks, cancelling any prefetch in progress.
+
+        Args:
+            paths: Paths of the next tracks, in the order they will play
+        """
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.paths = list(paths)
+            # Keep what was already loaded for tracks that are still coming up
+            self.loaded = {path: loaded for path, loaded in self.loaded.items()
+                           if path in self.paths}
+        self.executor.submit(self._prefetch, generation, list(paths))
+
+    def cancel(self):
+        """Stop the prefetch in progress and forget what it loaded."""
+        with self.lock:
+            self.generation += 1
+            self.paths = []
+            self.loaded = {}
+
+    def take(self, file_path):
+        """
+        Get the prefetched metadata and album art for a track.
+
+        Returns:
+            A (CachedTrack, album art pixbuf or None) tuple, or None if the
+            track wasn't prefetched or has changed on disk since
+        """
+        with self.lock:
+            loaded = self.loaded.pop(file_path, None)
+        if loaded is None:
+            return None
+
+        try:
+            if not is_fresh(loaded[0], os.stat(file_path)):
+                return None
+        except OSError:
+            return None
+        return loaded
+
+    def shutdown(self):
+        """Cancel the prefetch and stop the worker thread."""
+        self.cancel()
+        self.executor.shutdown(wait=False)
+
+    def _is_current(self, generation):
+        """Check whether a prefetch hasn't been superseded or cancelled."""
+        return generation == self.generation
+
+    def _prefetch(self, generation, paths):
+        """Warm the caches for each track in turn on the worker thread."""
+        for file_path in paths:
+            if not self._is_current(generation):
+                return
+            with tracing.span("prefetch", "prefetch", path=file_path):
+                try:
+                    self._read_ahead(generation, file_path)
+                    if not self._is_current(generation):
+                        return
+                    track = self.metadata_cache.get_track(file_path)
+                    if track is None:
+                        continue
+                    album_art = self.metadata_cache.get_cover_pixbuf(track, ART_SIZE)
+                except Exception as e:
+                    print(f"Error prefetching {file_path}: {e}")
+                    continue
+
+            with self.lock:
+                if not (self._is_current(generation) and file_path in self.paths):
+                    return
+                self.loaded[file_path] = (track, album_art)
+            if self.loaded_callback:
+                from gi.repository import GLib
+                GLib.idle_add(self.loaded_callback, file_path, track)
+
+    def _read_ahead(self, generation, file_path):
+        """Get a file's data into the page cache without holding on to it."""
+        with open(file_path, "rb") as f:
+            if hasattr(os, "posix_fadvise"):
+                # The kernel reads the file in the background
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                return
+
+            # Read it ourselves, stopping early if the queue changed
+            while f.read(READ_CHUNK_SIZE):
+                if not self._is_current(generation):
+                    return
@@ -0,0 +1,354 @@
+import os
+import time
+import threading
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+from utils import list_directory, MUTAGEN_AVAILABLE
+from metadata_cache import get_metadata_cache
+
+if MUTAGEN_AVAILABLE:
+    from mutagen import File as MutagenFile
+    from mutagen.id3 import ID3, TXXX
+    from mutagen.mp4 import MP4, MP4FreeForm
+
+# Summary of an analysis run
+AnalysisStats = namedtuple('AnalysisStats', [
+    'albums', 'tracks', 'skipped', 'failed', 'seconds', 'cancelled',
+])
+
+# How long to wait for bus messages before checking for cancellation, in nanoseconds
+POLL_INTERVAL = 100 * Gst.MSECOND
+
+
+class ReplayGainAnalyzer:
+    """
+    Measures ReplayGain values for many tracks at once, one album per core.
+
+    Every worker thread runs its own rganalysis pipeline and decodes the
+    tracks of one album (the audio files of one folder) back to back, so
+    rganalysis can compute album gain as well as track gain. Decoding runs
+    as fast as the CPU allows. Results are stored in the metadata cache and
+    optionally written to the files' tags; tracks that already have values
+    are skipped.
+    """
+
+    def __init__(self, max_workers=None, metadata_cache=None, write_tags=False):
+        """
+        Initialize the analyzer.
+
+        Args:
+            max_workers: Number of albums analyzed in parallel (one per core by default)
+            metadata_cache: MetadataCache to write to (the shared one by default)
+            write_tags: Also write the results to the files' ReplayGain tags
+        """
+        if not Gst.is_initialized():
+            Gst.init(None)
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.metadata_cache = metadata_cache or get_metadata_cache()
+        self.write_tags = write_tags and MUTAGEN_AVAILABLE
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def analyze_folder(self, folder_path, force=False, progress_callback=None):
+        """
+        Analyze the audio files of a single folder as one album.
+
+        Args:
+            folder_path: Folder to analyze
+            force: Analyze tracks that already have ReplayGain values as well
+            progress_callback: See analyze()
+
+        Returns:
+            An AnalysisStats record
+        """
+        try:
+            folders, audio_files = list_directory(folder_path)
+        except OSError as e:
+            print(f"Error listing directory: {e}")
+            audio_files = []
+
+        tracks = [self.metadata_cache.get_track(path) for name, path in audio_files]
+        return self.analyze([track for track in tracks if track is not None],
+                            force, progress_callback)
+
+    def analyze_library(self, root, force=False, progress_callback=None):
+        """
+        Analyze every indexed track below a folder, one album per folder.
+
+        Only tracks already in the metadata cache are analyzed, so the
+        library should be indexed with a LibraryIndexer first.
+
+        Args:
+            root: Root folder of the library
+            force: Analyze tracks that already have ReplayGain values as well
+            progress_callback: See analyze()
+
+        Returns:
+            An AnalysisStats record
+        """
+        return self.analyze(self.metadata_cache.lookup_tree(os.path.abspath(root)),
+                            force, progress_callback)
+
+    def analyze(self, tracks, force=False, progress_callback=None):
+        """
+        Analyze tracks, blocking until they are done.
+
+        Args:
+            tracks: CachedTrack records. Tracks in the same folder form an album.
+            force: Analyze tracks that already have ReplayGain values as well
+            progress_callback: Called from worker threads as
+                               progress_callback(tracks_done, tracks_total)
+
+        Returns:
+            An AnalysisStats record
+        """
+        self.cancelled = False
+        start = time.monotonic()
+
+        albums = OrderedDict()
+        for track in sorted(tracks, key=lambda track: track.path):
+            albums.setdefault(os.path.dirname(track.path), []).append(track)
+
+        # An album is only analyzed again if one of its tracks lacks values
+        skipped = 0
+        if not force:
+            for folder, album in list(albums.items()):
+                if all(track.track_gain is not None for track in album):
+                    skipped += len(album)
+                    del albums[folder]
+
+        total = sum(len(album) for album in albums.values())
+        self.done = 0
+        analyzed = failed = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="replaygain") as executor:
+            futures = [executor.submit(self._analyze_album, album, total, progress_callback)
+                       for album in albums.values()]
+            for future in as_completed(futures):
+                try:
+                    album_analyzed, album_failed = future.result()
+                except Exception as e:
+                    print(f"Error analyzing album: {e}")
+                    continue
+                analyzed += album_analyzed
+                failed += album_failed
+
+        return AnalysisStats(
+            albums=len(albums),
+            tracks=analyzed,
+            skipped=skipped,
+            failed=failed,
+            seconds=time.monotonic() - start,
+            cancelled=self.cancelled,
+        )
+
+    def analyze_in_background(self, folder_path, done_callback=None, recursive=False, force=False):
+        """
+        Analyze a folder on a background thread.
+
+        Args:
+            folder_path: Folder to analyze
+            done_callback: Called with the AnalysisStats on the GLib main loop
+            recursive: Analyze every indexed track below the folder, as
+                       analyze_library() does, instead of just the folder
+            force: See analyze()
+        """
+        def run():
+            if recursive:
+                stats = self.analyze_library(folder_path, force=force)
+            else:
+                stats = self.analyze_folder(folder_path, force=force)
+            if done_callback:
+                from gi.repository import GLib
+                GLib.idle_add(done_callback, stats)
+
+        thread = threading.Thread(target=run, name="replaygain-analysis", daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self):
+        """Stop analyzing once the tracks currently being decoded are done."""
+        self.cancelled = True
+
+    def _create_pipeline(self):
+        """Build a decoding pipeline that ends in rganalysis."""
+        pipeline = Gst.Pipeline.new("replaygain-analysis")
+        decoder = Gst.ElementFactory.make("uridecodebin", "decoder")
+        convert = Gst.ElementFactory.make("audioconvert", "convert")
+        resample = Gst.ElementFactory.make("audioresample", "resample")
+        analysis = Gst.ElementFactory.make("rganalysis", "analysis")
+        sink = Gst.ElementFactory.make("fakesink", "sink")
+        if None in (decoder, convert, resample, analysis, sink):
+            raise RuntimeError("GStreamer rganalysis or decoding elements are not installed")
+
+        # Decode as fast as possible instead of in real time
+        sink.set_property("sync", False)
+
+        for element in (decoder, convert, resample, analysis, sink):
+            pipeline.add(element)
+        convert.link(resample)
+        resample.link(analysis)
+        analysis.link(sink)
+
+        decoder.connect("pad-added", self._on_pad_added, convert)
+        return pipeline, decoder, analysis
+
+    def _on_pad_added(self, decoder, pad, convert):
+        """Link the decoder's audio output, ignoring any other streams."""
+        sink_pad = convert.get_static_pad("sink")
+        if sink_pad.is_linked():
+            return
+        caps = pad.get_current_caps() or pad.query_caps(None)
+        if caps.get_size() and caps.get_structure(0).get_name().startswith("audio/"):
+            pad.link(sink_pad)
+
+    def _analyze_album(self, album, total, progress_callback):
+        """Analyze the tracks of one album on a worker thread.
+
+        Returns:
+            A (tracks analyzed, tracks failed) tuple
+        """
+        pipeline, decoder, analysis = self._create_pipeline()
+        bus = pipeline.get_bus()
+
+        # rganalysis computes the album gain over the next num-tracks tracks
+        analysis.set_property("num-tracks", len(album))
+
+        results = []
+        failed = 0
+        album_gain = album_peak = None
+        try:
+            for track in album:
+                if self.cancelled:
+                    break
+
+                decoder.set_property("uri", Gst.filename_to_uri(track.path))
+                pipeline.set_state(Gst.State.PLAYING)
+                gains = self._wait_for_track(bus, analysis)
+                # Stopping rganalysis would reset its album state, so it is
+                # kept PLAYING while the rest of the pipeline is cycled
+                analysis.set_locked_state(True)
+                pipeline.set_state(Gst.State.READY)
+                # Drop messages left over from this track
+                bus.set_flushing(True)
+                bus.set_flushing(False)
+
+                if gains is None or gains[0] is None:
+                    failed += 1
+                else:
+                    results.append((track, gains[0], gains[1]))
+                    if gains[2] is not None:
+                        album_gain, album_peak = gains[2], gains[3]
+
+                with self.lock:
+                    self.done += 1
+                    done = self.done
+                if progress_callback:
+                    progress_callback(done, total)
+        finally:
+            analysis.set_locked_state(False)
+            analysis.set_state(Gst.State.NULL)
+            pipeline.set_state(Gst.State.NULL)
+
+        # Album gain is only meaningful if every track of the album was analyzed
+        if failed or self.cancelled:
+            album_gain = album_peak = None
+
+        for track, track_gain, track_peak in results:
+            self._store(track, track_gain, track_peak, album_gain, album_peak)
+        return len(results), failed
+
+    def _wait_for_track(self, bus, analysis):
+        """Wait for the current track to be decoded.
+
+        Returns:
+            A (track gain, track peak, album gain, album peak) tuple, or None
+            if the track could not be decoded or the analysis was cancelled
+        """
+        gains = [None, None, None, None]
+        message_types = Gst.MessageType.TAG | Gst.MessageType.EOS | Gst.MessageType.ERROR
+
+        while not self.cancelled:
+            message = bus.timed_pop_filtered(POLL_INTERVAL, message_types)
+            if message is None:
+                continue
+
+            if message.type == Gst.MessageType.ERROR:
+                error, debug = message.parse_error()
+                print(f"Error analyzing track: {error.message}")
+                return None
+            if message.type == Gst.MessageType.EOS:
+                return tuple(gains)
+
+            # Decoders also post the file's existing tags; only rganalysis' count
+            if message.src != analysis:
+                continue
+            tag_list = message.parse_tag()
+            for index, tag in enumerate((Gst.TAG_TRACK_GAIN, Gst.TAG_TRACK_PEAK,
+                                         Gst.TAG_ALBUM_GAIN, Gst.TAG_ALBUM_PEAK)):
+                found, value = tag_list.get_double(tag)
+                if found:
+                    gains[index] = value
+        return None
+
+    def _store(self, track, track_gain, track_peak, album_gain, album_peak):
+        """Store a track's results in the cache, and in its tags if enabled."""
+        self.metadata_cache.store_replaygain(track, track_gain, track_peak, album_gain, album_peak)
+        if not self.write_tags:
+            return
+
+        try:
+            write_replaygain_tags(track.path, track_gain, track_peak, album_gain, album_peak)
+        except Exception as e:
+            print(f"Error writing ReplayGain tags to {track.path}: {e}")
+            return
+        # The file changed; probe it again so the cache stays valid
+        self.metadata_cache.get_track(track.path)
+
+
+def write_replaygain_tags(file_path, track_gain, track_peak, album_gain=None, album_peak=None):
+    """
+    Write ReplayGain values to a file's tags.
+
+    Uses TXXX frames for ID3, freeform atoms for MP4 and plain keys for
+    Vorbis comments and APEv2 tags. Album values that are None are left
+    untouched.
+
+    Args:
+        file_path: Path to the audio file
+        track_gain: Track gain in dB
+        track_peak: Track peak amplitude
+        album_gain: Album gain in dB, or None
+        album_peak: Album peak amplitude, or None
+    """
+    values = OrderedDict()
+    values["replaygain_track_gain"] = f"{track_gain:.2f} dB"
+    values["replaygain_track_peak"] = f"{track_peak:.6f}"
+    if album_gain is not None:
+        values["replaygain_album_gain"] = f"{album_gain:.2f} dB"
+        values["replaygain_album_peak"] = f"{album_peak:.6f}"
+
+    audio = MutagenFile(file_path)
+    if audio is None:
+        raise ValueError("unsupported file format")
+    if audio.tags is None:
+        audio.add_tags()
+
+    if isinstance(audio.tags, ID3):
+        for name, value in values.items():
+            audio.tags.delall(f"TXXX:{name}")
+            audio.tags.add(TXXX(encoding=3, desc=name, text=[value]))
+    elif isinstance(audio, MP4):
+        for name, value in values.items():
+            audio.tags[f"----:com.apple.iTunes:{name}"] = [MP4FreeForm(value.encode("utf-8"))]
+    else:
+        for name, value in values.items():
+            audio.tags[name] = value
+    audio.save()
@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+gi.require_version('GLib', '2.0')
+from gi.repository import GLib
+
+from utils import list_directory, track_sort_key
+from metadata_cache import get_metadata_cache
+
+
+class FolderScanner:
+    """
+    Lists folders and probes audio files on worker threads.
+
+    Listing a folder never touches tags; metadata is only loaded for files
+    that are explicitly requested, typically the rows currently on screen.
+    Durations mutagen could only estimate are measured afterwards by the
+    DurationProber, and the track is delivered a second time once they are.
+    Results are queued and handed to the GTK main loop from an idle callback
+    that only runs for a small time budget per frame, so large folders never
+    block drawing or input. Starting a new scan makes the results of any
+    previous scan stale; those are dropped instead of delivered.
+    """
+
+    # Main-loop time spent delivering results per idle callback, in seconds
+    FRAME_BUDGET = 0.008
+
+    # Number of audio files handed to the listing callback at a time
+    BATCH_SIZE = 512
+
+    def __init__(self, max_workers=None, sniff=False):
+        """
+        Initialize the scanner.
+
+        Args:
+            max_workers: Number of worker threads used for tag probing
+            sniff: Also recognize audio files by their content, for files
+                   with a missing or wrong extension
+        """
+        self.sniff = sniff
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="folder-scanner")
+
+        # Incremented on every scan so stale work can be recognized
+        self.generation = 0
+
+        # Results waiting to be delivered on the main loop
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.idle_id = None
+
+        # Files whose metadata has been requested and not yet delivered
+        self.wanted = set()
+
+        # Cache entries for the folder being scanned, loaded in one query
+        self.cached_tracks = {}
+
+    def scan(self, folder_path, listing_callback, sort_mode="track"):
+        """
+        Start listing a folder, cancelling any scan in progress.
+
+        Args:
+            folder_path: Folder to scan
+            listing_callback: Called as listing_callback(folders, audio_files).
+                              folders is a list of (name, full path) tuples and
+                              audio_files a list of (name, full path, cached track)
+                              tuples, where the cached track is the file's last
+                              known CachedTrack record or None. All folders come
+                              in the first call, audio files in batches after it.
+            sort_mode: One of utils.SORT_MODES; audio files are delivered in this order
+        """
+        self.cancel()
+        generation = self.generation
+        self.executor.submit(self._list_folder, generation, folder_path,
+                             listing_callback, sort_mode)
+
+    def search(self, text, results_callback):
+        """
+        Search the library catalog, cancelling any scan in progress.
+
+        Args:
+            text: The search text
+            results_callback: Called as results_callback(tracks) with batches
+                              of matching CachedTrack records. Called once with
+                              an empty list if nothing matches.
+        """
+        self.cancel()
+        generation = self.generation
+        self.executor.submit(self._search, generation, text, results_callback)
+
+    def request_track(self, file_path, track_callback):
+        """
+        Load metadata and the list thumbnail for a file in the background.
+
+        Repeated requests for a file that is already queued are ignored.
+
+        Args:
+            file_path: Path to the audio file
+            track_callback: Called as track_callback(track, album_art) on the
+                            main loop once the metadata is available, and
+                            again if the duration had to be measured
+        """
+        with self.lock:
+            if file_path in self.wanted:
+                return
+            self.wanted.add(file_path)
+            generation = self.generation
+        self.executor.submit(self._probe_track, generation, file_path, track_callback)
+
+    def release_track(self, file_path):
+        """Withdraw a request for a file that is no longer needed."""
+        with self.lock:
+            self.wanted.discard(file_path)
+
+    def cancel(self):
+        """Cancel the current scan and drop any undelivered results."""
+        with self.lock:
+            self.generation += 1
+            self.pending.clear()
+            self.wanted.clear()
+            self.cached_tracks = {}
+
+    def shutdown(self):
+        """Cancel outstanding work and stop the worker threads."""
+        self.cancel()
+        self.executor.shutdown(wait=False)
+
+    def _list_folder(self, generation, folder_path, listing_callback, sort_mode):
+        """List a folder on a worker thread."""
+        metadata_cache = get_metadata_cache()
+        try:
+            folders, audio_files = list_directory(
+                folder_path, metadata_cache.sniff_files if self.sniff else None)
+        except OSError as e:
+            print(f"Error listing directory: {e}")
+            folders, audio_files = [], []
+
+        # Load everything we already know about this folder in one query, so
+        # rows can be sorted and shown straight away and requests for
+        # individual rows don't each need their own lookup
+        cached_tracks = metadata_cache.lookup_folder(folder_path)
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.cached_tracks = cached_tracks
+
+        audio_files = [(name, path, cached_tracks.get(path)) for name, path in audio_files]
+        audio_files.sort(key=lambda entry: track_sort_key(sort_mode, entry[0], entry[2]))
+
+        self._post(generation, listing_callback, folders, audio_files[:self.BATCH_SIZE])
+        for start in range(self.BATCH_SIZE, len(audio_files), self.BATCH_SIZE):
+            self._post(generation, listing_callback, [], audio_files[start:start + self.BATCH_SIZE])
+
+    def _search(self, generation, text, results_callback):
+        """Query the catalog on a worker thread and stream the results."""
+        if generation != self.generation:
+            return
+
+        tracks = get_metadata_cache().search(text)
+        self._post(generation, results_callback, tracks[:self.BATCH_SIZE])
+        for start in range(self.BATCH_SIZE, len(tracks), self.BATCH_SIZE):
+            self._post(generation, results_callback, tracks[start:start + self.BATCH_SIZE])
+
+    def _probe_track(self, generation, file_path, track_callback):
+        """Load metadata and the list thumbnail for a single file on a worker thread."""
+        with self.lock:
+            # Skip files that scrolled out of view before we got to them
+            if generation != self.generation or file_path not in self.wanted:
+                return
+            cached = self.cached_tracks.get(file_path)
+
+        try:
+            metadata_cache = get_metadata_cache()
+            track = metadata_cache.get_track(file_path, cached=cached)
+            if track is None:
+                return
+            album_art = metadata_cache.get_cover_pixbuf(track)
+        except Exception as e:
+            print(f"Error scanning {file_path}: {e}")
+            return
+        finally:
+            self.release_track(file_path)
+
+        self._post(generation, track_callback, track, album_art)
+
+        if not track.duration_exact:
+            # Imported here: most folders never need GstPbutils
+            from discoverer import get_duration_prober
+            get_duration_prober().probe(
+                track, lambda track: self._post(generation, track_callback, track, album_art))
+
+    def _post(self, generation, callback, *args):
+        """Queue a result for delivery on the main loop."""
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.pending.append((generation, callback, args))
+            if self.idle_id is None:
+                self.idle_id = GLib.idle_add(self._deliver)
+
+    def _deliver(self):
+        """Deliver queued results until the frame budget is used up."""
+        deadline = time.monotonic() + self.FRAME_BUDGET
+
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.idle_id = None
+                    return False
+                generation, callback, args = self.pending.popleft()
+
+            if generation == self.generation:
+                callback(*args)
+
+            if time.monotonic() >= deadline:
+                # Let GTK draw a frame before continuing
+                return True
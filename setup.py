@@ -9,8 +9,8 @@ setup(
     author="Ivan",
     author_email="ivan@example.com",
     url="https://github.com/ivanthecrazy/folder-audio-player",
-    packages=find_packages(),
-    py_modules=["app", "main", "mpris", "player", "utils"],
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    py_modules=["app", "audio_formats", "cli", "discoverer", "duplicates", "library", "main", "metadata_cache", "mpris", "player", "prefetch", "replaygain", "scanner", "thumbnail_cache", "tracing", "utils"],
     include_package_data=True,
     install_requires=[
         "PyGObject",
@@ -0,0 +1,213 @@
+import os
+import threading
+from collections import OrderedDict
+
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf
+
+import tracing
+from utils import load_cover_pixbuf, scale_pixbuf, get_cache_dir
+
+# Thumbnail sizes kept on disk: list rows and the "Now Playing" panel
+THUMBNAIL_SIZES = (32, 128)
+
+
+class ThumbnailCache:
+    """
+    Content-addressed cache of pre-scaled album art.
+
+    Covers are identified by a hash of the embedded image bytes, so all the
+    tracks of an album share one set of thumbnails and each unique cover is
+    decoded only once. Thumbnails are stored as PNG files on disk; the least
+    recently used ones are evicted once the cache grows past its size budget.
+    Recently used thumbnails are also kept decoded in memory.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024, max_in_memory=256):
+        """
+        Initialize the thumbnail cache.
+
+        Args:
+            cache_dir: Directory for thumbnail files. Defaults to "thumbnails"
+                       in the application's cache directory.
+            max_bytes: Size budget for the files on disk
+            max_in_memory: Number of decoded thumbnails kept in memory
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(get_cache_dir(), "thumbnails")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_in_memory = max_in_memory
+
+        for size in THUMBNAIL_SIZES:
+            os.makedirs(os.path.join(cache_dir, str(size)), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.pixbufs = OrderedDict()  # (cover hash, size) -> GdkPixbuf.Pixbuf
+
+        # Covers currently being written, so tracks of the same album probed
+        # in parallel wait for one decode instead of each doing their own
+        self.in_progress = {}  # cover hash -> threading.Event
+
+        # Size of every file on disk, built the first time we need to evict
+        self.file_sizes = None
+        self.total_bytes = 0
+
+    def get_path(self, cover_hash, size):
+        """Get the path of the thumbnail file for a cover at the given size."""
+        return os.path.join(self.cache_dir, str(size), f"{cover_hash}.png")
+
+    def has(self, cover_hash):
+        """Check whether thumbnails for a cover are on disk."""
+        return all(os.path.exists(self.get_path(cover_hash, size)) for size in THUMBNAIL_SIZES)
+
+    def store(self, cover_hash, cover_data):
+        """
+        Decode a cover once and write its thumbnails, unless they already exist.
+
+        Args:
+            cover_hash: Hash of the cover image bytes
+            cover_data: Raw cover image bytes
+
+        Returns:
+            True if thumbnails for the cover are available
+        """
+        if self.has(cover_hash):
+            return True
+
+        with self.lock:
+            event = self.in_progress.get(cover_hash)
+            if event is None:
+                self.in_progress[cover_hash] = threading.Event()
+
+        if event is not None:
+            event.wait()
+            return self.has(cover_hash)
+
+        try:
+            return self._write_thumbnails(cover_hash, cover_data)
+        finally:
+            with self.lock:
+                self.in_progress.pop(cover_hash).set()
+
+    def _write_thumbnails(self, cover_hash, cover_data):
+        """Decode a cover and write a PNG for every thumbnail size."""
+        # Decode at the largest size and derive the smaller ones from it
+        largest = load_cover_pixbuf(cover_data, max(THUMBNAIL_SIZES))
+        if largest is None:
+            return False
+
+        written = 0
+        try:
+            for size in THUMBNAIL_SIZES:
+                pixbuf = largest if size == max(THUMBNAIL_SIZES) else scale_pixbuf(largest, size)
+                path = self.get_path(cover_hash, size)
+
+                # Write to a temporary file first so readers never see a partial PNG
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                pixbuf.savev(temp_path, "png", [], [])
+                os.replace(temp_path, path)
+                written += os.path.getsize(path)
+        except Exception as e:
+            print(f"Error writing thumbnail: {e}")
+            return False
+
+        self._add_to_budget(cover_hash, written)
+        return True
+
+    def load_pixbuf(self, cover_hash, size):
+        """
+        Load a thumbnail, from memory if it was used recently.
+
+        Args:
+            cover_hash: Hash of the cover image bytes
+            size: One of THUMBNAIL_SIZES
+
+        Returns:
+            A GdkPixbuf.Pixbuf object, or None if the thumbnail is not cached
+        """
+        key = (cover_hash, size)
+        with self.lock:
+            pixbuf = self.pixbufs.get(key)
+            if pixbuf is not None:
+                self.pixbufs.move_to_end(key)
+                return pixbuf
+
+        try:
+            with tracing.span("load_thumbnail", "art", size=size):
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(self.get_path(cover_hash, size))
+            # Mark the cover as recently used; eviction looks at the smallest size
+            os.utime(self.get_path(cover_hash, THUMBNAIL_SIZES[0]))
+        except Exception:
+            return None
+
+        with self.lock:
+            self.pixbufs[key] = pixbuf
+            while len(self.pixbufs) > self.max_in_memory:
+                self.pixbufs.popitem(last=False)
+        return pixbuf
+
+    def _add_to_budget(self, cover_hash, written):
+        """Account for newly written thumbnails and evict old ones if needed."""
+        with self.lock:
+            if self.file_sizes is None:
+                self._index_files()
+            else:
+                self.file_sizes[cover_hash] = written
+                self.total_bytes += written
+
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _index_files(self):
+        """Measure the thumbnails on disk. Called with the lock held."""
+        self.file_sizes = {}
+        for size in THUMBNAIL_SIZES:
+            with os.scandir(os.path.join(self.cache_dir, str(size))) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".png"):
+                        continue
+                    cover_hash = entry.name[:-len(".png")]
+                    try:
+                        file_size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    self.file_sizes[cover_hash] = self.file_sizes.get(cover_hash, 0) + file_size
+        self.total_bytes = sum(self.file_sizes.values())
+
+    def _evict(self):
+        """Remove least recently used covers until the budget is met. Called with the lock held."""
+        def last_used(cover_hash):
+            try:
+                return os.stat(self.get_path(cover_hash, THUMBNAIL_SIZES[0])).st_mtime
+            except OSError:
+                return 0
+
+        # Leave some headroom so we don't evict on every store
+        target = self.max_bytes * 0.9
+        for cover_hash in sorted(self.file_sizes, key=last_used):
+            if self.total_bytes <= target:
+                break
+
+            for size in THUMBNAIL_SIZES:
+                try:
+                    os.remove(self.get_path(cover_hash, size))
+                except OSError:
+                    pass
+                self.pixbufs.pop((cover_hash, size), None)
+
+            self.total_bytes -= self.file_sizes.pop(cover_hash)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_thumbnail_cache():
+    """Get the shared ThumbnailCache instance, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ThumbnailCache()
+    return _cache
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+
+# Setting this to a file path writes a trace of the session to that file
+TRACE_ENV = "FOLDER_AUDIO_PLAYER_TRACE"
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Context manager recording how long its block took."""
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.complete(self.name, self.category, self.start, time.perf_counter(),
+                             self.args)
+        return False
+
+
+class Tracer:
+    """
+    Collects trace events in memory and writes them in the Chrome trace-event
+    JSON format, which Perfetto (ui.perfetto.dev) and chrome://tracing open.
+
+    Spans are "complete" events on the thread that ran them. Spans that start
+    in one callback and end in another, such as a pipeline state change, are
+    async events, shown on their own track.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the tracer.
+
+        Args:
+            path: File the trace is written to by write()
+        """
+        self.path = path
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.thread_names = {}  # thread id -> name
+        self.async_spans = {}  # (category, name) -> id of the open async span
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def _timestamp(self, seconds):
+        """Convert a time.perf_counter() value to trace microseconds."""
+        return (seconds - self.origin) * 1000000
+
+    def _thread_id(self):
+        """Get the current thread's id, remembering its name for the trace."""
+        thread_id = threading.get_ident()
+        if thread_id not in self.thread_names:
+            self.thread_names[thread_id] = threading.current_thread().name
+        return thread_id
+
+    def complete(self, name, category, start, end, args=None):
+        """Record a span that ran from start to end on the current thread."""
+        event = {"name": name, "cat": category, "ph": "X", "pid": self.pid,
+                 "tid": self._thread_id(), "ts": self._timestamp(start),
+                 "dur": (end - start) * 1000000}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def instant(self, name, category, args=None):
+        """Record a point in time on the current thread."""
+        event = {"name": name, "cat": category, "ph": "i", "s": "t", "pid": self.pid,
+                 "tid": self._thread_id(), "ts": self._timestamp(time.perf_counter())}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def begin(self, name, category, args=None):
+        """
+        Start an async span, ended later by end() with the same name and category.
+
+        An async span of the same name that is still open is ended first; it
+        was superseded, e.g. by another state change before the first finished.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            previous = self.async_spans.get((category, name))
+            span_id = self.next_id
+            self.next_id += 1
+            self.async_spans[(category, name)] = span_id
+        if previous is not None:
+            self._async_event(name, category, "e", previous, now, {"superseded": True})
+        self._async_event(name, category, "b", span_id, now, args)
+
+    def end(self, name, category, args=None):
+        """End the open async span with this name and category, if there is one."""
+        now = time.perf_counter()
+        with self.lock:
+            span_id = self.async_spans.pop((category, name), None)
+        if span_id is not None:
+            self._async_event(name, category, "e", span_id, now, args)
+
+    def _async_event(self, name, category, phase, span_id, now, args):
+        """Record the beginning or end of an async span."""
+        event = {"name": name, "cat": category, "ph": phase, "id": span_id,
+                 "pid": self.pid, "tid": self._thread_id(), "ts": self._timestamp(now)}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def write(self):
+        """Write the events recorded so far to the trace file."""
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid,
+                     "args": {"name": "folder-audio-player"}}]
+        for thread_id, thread_name in list(self.thread_names.items()):
+            metadata.append({"name": "thread_name", "ph": "M", "pid": self.pid,
+                             "tid": thread_id, "args": {"name": thread_name}})
+
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"traceEvents": metadata + list(self.events),
+                           "displayTimeUnit": "ms"}, f)
+        except OSError as e:
+            print(f"Error writing trace: {e}", file=sys.stderr)
+            return
+        print(f"Trace with {len(self.events)} events written to {self.path}", file=sys.stderr)
+
+
+_tracer = None
+
+def enable(path):
+    """
+    Start recording a trace, written to path when the process exits.
+
+    Calling it again keeps the trace already being recorded.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(path)
+        atexit.register(_tracer.write)
+    return _tracer
+
+def enabled():
+    """Check whether a trace is being recorded."""
+    return _tracer is not None
+
+def span(name, category, **args):
+    """
+    Time a block of code:
+
+        with tracing.span("list_directory", "scan", path=folder_path):
+            ...
+
+    While tracing is off this returns a shared do-nothing context manager.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, category, args)
+
+def traced(category, name=None):
+    """
+    Decorator recording a span for every call of a function.
+
+    Args:
+        category: Trace category, e.g. "scan" or "mpris"
+        name: Span name, the function's qualified name by default
+    """
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _Span(_tracer, span_name, category, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instant(name, category, **args):
+    """Mark a point in time."""
+    if _tracer is not None:
+        _tracer.instant(name, category, args)
+
+def begin(name, category, **args):
+    """Start a span that is ended by end() from another callback."""
+    if _tracer is not None:
+        _tracer.begin(name, category, args)
+
+def end(name, category, **args):
+    """End a span started by begin(); does nothing if none is open."""
+    if _tracer is not None:
+        _tracer.end(name, category, args)
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
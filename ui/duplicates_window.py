@@ -0,0 +1,187 @@
+import os
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Gtk, Gio, GLib, Pango, Adw
+
+from duplicates import DuplicateFinder
+
+# Status shown while each round of the search runs
+STAGE_LABELS = {
+    "size": "Comparing audio sizes of {} files…",
+    "partial": "Comparing the start of {} files…",
+    "full": "Comparing {} files completely…",
+}
+
+class DuplicatesWindow(Adw.Window):
+    """Window listing audio files with identical audio, grouped, for cleaning up."""
+
+    def __init__(self, parent, root, files_removed_callback=None):
+        """
+        Create the window and start searching for duplicates.
+
+        Args:
+            parent: Window the duplicates window belongs to
+            root: Folder to search
+            files_removed_callback: Called as files_removed_callback(paths) after
+                                    files were moved to the trash
+        """
+        super().__init__(transient_for=parent, modal=False)
+        self.set_default_size(700, 500)
+        self.set_title("Duplicates")
+
+        self.root = root
+        self.files_removed_callback = files_removed_callback
+        self.groups = []
+        self.check_buttons = {}  # path -> Gtk.CheckButton
+
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+
+        header = Adw.HeaderBar()
+        header.set_title_widget(Gtk.Label(label="Duplicates"))
+
+        self.trash_button = Gtk.Button(label="Move to Trash")
+        self.trash_button.add_css_class("destructive-action")
+        self.trash_button.set_sensitive(False)
+        self.trash_button.connect("clicked", self._on_trash_clicked)
+        header.pack_end(self.trash_button)
+
+        self.select_button = Gtk.Button(label="Select Extra Copies")
+        self.select_button.set_tooltip_text("Select all but the first file of every group")
+        self.select_button.set_sensitive(False)
+        self.select_button.connect("clicked", self._on_select_clicked)
+        header.pack_start(self.select_button)
+
+        main_box.append(header)
+
+        self.status_label = Gtk.Label()
+        self.status_label.set_halign(Gtk.Align.START)
+        self.status_label.set_margin_start(10)
+        self.status_label.set_margin_end(10)
+        self.status_label.set_margin_top(10)
+        self.status_label.set_margin_bottom(5)
+        self.status_label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+        main_box.append(self.status_label)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_vexpand(True)
+
+        self.list_box = Gtk.ListBox()
+        self.list_box.set_selection_mode(Gtk.SelectionMode.NONE)
+        scrolled.set_child(self.list_box)
+        main_box.append(scrolled)
+
+        self.set_content(main_box)
+        self.connect("close-request", self._on_close_request)
+
+        # Search in the background; the window stays responsive meanwhile
+        self.status_label.set_text(f"Searching {root}…")
+        self.finder = DuplicateFinder()
+        self.finder.find_in_background(root, self._on_duplicates_found, self._on_progress)
+
+    def _on_progress(self, stage, files):
+        """Show which round of the search is running."""
+        self.status_label.set_text(STAGE_LABELS[stage].format(files))
+        return False
+
+    def _on_duplicates_found(self, groups):
+        """Show the groups of duplicates once the search is done."""
+        self.groups = groups
+        self.select_button.set_sensitive(bool(groups))
+        self._populate()
+        return False
+
+    def _populate(self):
+        """Fill the list with a header row and a row per file for every group."""
+        self._clear_list()
+        self.check_buttons = {}
+
+        if not self.groups:
+            self.status_label.set_text("No duplicates found")
+            self._update_trash_button()
+            return
+
+        extra = sum(len(group.paths) - 1 for group in self.groups)
+        wasted = sum(group.payload_size * (len(group.paths) - 1) for group in self.groups)
+        self.status_label.set_text(
+            f"{len(self.groups)} groups, {extra} extra copies using "
+            f"{GLib.format_size(wasted)} of audio")
+
+        for group in self.groups:
+            header = Gtk.Label()
+            header.set_markup(
+                f"<b>{len(group.paths)} copies</b> · {GLib.format_size(group.payload_size)}")
+            header.set_halign(Gtk.Align.START)
+            header.set_margin_start(10)
+            header.set_margin_top(10)
+            row = Gtk.ListBoxRow(child=header, activatable=False)
+            self.list_box.append(row)
+
+            for path in group.paths:
+                check_button = Gtk.CheckButton()
+                label = Gtk.Label(label=os.path.relpath(path, self.root))
+                label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+                label.set_xalign(0.0)
+                label.set_tooltip_text(path)
+                check_button.set_child(label)
+                check_button.set_margin_start(20)
+                check_button.connect("toggled", lambda button: self._update_trash_button())
+                self.check_buttons[path] = check_button
+                self.list_box.append(Gtk.ListBoxRow(child=check_button, activatable=False))
+
+        self._update_trash_button()
+
+    def _clear_list(self):
+        """Remove all rows from the list."""
+        row = self.list_box.get_first_child()
+        while row is not None:
+            next_row = row.get_next_sibling()
+            self.list_box.remove(row)
+            row = next_row
+
+    def _get_selected_paths(self):
+        """Get the paths of the checked files."""
+        return [path for path, button in self.check_buttons.items() if button.get_active()]
+
+    def _update_trash_button(self):
+        """Only allow trashing once files are selected."""
+        count = len(self._get_selected_paths())
+        self.trash_button.set_sensitive(count > 0)
+        self.trash_button.set_label(f"Move {count} to Trash" if count else "Move to Trash")
+
+    def _on_select_clicked(self, button):
+        """Select every file except the first of each group."""
+        for group in self.groups:
+            for index, path in enumerate(group.paths):
+                self.check_buttons[path].set_active(index > 0)
+
+    def _on_trash_clicked(self, button):
+        """Move the selected files to the trash and drop them from the list."""
+        removed = []
+        for path in self._get_selected_paths():
+            try:
+                Gio.File.new_for_path(path).trash(None)
+                removed.append(path)
+            except GLib.Error as e:
+                print(f"Error moving {path} to trash: {e.message}")
+
+        if not removed:
+            return
+
+        removed_set = set(removed)
+        groups = []
+        for group in self.groups:
+            paths = [path for path in group.paths if path not in removed_set]
+            if len(paths) > 1:
+                groups.append(group._replace(paths=paths))
+        self.groups = groups
+        self._populate()
+
+        if self.files_removed_callback:
+            self.files_removed_callback(removed)
+
+    def _on_close_request(self, window):
+        """Stop searching when the window is closed."""
+        self.finder.cancel()
+        return False
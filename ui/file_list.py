@@ -2,12 +2,80 @@ import os
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Gdk, GdkPixbuf, Pango, Adw
-
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import get_file_type, is_audio_file, extract_album_art, get_audio_metadata, get_audio_duration, format_duration
+from gi.repository import Gtk, GdkPixbuf, Gio, GLib, GObject, Pango, Adw
+
+import tracing
+from utils import (get_file_type, is_audio_file, format_duration, track_sort_key,
+                   save_setting, load_setting)
+from scanner import FolderScanner
+from metadata_cache import get_metadata_cache
+from ui.icon_cache import get_icon_cache
+
+# Maps a row kind to the file type passed to the activation callback
+ROW_FILE_TYPES = {"parent": "Folder", "folder": "Folder", "audio": "Audio"}
+
+# How long folder change events are collected before they are applied
+CHANGE_DEBOUNCE_MS = 250
+
+# How long rows are left in place after loaded metadata changes their order
+SORT_DEBOUNCE_MS = 500
+
+# Sort modes offered in the sort menu, with their labels
+SORT_MODE_LABELS = [
+    ("track", "Track number"),
+    ("name", "File name"),
+    ("album", "Album"),
+    ("artist", "Artist"),
+    ("duration", "Duration"),
+]
+
+class TrackItem(GObject.Object):
+    """A lightweight file list row. Audio metadata and art are loaded on demand."""
+
+    __gtype_name__ = "FolderAudioPlayerTrackItem"
+
+    path = GObject.Property(type=str, default="")
+    kind = GObject.Property(type=str, default="audio")  # "parent", "folder" or "audio"
+    artist = GObject.Property(type=str, default="")
+    title = GObject.Property(type=str, default="")
+    duration = GObject.Property(type=str, default="")
+    art = GObject.Property(type=GdkPixbuf.Pixbuf)  # Album art; rows without it use a themed icon
+    is_playing = GObject.Property(type=bool, default=False)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # CachedTrack record once metadata has been loaded. It may come from
+        # the cache without having been checked against the file yet.
+        self.track = None
+        self.validated = False
+        # Whether the item is currently shown by a row widget
+        self.bound = False
+        # Sort keys computed so far, by sort mode
+        self.sort_keys = {}
+
+    def set_track(self, track, validated):
+        """Show a track's metadata in the row.
+
+        Args:
+            track: A CachedTrack record
+            validated: Whether the record is known to match the file on disk
+        """
+        self.track = track
+        self.validated = validated
+        self.sort_keys = {}
+        self.freeze_notify()
+        self.artist = track.artist
+        self.title = track.title
+        self.duration = format_duration(track.duration)
+        self.thaw_notify()
+
+    def get_sort_key(self, mode):
+        """Get the item's sort key for a sort mode, computing it only once."""
+        key = self.sort_keys.get(mode)
+        if key is None:
+            key = track_sort_key(mode, os.path.basename(self.path), self.track)
+            self.sort_keys[mode] = key
+        return key
 
 class FileList(Gtk.Box):
     """UI component for displaying and selecting files."""
@@ -26,8 +94,29 @@ class FileList(Gtk.Box):
         self.folder_title = Gtk.Label()
         self.folder_title.set_markup("<b>Files</b>")
         self.folder_title.set_halign(Gtk.Align.START)
+        self.folder_title.set_hexpand(True)
         title_box.append(self.folder_title)
 
+        # Search across the whole library catalog
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Search library")
+        self.search_entry.connect("search-changed", self._on_search_changed)
+        title_box.append(self.search_entry)
+        self.search_text = ""
+
+        # Sort order of the audio files
+        self.sort_mode = load_setting("sort_mode", "track")
+        sort_modes = [mode for mode, label in SORT_MODE_LABELS]
+        if self.sort_mode not in sort_modes:
+            self.sort_mode = "track"
+        self.sort_dropdown = Gtk.DropDown.new_from_strings(
+            [label for mode, label in SORT_MODE_LABELS])
+        self.sort_dropdown.set_selected(sort_modes.index(self.sort_mode))
+        self.sort_dropdown.set_margin_start(5)
+        self.sort_dropdown.set_tooltip_text("Sort by")
+        self.sort_dropdown.connect("notify::selected", self._on_sort_mode_changed)
+        title_box.append(self.sort_dropdown)
+
         self.append(title_box)
 
         # Create a scrolled window for the file list
@@ -35,46 +124,25 @@ class FileList(Gtk.Box):
         scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
         scrolled.set_vexpand(True)
 
-        # Create a list store for the files
-        # Columns: Pixbuf, Artist, Title, Full path, Is Playing, Duration
-        self.list_store = Gtk.ListStore(GdkPixbuf.Pixbuf, str, str, str, bool, str)
-
-        # Create a tree view for the file list
-        self.tree_view = Gtk.TreeView(model=self.list_store)
-        self.tree_view.set_headers_visible(False)
-
-        # Create a default album art icon
-        self.default_icon = self._create_default_icon()
-
-        # Add a single column with a custom cell renderer
-        renderer = Gtk.CellRendererPixbuf()
-        renderer.set_property("xpad", 10)
-        renderer.set_property("ypad", 5)
-
-        text_renderer = Gtk.CellRendererText()
-        text_renderer.set_property("ellipsize", Pango.EllipsizeMode.END)
-
-        # Duration renderer (right-aligned)
-        duration_renderer = Gtk.CellRendererText()
-        duration_renderer.set_property("xalign", 1.0)  # Right-align
-        duration_renderer.set_property("yalign", 0.5)  # Vertically center
-        duration_renderer.set_property("xpad", 10)     # Add padding
-
-        column = Gtk.TreeViewColumn("Audio Files")
-        column.pack_start(renderer, False)
-        column.add_attribute(renderer, "pixbuf", 0)
+        # Create a list store for the files. Rows are lightweight TrackItems;
+        # widgets only exist for the rows on screen.
+        self.list_store = Gio.ListStore(item_type=TrackItem)
 
-        column.pack_start(text_renderer, True)
-        column.set_cell_data_func(text_renderer, self._render_metadata)
+        # Themed icons for folders and tracks without art, shared by all rows
+        self.icon_cache = get_icon_cache()
+        self.icon_cache.connect_theme_changed(self._on_icon_theme_changed)
+        self.bound_rows = set()
 
-        # Add duration renderer
-        column.pack_end(duration_renderer, False)
-        column.add_attribute(duration_renderer, "text", 5)  # Duration is at index 5
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_row_setup)
+        factory.connect("bind", self._on_row_bind)
+        factory.connect("unbind", self._on_row_unbind)
 
-        column.set_expand(True)
-        self.tree_view.append_column(column)
+        # Create a list view for the file list
+        self.selection = Gtk.SingleSelection(model=self.list_store)
+        self.list_view = Gtk.ListView(model=self.selection, factory=factory)
 
-        scrolled.set_child(self.tree_view)
+        scrolled.set_child(self.list_view)
         self.append(scrolled)
 
         # Current folder and playlist
@@ -82,78 +150,117 @@ class FileList(Gtk.Box):
         self.playlist = []
         self.currently_playing = None
 
-    def _create_default_icon(self):
-        """Create a default album art icon."""
-        # Create a default icon (music note or similar)
-        icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-
-        # Print available icon theme paths for debugging
-        print(f"Default icon - Icon theme search paths: {icon_theme.get_search_path()}")
-
-        # Check if the icon exists in the theme
-        icon_name = "audio-x-generic"
-        has_icon = icon_theme.has_icon(icon_name)
-        print(f"Default icon - Icon {icon_name} exists in theme: {has_icon}")
-
-        try:
-            icon = icon_theme.lookup_icon(icon_name, None, 32, 1, Gtk.TextDirection.NONE, 0)
-
-            # In GTK 4, IconPaintable doesn't have load_icon method
-            pixbuf = None
-
-            # Try to get the pixbuf using the icon's storage type
-            if hasattr(icon, 'get_file'):
-                file = icon.get_file()
-                if file:
-                    path = file.get_path()
-                    if path:
-                        pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
-
-            # If we couldn't get the pixbuf from the file, try other methods
-            if pixbuf is None and hasattr(icon, 'get_paintable'):
-                paintable = icon.get_paintable()
-                # Convert paintable to pixbuf if possible
-                # This would require additional code
-
-            # If we still don't have a pixbuf, try the old method
-            if pixbuf is None and hasattr(icon, 'load_icon'):
-                pixbuf = icon.load_icon()
-
-            if pixbuf is not None:
-                print(f"Default icon - Successfully loaded icon: {icon_name}")
-                return pixbuf
-            else:
-                raise Exception("Could not convert icon to pixbuf")
-        except Exception as e:
-            print(f"Default icon - Failed to load icon: {icon_name}, error: {e}")
-            # Fallback if icon not found
-            pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, 32, 32)
-            pixbuf.fill(0x33333399)  # Dark gray with some transparency
-            return pixbuf
-
-    def _render_metadata(self, column, cell, model, iter, data):
-        """Custom renderer for displaying metadata."""
-        artist = model.get_value(iter, 1)
-        title = model.get_value(iter, 2)
-        is_playing = model.get_value(iter, 4)
-
-        # Check if this is the parent directory entry
-        if title == "..":
-            # For parent directory, make it visually distinct
-            text = f'<span weight="bold" size="medium">..</span>'
-            cell.set_property("xalign", 0.0)  # Left align horizontally
-        # Check if this is a folder (empty artist field)
-        elif not artist:
-            # For folders, left align horizontally but keep centered vertically
+        # Background folder scanning; row_index maps file paths to positions
+        self.scanner = FolderScanner(sniff=load_setting("sniff_audio_content", False))
+        self.row_index = {}
+
+        # Watches the current folder so changes are applied row by row
+        self.monitor = None
+        self.pending_changes = {}  # path -> "added", "removed" or "changed"
+        self.change_timeout_id = None
+        self.playlist_changed_callback = None
+
+        # Rows are sorted again once loaded metadata or a listing that was
+        # sorted by another mode puts them out of order
+        self.listing_sort_mode = self.sort_mode
+        self.sort_timeout_id = None
+
+    def _on_row_setup(self, factory, list_item):
+        """Create the widgets for a row."""
+        row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+
+        row.image = Gtk.Image()
+        row.image.set_pixel_size(32)
+        row.image.set_margin_start(10)
+        row.image.set_margin_end(10)
+        row.image.set_margin_top(5)
+        row.image.set_margin_bottom(5)
+        row.append(row.image)
+
+        row.label = Gtk.Label()
+        row.label.set_ellipsize(Pango.EllipsizeMode.END)
+        row.label.set_xalign(0.0)  # Left align
+        row.label.set_hexpand(True)
+        row.append(row.label)
+
+        # Duration label (right-aligned)
+        row.duration_label = Gtk.Label()
+        row.duration_label.set_xalign(1.0)
+        row.duration_label.set_margin_start(10)
+        row.duration_label.set_margin_end(10)
+        row.append(row.duration_label)
+
+        list_item.set_child(row)
+
+    def _on_row_bind(self, factory, list_item):
+        """Show an item in a row and load its metadata if needed."""
+        row = list_item.get_child()
+        item = list_item.get_item()
+
+        row.item = item
+        row.handler_id = item.connect("notify", self._on_item_changed, row)
+        item.bound = True
+        self.bound_rows.add(row)
+        self._update_row(row, item)
+
+        # Only rows that are actually visible load metadata and art
+        if item.kind == "audio":
+            if not item.validated or (item.track.cover_ref and item.art is None):
+                self.scanner.request_track(item.path, self._on_track_scanned)
+
+    def _on_row_unbind(self, factory, list_item):
+        """Release the row's item once it scrolls out of view."""
+        row = list_item.get_child()
+        item = row.item
+
+        item.disconnect(row.handler_id)
+        item.bound = False
+        row.item = None
+        self.bound_rows.discard(row)
+
+        # Drop album art and pending loads; they are requested again when the
+        # row comes back into view
+        if item.kind == "audio":
+            item.art = None
+            self.scanner.release_track(item.path)
+
+    def _on_item_changed(self, item, pspec, row):
+        """Refresh a row when its item changes."""
+        self._update_row(row, item)
+
+    def _on_icon_theme_changed(self):
+        """Redraw visible rows with icons from the new theme."""
+        for row in self.bound_rows:
+            self._update_row(row, row.item)
+
+    def _update_row(self, row, item):
+        """Update a row's widgets from its item."""
+        if item.art is not None:
+            row.image.set_from_pixbuf(item.art)
+        else:
+            role = "track" if item.kind == "audio" else item.kind
+            row.image.set_from_paintable(self.icon_cache.get(role, row.get_scale_factor()))
+        row.label.set_markup(self._get_row_markup(item))
+        row.duration_label.set_text(item.duration)
+
+    def _get_row_markup(self, item):
+        """Get the markup for displaying an item's metadata."""
+        title = GLib.markup_escape_text(item.title)
+
+        # Check if this is the parent directory or a folder
+        if item.kind != "audio":
+            # For folders, make them visually distinct
             text = f'<span weight="bold" size="medium">{title}</span>'
-            cell.set_property("xalign", 0.0)  # Left align horizontally
+        elif item.track is None:
+            # Metadata not loaded yet, show the file name
+            text = f"…\n<b>{title}</b>"
         else:
             # For audio files, format with artist on first line and title on second
+            artist = GLib.markup_escape_text(item.artist)
             text = f"{artist}\n<b>{title}</b>"
-            cell.set_property("xalign", 0.0)  # Left align
 
         # If this is the currently playing file, highlight it with system accent color
-        if is_playing:
+        if item.is_playing:
             # Get the accent color from the current theme
             style_manager = Adw.StyleManager.get_default()
             if style_manager.get_dark():
@@ -165,31 +272,36 @@ class FileList(Gtk.Box):
 
             text = f'<span foreground="{accent_color}">{text}</span>'
 
-        cell.set_property("markup", text)
-        cell.set_property("ypad", 5)
+        return text
 
     def set_file_activated_callback(self, callback):
         """Set callback for when a file is activated."""
-        self.tree_view.connect("row-activated", self._on_file_activated, callback)
+        self.list_view.connect("activate", self._on_file_activated, callback)
 
-    def _on_file_activated(self, tree_view, path, column, callback):
+    def _on_file_activated(self, list_view, position, callback):
         """Handle file activation."""
-        model = tree_view.get_model()
-        iter = model.get_iter(path)
-        file_path = model.get_value(iter, 3)  # Full path is at index 3
+        item = self.list_store.get_item(position)
+        if item is None:
+            return
 
-        # Determine file type using the get_file_type function
-        file_type = get_file_type(file_path)
-
-        callback(file_path, file_type)
+        callback(item.path, ROW_FILE_TYPES[item.kind])
 
     def update_file_list(self, folder_path):
         """Update the file list with files from the specified folder."""
+        # Navigating to a folder ends any search
+        if self.search_text:
+            self.search_text = ""
+            self.search_entry.set_text("")
+
         self.current_folder = folder_path
-        self.list_store.clear()
+        self.list_store.remove_all()
+        if self.sort_timeout_id is not None:
+            GLib.source_remove(self.sort_timeout_id)
+            self.sort_timeout_id = None
 
         # Clear the playlist
         self.playlist = []
+        self.row_index = {}
 
         # Update the folder title
         folder_name = os.path.basename(folder_path) or "Root"
@@ -198,175 +310,332 @@ class FileList(Gtk.Box):
         # Add parent directory entry if not at root
         parent_dir = os.path.dirname(folder_path)
         if parent_dir and parent_dir != folder_path:
-            # Try to load a folder-up icon
-            folder_up_icon = None
-
-            # Try different system folder-up icon names
-            icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-            for icon_name in ["go-up", "folder-up", "up", "stock_up", "gtk-go-up"]:
-                try:
-                    icon = icon_theme.lookup_icon(icon_name, None, 32, 1, Gtk.TextDirection.NONE, 0)
-
-                    # Try to get the pixbuf using the icon's storage type
-                    if hasattr(icon, 'get_file'):
-                        file = icon.get_file()
-                        if file:
-                            path = file.get_path()
-                            if path:
-                                folder_up_icon = GdkPixbuf.Pixbuf.new_from_file(path)
-
-                    # If we couldn't get the pixbuf from the file, try other methods
-                    if folder_up_icon is None and hasattr(icon, 'get_paintable'):
-                        paintable = icon.get_paintable()
-                        # Convert paintable to pixbuf if possible
-                        # This would require additional code
-
-                    # If we still don't have a folder_up_icon, try the old method
-                    if folder_up_icon is None and hasattr(icon, 'load_icon'):
-                        folder_up_icon = icon.load_icon()
-
-                    if folder_up_icon is not None:
-                        print(f"Successfully loaded up icon: {icon_name}")
-                        break  # Found an icon, stop trying
-                except Exception as e:
-                    print(f"Failed to load up icon: {icon_name}, error: {e}")
-                    continue
-
-            # If no icon found, create a simple up arrow icon
-            if folder_up_icon is None:
-                folder_up_icon = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, 32, 32)
-                folder_up_icon.fill(0x3584E499)  # Blue color with some transparency
-
-            # Add to list store with parent directory metadata
-            self.list_store.append([folder_up_icon, "", "..", parent_dir, False, ""])
-
-        try:
-            # Collect folders and audio files separately
+            self.list_store.append(TrackItem(kind="parent", path=parent_dir, title=".."))
+
+        # List the folder in the background; metadata is loaded per visible row
+        self.listing_sort_mode = self.sort_mode
+        self.scanner.scan(folder_path, self._on_folder_listed, self.sort_mode)
+        self._watch_folder(folder_path)
+
+    def _on_folder_listed(self, folders, audio_files):
+        """Add rows for a batch of the folder listing as soon as it is available."""
+        items = []
+
+        # Skip anything the folder monitor added before the listing got here
+        folders = [(item, full_path) for item, full_path in folders
+                   if full_path not in self.row_index]
+        if folders and self.playlist:
+            # The monitor also added audio rows, which must stay after the folders
+            for item, full_path in folders:
+                self.list_store.insert(self._get_folder_position(item),
+                                       TrackItem(kind="folder", path=full_path, title=item))
+            self._reindex()
             folders = []
-            audio_files = []
-
-            # List all files in the current folder
-            for item in os.listdir(folder_path):
-                full_path = os.path.join(folder_path, item)
 
-                # Skip hidden files
-                if item.startswith('.'):
-                    continue
-
-                # Get file type
-                file_type = get_file_type(full_path)
-
-                # Collect folders
-                if file_type == "Folder":
-                    folders.append((item, full_path))
-                # Collect audio files
-                elif file_type == "Audio":
-                    audio_files.append((item, full_path))
-
-            # Sort folders alphabetically
-            folders.sort(key=lambda x: x[0].lower())
+        position = self.list_store.get_n_items()
+
+        # Process folders
+        for item, full_path in folders:
+            self.row_index[full_path] = position + len(items)
+            items.append(TrackItem(kind="folder", path=full_path, title=item))
+
+        # Add audio files straight away, already sorted by the scanner. Rows
+        # show what the cache last knew about the file; it is checked against
+        # the file once the row becomes visible.
+        for item, full_path, cached in audio_files:
+            if full_path in self.row_index:
+                continue
+
+            # Add audio files to playlist
+            self.playlist.append(full_path)
+
+            # Check if this is the currently playing file
+            is_playing = (full_path == self.currently_playing)
+
+            self.row_index[full_path] = position + len(items)
+            track_item = TrackItem(kind="audio", path=full_path, title=item, is_playing=is_playing)
+            if cached is not None:
+                track_item.set_track(cached, validated=False)
+            items.append(track_item)
+
+        # Insert the whole batch at once
+        with tracing.span("insert_rows", "ui", rows=len(items)):
+            self.list_store.splice(position, 0, items)
+
+        # The scanner sorted this batch by the mode the scan started with
+        if self.sort_mode != self.listing_sort_mode:
+            self._schedule_sort()
+
+    def _on_track_scanned(self, track, album_art):
+        """Fill in a file's row once its metadata has been loaded."""
+        item = self._get_item(track.path)
+        if item is None:
+            return
+
+        old_key = item.get_sort_key(self.sort_mode)
+        item.set_track(track, validated=True)
+        if item.get_sort_key(self.sort_mode) != old_key:
+            # E.g. its track number is known now, where the file name was used before
+            self._schedule_sort()
+        # Art is only kept while the row is visible
+        if item.bound:
+            item.art = album_art
+
+    def _get_item(self, file_path):
+        """Get the list item for a file in the current folder, or None."""
+        position = self.row_index.get(file_path)
+        if position is None:
+            return None
+        return self.list_store.get_item(position)
+
+    def get_cached_track(self, file_path):
+        """Get the CachedTrack the scanner loaded for a file's row, or None if it hasn't yet."""
+        item = self._get_item(file_path)
+        return item.track if item is not None else None
+
+    def set_playlist_changed_callback(self, callback):
+        """Set callback(old_playlist) for when files are added to or removed from the playlist."""
+        self.playlist_changed_callback = callback
+
+    def remove_file(self, file_path):
+        """Remove a file's row straight away, e.g. after deleting it."""
+        self._apply_changes({file_path: "removed"})
+
+    def _on_search_changed(self, entry):
+        """Show search results as the user types, or the folder again once the entry is cleared."""
+        text = entry.get_text().strip()
+        if text == self.search_text:
+            return
+        self.search_text = text
+
+        if not text:
+            if self.current_folder:
+                self.update_file_list(self.current_folder)
+            return
+
+        self.list_store.remove_all()
+        self.playlist = []
+        self.row_index = {}
+        self._stop_watching()
+
+        self.folder_title.set_markup(f"<b>Search: {GLib.markup_escape_text(text)}</b>")
+
+        # Results come from the catalog, no folder is walked
+        self.scanner.search(text, self._on_search_results)
+
+    def _on_search_results(self, tracks):
+        """Add a batch of search results."""
+        items = []
+        position = self.list_store.get_n_items()
+        for track in tracks:
+            if track.path in self.row_index:
+                continue
+
+            item = TrackItem(kind="audio", path=track.path,
+                             is_playing=(track.path == self.currently_playing))
+            item.set_track(track, validated=False)
+
+            self.playlist.append(track.path)
+            self.row_index[track.path] = position + len(items)
+            items.append(item)
+
+        with tracing.span("insert_rows", "ui", rows=len(items)):
+            self.list_store.splice(position, 0, items)
+        self._sort_items()
+
+    def _on_sort_mode_changed(self, dropdown, pspec):
+        """Re-sort the list when another sort mode is picked."""
+        mode = SORT_MODE_LABELS[dropdown.get_selected()][0]
+        if mode == self.sort_mode:
+            return
+        self.sort_mode = mode
+        save_setting("sort_mode", mode)
+        self._sort_items()
+
+    def _schedule_sort(self):
+        """Sort the rows shortly, once after a burst of changes."""
+        if self.sort_timeout_id is None:
+            self.sort_timeout_id = GLib.timeout_add(SORT_DEBOUNCE_MS, self._on_sort_timeout)
+
+    def _on_sort_timeout(self):
+        """Sort the rows after loaded metadata or listing batches changed their order."""
+        self.sort_timeout_id = None
+        self._sort_items()
+        return False
+
+    def _sort_items(self):
+        """Sort the audio rows by the current sort mode and report the new playlist order."""
+        old_playlist = list(self.playlist)
+        if self._sort_audio_rows() and self.playlist_changed_callback:
+            self.playlist_changed_callback(old_playlist)
+
+    def _sort_audio_rows(self):
+        """Sort the audio rows by the current sort mode, keeping folders first.
+
+        Returns:
+            True if rows were moved
+        """
+        n_items = self.list_store.get_n_items()
+        start = 0
+        while start < n_items and self.list_store.get_item(start).kind != "audio":
+            start += 1
+
+        items = [self.list_store.get_item(position) for position in range(start, n_items)]
+        sorted_items = sorted(items, key=lambda item: item.get_sort_key(self.sort_mode))
+        if sorted_items == items:
+            return False
+
+        self.list_store.splice(start, len(items), sorted_items)
+        self._reindex()
+        return True
+
+    def _stop_watching(self):
+        """Stop monitoring the current folder and drop pending changes."""
+        if self.monitor is not None:
+            self.monitor.cancel()
+            self.monitor = None
+        if self.change_timeout_id is not None:
+            GLib.source_remove(self.change_timeout_id)
+            self.change_timeout_id = None
+        self.pending_changes = {}
+
+    def _watch_folder(self, folder_path):
+        """Start monitoring a folder, replacing the previous monitor."""
+        self._stop_watching()
 
-            # Process folders
-            for item, full_path in folders:
-                # Try to load a folder icon
-                folder_icon = None
-
-                # Approach 1: Use icon theme with specific parameters
-                icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-
-                # Try different system folder icon names with specific parameters
-                for icon_name in ["folder", "folder-symbolic", "system-file-manager", "inode-directory", "gtk-directory", "user-home"]:
-                    try:
-                        # Use the same parameters as in _create_default_icon which works
-                        icon = icon_theme.lookup_icon(icon_name, None, 32, 1, Gtk.TextDirection.NONE, 0)
-
-                        # In GTK 4, IconPaintable doesn't have load_icon method
-                        # Initialize folder_icon for this attempt
-                        icon_folder_icon = None
-
-                        # Try to get the pixbuf using the icon's storage type
-                        if hasattr(icon, 'get_file'):
-                            file = icon.get_file()
-                            if file:
-                                path = file.get_path()
-                                if path:
-                                    icon_folder_icon = GdkPixbuf.Pixbuf.new_from_file(path)
-
-                        # If we couldn't get the pixbuf from the file, try other methods
-                        if icon_folder_icon is None and hasattr(icon, 'get_paintable'):
-                            paintable = icon.get_paintable()
-                            # Convert paintable to pixbuf if possible
-                            # This would require additional code
-
-                        # If we still don't have a folder_icon, try the old method
-                        if icon_folder_icon is None and hasattr(icon, 'load_icon'):
-                            icon_folder_icon = icon.load_icon()
-
-                        # If we got an icon, use it
-                        if icon_folder_icon is not None:
-                            folder_icon = icon_folder_icon
-
-                        if folder_icon is not None:
-                            print(f"Successfully loaded icon: {icon_name}")
-                            break  # Found an icon, stop trying
-                    except Exception as e:
-                        print(f"Failed to load icon: {icon_name}, error: {e}")
-                        continue
-
-                # Approach 2: Try common locations for folder icons
-                if folder_icon is None:
-                    common_icon_paths = [
-                        "/usr/share/icons/hicolor/32x32/places/folder.png",
-                        "/usr/share/icons/Adwaita/32x32/places/folder.png",
-                        "/usr/share/icons/gnome/32x32/places/folder.png",
-                        "/usr/share/icons/default/32x32/places/folder.png"
-                    ]
-
-                    for path in common_icon_paths:
-                        if os.path.exists(path):
-                            try:
-                                folder_icon = GdkPixbuf.Pixbuf.new_from_file(path)
-                                print(f"Successfully loaded folder icon from: {path}")
-                                break
-                            except Exception as e:
-                                print(f"Failed to load folder icon from {path}: {e}")
-
-                # Approach 3: Create a simple folder icon
-                if folder_icon is None:
-                    # Create a simple folder icon (yellow rectangle)
-                    folder_icon = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, 32, 32)
-                    folder_icon.fill(0xFFD70099)  # Gold color with some transparency
-
-                # Add to list store with folder metadata (empty duration for folders)
-                # Use empty string for artist to not display "Folder" text
-                self.list_store.append([folder_icon, "", item, full_path, False, ""])
-
-            # Process audio files
-            for item, full_path in audio_files:
-                # Add audio files to playlist
-                self.playlist.append(full_path)
-
-                # Get album art
-                album_art = extract_album_art(full_path)
-                if album_art is None:
-                    album_art = self.default_icon
-
-                # Get metadata
-                metadata = get_audio_metadata(full_path)
-                artist = metadata['artist']
-                title = metadata['title']
-
-                # Get duration
-                duration_seconds = get_audio_duration(full_path)
-                duration_str = format_duration(duration_seconds)
-
-                # Check if this is the currently playing file
-                is_playing = (full_path == self.currently_playing)
-
-                # Add to list store
-                self.list_store.append([album_art, artist, title, full_path, is_playing, duration_str])
-        except Exception as e:
-            print(f"Error listing directory: {e}")
+        try:
+            folder = Gio.File.new_for_path(folder_path)
+            self.monitor = folder.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            self.monitor.connect("changed", self._on_folder_changed)
+        except GLib.Error as e:
+            print(f"Error monitoring directory: {e}")
+
+    def _on_folder_changed(self, monitor, file, other_file, event_type):
+        """Collect folder change events; they are applied together after a short delay."""
+        path = file.get_path()
+
+        if event_type in (Gio.FileMonitorEvent.CREATED, Gio.FileMonitorEvent.MOVED_IN):
+            self.pending_changes[path] = "added"
+        elif event_type in (Gio.FileMonitorEvent.DELETED, Gio.FileMonitorEvent.MOVED_OUT):
+            self.pending_changes[path] = "removed"
+        elif event_type == Gio.FileMonitorEvent.RENAMED:
+            self.pending_changes[path] = "removed"
+            self.pending_changes[other_file.get_path()] = "added"
+        elif event_type == Gio.FileMonitorEvent.CHANGES_DONE_HINT:
+            # A new file that is still being written stays "added"
+            self.pending_changes.setdefault(path, "changed")
+        else:
+            return
+
+        if self.change_timeout_id is None:
+            self.change_timeout_id = GLib.timeout_add(CHANGE_DEBOUNCE_MS, self._on_change_timeout)
+
+    def _on_change_timeout(self):
+        """Apply the folder changes collected since the first event."""
+        self.change_timeout_id = None
+        changes = self.pending_changes
+        self.pending_changes = {}
+        self._apply_changes(changes)
+        return False
+
+    def _apply_changes(self, changes):
+        """Insert, remove and refresh rows for the given changes.
+
+        Args:
+            changes: A dictionary mapping paths to "added", "removed" or "changed"
+        """
+        old_playlist = list(self.playlist)
+
+        # Skip hidden files
+        changes = {path: change for path, change in changes.items()
+                   if not os.path.basename(path).startswith('.')}
+
+        # Files replaced or rewritten in place keep their row, while positions
+        # are still valid
+        for path, change in changes.items():
+            if change != "removed" and path in self.row_index:
+                self._refresh_item(self._get_item(path))
+
+        # Remove from the end so earlier positions stay valid
+        removed = [path for path, change in changes.items() if change == "removed"]
+        removed_folders = {path for path in removed
+                           if path in self.row_index and self._get_item(path).kind == "folder"}
+        positions = [self.row_index.pop(path) for path in removed if path in self.row_index]
+        for position in sorted(positions, reverse=True):
+            self.list_store.remove(position)
+        for path in removed:
+            if path in removed_folders:
+                # Drop the catalog's tracks and directories below it as well
+                get_metadata_cache().forget_directory(path)
+            else:
+                get_metadata_cache().forget(path)
+
+        added = 0
+        for path, change in changes.items():
+            if change != "added" or path in self.row_index:
+                continue
+
+            file_type = get_file_type(path)
+            if file_type == "Folder":
+                item = TrackItem(kind="folder", path=path, title=os.path.basename(path))
+                self.list_store.insert(self._get_folder_position(item.title), item)
+            elif file_type == "Audio":
+                item = TrackItem(kind="audio", path=path, title=os.path.basename(path),
+                                 is_playing=(path == self.currently_playing))
+                self.list_store.append(item)
+            else:
+                continue
+            # Mark as present; the position is fixed up by _reindex below
+            self.row_index[path] = -1
+            added += 1
+
+        if not positions and not added:
+            return
+
+        self._reindex()
+        if added:
+            # New files were appended; move them to their place in the sort order
+            self._sort_audio_rows()
+        if self.playlist != old_playlist and self.playlist_changed_callback:
+            self.playlist_changed_callback(old_playlist)
+
+    def _refresh_item(self, item):
+        """Drop an audio item's metadata so it is loaded again from the changed file."""
+        if item is None or item.kind != "audio":
+            return
+
+        item.track = None
+        item.validated = False
+        item.sort_keys = {}
+        item.freeze_notify()
+        item.artist = ""
+        item.title = os.path.basename(item.path)
+        item.duration = ""
+        item.art = None
+        item.thaw_notify()
+
+        if item.bound:
+            self.scanner.request_track(item.path, self._on_track_scanned)
+
+    def _get_folder_position(self, name):
+        """Get the position at which a folder keeps the folder rows sorted by name."""
+        for position in range(self.list_store.get_n_items()):
+            item = self.list_store.get_item(position)
+            if item.kind == "audio" or (item.kind == "folder" and item.title.lower() > name.lower()):
+                return position
+        return self.list_store.get_n_items()
+
+    def _reindex(self):
+        """Rebuild row positions and the playlist after rows were inserted or removed."""
+        self.row_index = {}
+        self.playlist = []
+        for position in range(self.list_store.get_n_items()):
+            item = self.list_store.get_item(position)
+            if item.kind == "parent":
+                continue
+            self.row_index[item.path] = position
+            if item.kind == "audio":
+                self.playlist.append(item.path)
 
     def get_playlist(self):
         """Get the current playlist."""
@@ -387,20 +656,21 @@ class FileList(Gtk.Box):
 
     def set_currently_playing(self, file_path):
         """Set the currently playing file and update the UI."""
+        previous = self.currently_playing
         self.currently_playing = file_path
 
-        # Update the list store to highlight the currently playing file
-        for i, row in enumerate(self.list_store):
-            path = row[3]  # Full path is at index 3
-            row[4] = (path == file_path)  # Update is_playing flag
-
-        # Ensure the currently playing file is visible
-        if file_path:
-            for i, row in enumerate(self.list_store):
-                if row[3] == file_path:
-                    path = Gtk.TreePath.new_from_indices([i])
-                    self.tree_view.scroll_to_cell(path, None, True, 0.5, 0.5)
-                    break
+        # Only the previous and new rows need their highlight updated
+        previous_item = self._get_item(previous)
+        if previous_item is not None:
+            previous_item.is_playing = False
+
+        item = self._get_item(file_path)
+        if item is not None:
+            item.is_playing = True
+
+            # Ensure the currently playing file is visible (GTK 4.12+)
+            if hasattr(self.list_view, 'scroll_to'):
+                self.list_view.scroll_to(self.row_index[file_path], Gtk.ListScrollFlags.NONE, None)
 
 # This allows the file to be imported without running any code
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk, GLib
 
+from utils import list_directory
+
 class FolderSelector(Gtk.Box):
     """UI component for selecting folders."""
 
@@ -62,10 +64,9 @@ class FolderSelector(Gtk.Box):
 
         # Add common root directories
         try:
-            for item in os.listdir("/"):
-                full_path = os.path.join("/", item)
-                if os.path.isdir(full_path) and not item.startswith('.'):
-                    self.file_store.append(root_iter, [item, full_path])
+            folders, audio_files = list_directory("/")
+            for item, full_path in folders:
+                self.file_store.append(root_iter, [item, full_path])
         except PermissionError:
             pass  # Skip directories we can't access
 
@@ -81,17 +82,14 @@ class FolderSelector(Gtk.Box):
             return
 
         try:
-            for item in os.listdir(parent_path):
-                if item.startswith('.'):
-                    continue
-
-                full_path = os.path.join(parent_path, item)
-                if os.path.isdir(full_path):
-                    child_iter = self.file_store.append(parent_iter, [item, full_path])
-                    # Add subdirectories recursively
-                    self.add_subdirectories(child_iter, full_path, max_depth, current_depth + 1)
+            folders, audio_files = list_directory(parent_path)
         except (PermissionError, FileNotFoundError):
-            pass  # Skip directories we can't access
+            return  # Skip directories we can't access
+
+        for item, full_path in folders:
+            child_iter = self.file_store.append(parent_iter, [item, full_path])
+            # Add subdirectories recursively
+            self.add_subdirectories(child_iter, full_path, max_depth, current_depth + 1)
 
     def set_folder_selected_callback(self, callback):
         """Set callback for when a folder is selected."""
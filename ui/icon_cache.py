@@ -0,0 +1,70 @@
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, Gdk
+
+# Icon names tried for each role, in order of preference
+ICON_ROLES = {
+    "folder": ["folder", "inode-directory", "folder-symbolic"],
+    "parent": ["go-up", "folder-up", "go-up-symbolic"],
+    "track": ["audio-x-generic", "audio-x-generic-symbolic"],
+}
+
+class IconCache:
+    """Resolves themed icons once per role and scale and shares them between rows."""
+
+    def __init__(self, display=None, size=32):
+        """
+        Initialize the icon cache.
+
+        Args:
+            display: The Gdk.Display whose icon theme is used (default display if None)
+            size: Icon size in pixels
+        """
+        self.size = size
+        self.icons = {}  # (role, scale) -> Gdk.Paintable
+        self.theme_changed_callbacks = []
+
+        self.icon_theme = Gtk.IconTheme.get_for_display(display or Gdk.Display.get_default())
+        self.icon_theme.connect("changed", self._on_theme_changed)
+
+    def get(self, role, scale=1):
+        """
+        Get the icon for a role.
+
+        Args:
+            role: One of the keys of ICON_ROLES
+            scale: Scale factor of the widget the icon is shown in
+
+        Returns:
+            A Gdk.Paintable shared by every caller asking for the same role and scale
+        """
+        key = (role, scale)
+        icon = self.icons.get(key)
+        if icon is None:
+            # A single lookup walks the fallback names; if none of them exist
+            # the theme returns its "missing image" icon
+            names = ICON_ROLES[role]
+            icon = self.icon_theme.lookup_icon(names[0], names[1:], self.size, scale,
+                                               Gtk.TextDirection.NONE, 0)
+            self.icons[key] = icon
+        return icon
+
+    def connect_theme_changed(self, callback):
+        """Call callback() after the icon theme changes and cached icons are dropped."""
+        self.theme_changed_callbacks.append(callback)
+
+    def _on_theme_changed(self, icon_theme):
+        """Drop every resolved icon so the next lookup uses the new theme."""
+        self.icons.clear()
+        for callback in self.theme_changed_callbacks:
+            callback()
+
+
+_icon_cache = None
+
+def get_icon_cache():
+    """Get the IconCache shared across the UI, creating it on first use."""
+    global _icon_cache
+    if _icon_cache is None:
+        _icon_cache = IconCache()
+    return _icon_cache
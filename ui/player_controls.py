@@ -1,7 +1,7 @@
 import os
 import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, Gdk
 
 class PlayerControls(Gtk.Box):
     """UI component for player controls."""
@@ -96,6 +96,18 @@ class PlayerControls(Gtk.Box):
         self.progress_bar.set_margin_top(10)
         info_box.append(self.progress_bar)
 
+        # Tell dragging the slider apart from clicks and key presses, so
+        # scrubbing can seek fast and letting go seeks accurately. The
+        # slider's own drag gesture claims the pointer, so the events are
+        # watched in the capture phase, before it sees them.
+        self.dragging = False
+        self.scrub_value = None  # Last position the slider was dragged to
+        self.progress_callback = None
+        pointer_controller = Gtk.EventControllerLegacy()
+        pointer_controller.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        pointer_controller.connect("event", self._on_progress_bar_event)
+        self.progress_bar.add_controller(pointer_controller)
+
         content_box.append(info_box)
         self.append(content_box)
 
@@ -104,7 +116,8 @@ class PlayerControls(Gtk.Box):
         self.play_button.connect("clicked", lambda button: play_callback())
         self.prev_button.connect("clicked", lambda button: prev_callback())
         self.next_button.connect("clicked", lambda button: next_callback())
-        self.progress_bar.connect("change-value", lambda scale, scroll_type, value: progress_callback(value))
+        self.progress_callback = progress_callback
+        self.progress_bar.connect("change-value", self._on_progress_changed)
         if shuffle_callback:
             self.shuffle_button.connect("toggled", lambda button: shuffle_callback(button.get_active()))
         if trash_callback:
@@ -126,8 +139,34 @@ class PlayerControls(Gtk.Box):
 
         self.song_info.set_text(info)
 
+    def _on_progress_changed(self, scale, scroll_type, value):
+        """Seek when the slider is moved, telling the callback whether it is being dragged."""
+        if self.dragging:
+            self.scrub_value = value
+            # Follow the pointer; the player's position catches up when the seeks complete
+            scale.set_value(value)
+        return self.progress_callback(value, self.dragging)
+
+    def _on_progress_bar_event(self, controller, event):
+        """Track whether the slider is being dragged, seeking accurately on release."""
+        event_type = event.get_event_type()
+        if event_type in (Gdk.EventType.BUTTON_PRESS, Gdk.EventType.TOUCH_BEGIN):
+            self.dragging = True
+            self.scrub_value = None
+        elif event_type in (Gdk.EventType.BUTTON_RELEASE, Gdk.EventType.TOUCH_END,
+                            Gdk.EventType.TOUCH_CANCEL) and self.dragging:
+            self.dragging = False
+            if self.scrub_value is not None and self.progress_callback:
+                self.progress_callback(self.scrub_value, False)
+            self.scrub_value = None
+        # Let the slider handle the event as usual
+        return False
+
     def update_progress(self, position, duration):
         """Update the progress bar."""
+        if self.dragging:
+            # Don't pull the slider away from the pointer
+            return
         if duration > 0:
             self.progress_bar.set_range(0, duration)
             self.progress_bar.set_value(position)
@@ -155,11 +194,16 @@ class PlayerControls(Gtk.Box):
                    If None, a default icon will be used.
         """
         if pixbuf:
-            # Scale the pixbuf to a reasonable size while maintaining aspect ratio
             width = pixbuf.get_width()
             height = pixbuf.get_height()
             max_size = 128
 
+            # Art from the thumbnail cache is already decoded at this size
+            if width <= max_size and height <= max_size:
+                self.album_art.set_from_pixbuf(pixbuf)
+                return
+
+            # Scale the pixbuf to a reasonable size while maintaining aspect ratio
             if width > height:
                 new_width = max_size
                 new_height = int(height * (max_size / width))
@@ -1,22 +1,59 @@
 import os
+import re
+from collections import namedtuple
 import gi
-gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, GdkPixbuf, GLib
+gi.require_version('GdkPixbuf', '2.0')
+gi.require_version('GLib', '2.0')
+from gi.repository import GdkPixbuf, GLib
 import io
+import importlib.util
 
-try:
-    from mutagen import File as MutagenFile
-    from mutagen.id3 import ID3
-    from mutagen.flac import FLAC
-    from mutagen.mp4 import MP4
-    MUTAGEN_AVAILABLE = True
-except ImportError:
-    MUTAGEN_AVAILABLE = False
+import tracing
+from audio_formats import get_audio_formats
+
+# mutagen is only imported once a file actually has to be parsed, so a
+# start with a warm metadata cache doesn't pay for loading it
+MUTAGEN_AVAILABLE = importlib.util.find_spec("mutagen") is not None
+MutagenFile = ID3 = FLAC = MP4 = BitrateMode = None
+
+def _load_mutagen():
+    """Import the mutagen classes used by the tag helpers on first use.
+
+    Returns:
+        True if mutagen is available
+    """
+    global MutagenFile, ID3, FLAC, MP4, BitrateMode
+    if MUTAGEN_AVAILABLE and MutagenFile is None:
+        from mutagen.id3 import ID3
+        from mutagen.flac import FLAC
+        from mutagen.mp4 import MP4
+        from mutagen.mp3 import BitrateMode
+        # Assigned last: other threads treat it as the sign the rest is loaded
+        from mutagen import File as MutagenFile
+    return MUTAGEN_AVAILABLE
+
+# Everything the UI needs to know about a track, gathered from a single
+# mutagen parse. cover_data holds the raw embedded image bytes (or None).
+# duration_exact is False when mutagen could only estimate the duration (or
+# found none), e.g. for VBR MP3s without a Xing header. The ReplayGain
+# values come from the file's tags and are None if it has none.
+TrackInfo = namedtuple('TrackInfo', [
+    'path', 'artist', 'album', 'title', 'track_number', 'disc_number',
+    'duration', 'duration_exact', 'codec', 'bitrate', 'sample_rate', 'channels',
+    'cover_data', 'track_gain', 'track_peak', 'album_gain', 'album_peak',
+])
+
+# Tag names of the ReplayGain values, in TrackInfo order
+REPLAYGAIN_TAGS = ('replaygain_track_gain', 'replaygain_track_peak',
+                   'replaygain_album_gain', 'replaygain_album_peak')
 
 def is_audio_file(filename):
-    """Check if a file is an audio file based on its extension."""
-    ext = os.path.splitext(filename)[1].lower()
-    return ext in ['.mp3', '.wav', '.ogg', '.flac', '.m4a']
+    """Check if a file is an audio file based on its extension.
+
+    The known extensions are those of the formats the installed GStreamer
+    plugins can play.
+    """
+    return get_audio_formats().is_audio_file(filename)
 
 def get_file_type(path):
     """Determine the type of a file (Folder, Audio, or File)."""
@@ -27,6 +64,62 @@ def get_file_type(path):
     else:
         return "File"
 
+@tracing.traced("scan")
+def list_directory(folder_path, sniffer=None):
+    """List the visible folders and audio files in a directory.
+
+    Uses os.scandir so each entry's type comes from the directory listing
+    itself; only symlinks and filesystems that don't report entry types need
+    an extra stat call.
+
+    Args:
+        folder_path: Path to the directory
+        sniffer: Optional callable for recognizing audio files by content,
+                 called once per directory as sniffer(folder_path, candidates)
+                 with (name, full path, stat result) tuples of the files whose
+                 extension is not a known audio one. It returns the (name,
+                 full path) tuples of the candidates that hold audio.
+
+    Returns:
+        A (folders, audio_files) tuple of lists of (name, full path) tuples,
+        with folders sorted alphabetically and audio files in listing order
+
+    Raises:
+        OSError: If the directory cannot be read
+    """
+    folders = []
+    audio_files = []
+    candidates = []
+    audio_formats = get_audio_formats()
+
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            # Skip hidden files
+            if entry.name.startswith('.'):
+                continue
+
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+
+            if is_dir:
+                folders.append((entry.name, entry.path))
+            elif audio_formats.is_audio_file(entry.name):
+                audio_files.append((entry.name, entry.path))
+            elif sniffer is not None and audio_formats.should_sniff(entry.name):
+                try:
+                    candidates.append((entry.name, entry.path, entry.stat()))
+                except OSError:
+                    continue
+
+    if candidates:
+        audio_files.extend(sniffer(folder_path, candidates))
+
+    # Sort folders alphabetically
+    folders.sort(key=lambda x: x[0].lower())
+    return folders, audio_files
+
 def extract_album_art(file_path, size=32):
     """Extract album art from an audio file.
 
@@ -37,7 +130,7 @@ def extract_album_art(file_path, size=32):
     Returns:
         A GdkPixbuf.Pixbuf object if album art is found, None otherwise
     """
-    if not MUTAGEN_AVAILABLE:
+    if not _load_mutagen():
         print("Warning: mutagen library not available. Album art extraction will be disabled.")
         return None
 
@@ -79,9 +172,28 @@ def extract_album_art(file_path, size=32):
 
     return None
 
+def load_cover_pixbuf(cover_data, size=32):
+    """Create a scaled pixbuf from raw cover bytes, e.g. TrackInfo.cover_data.
+
+    Args:
+        cover_data: Raw image data, or None
+        size: Size to scale the image to (default: 32px)
+
+    Returns:
+        A GdkPixbuf.Pixbuf object, or None if there is no usable image
+    """
+    if not cover_data:
+        return None
+    with tracing.span("decode_cover", "art", size=size, bytes=len(cover_data)):
+        return _create_pixbuf_from_data(cover_data, size)
+
 def _create_pixbuf_from_data(image_data, size=32):
     """Create a GdkPixbuf.Pixbuf from image data and resize it.
 
+    The loader is asked for the target size as soon as it knows the image
+    dimensions, so large covers are downscaled while decoding (JPEG decodes
+    at a reduced DCT scale) instead of being materialized at full resolution.
+
     Args:
         image_data: Raw image data
         size: Size to scale the image to (default: 32px)
@@ -91,26 +203,52 @@ def _create_pixbuf_from_data(image_data, size=32):
     """
     try:
         loader = GdkPixbuf.PixbufLoader()
+        loader.connect("size-prepared", _on_loader_size_prepared, size)
         loader.write(image_data)
         loader.close()
         pixbuf = loader.get_pixbuf()
 
-        # Resize the pixbuf while maintaining aspect ratio
-        width = pixbuf.get_width()
-        height = pixbuf.get_height()
-        if width > height:
-            new_width = size
-            new_height = int(height * size / width)
-        else:
-            new_height = size
-            new_width = int(width * size / height)
-
-        scaled_pixbuf = pixbuf.scale_simple(new_width, new_height, GdkPixbuf.InterpType.BILINEAR)
-        return scaled_pixbuf
+        # Not every loader honours set_size exactly; only touch up if needed
+        if max(pixbuf.get_width(), pixbuf.get_height()) == size:
+            return pixbuf
+        return scale_pixbuf(pixbuf, size)
     except Exception as e:
         print(f"Error creating pixbuf: {e}")
         return None
 
+def _on_loader_size_prepared(loader, width, height, size):
+    """Request decoding at the target size, keeping the aspect ratio."""
+    new_width, new_height = fit_size(width, height, size)
+    loader.set_size(new_width, new_height)
+
+def fit_size(width, height, size):
+    """Get the dimensions of an image scaled to fit a square of the given size.
+
+    Args:
+        width: Original width in pixels
+        height: Original height in pixels
+        size: Size of the bounding square in pixels
+
+    Returns:
+        A (width, height) tuple
+    """
+    if width > height:
+        return size, max(1, int(height * size / width))
+    return max(1, int(width * size / height)), size
+
+def scale_pixbuf(pixbuf, size):
+    """Scale a pixbuf to fit a square of the given size, keeping its aspect ratio.
+
+    Args:
+        pixbuf: The GdkPixbuf.Pixbuf to scale
+        size: Size of the bounding square in pixels
+
+    Returns:
+        A scaled GdkPixbuf.Pixbuf object
+    """
+    new_width, new_height = fit_size(pixbuf.get_width(), pixbuf.get_height(), size)
+    return pixbuf.scale_simple(new_width, new_height, GdkPixbuf.InterpType.BILINEAR)
+
 def get_audio_metadata(file_path):
     """Extract metadata from an audio file.
 
@@ -122,7 +260,7 @@ def get_audio_metadata(file_path):
     """
     metadata = {'artist': 'Unknown Artist', 'album': 'Unknown Album', 'title': os.path.basename(file_path)}
 
-    if not MUTAGEN_AVAILABLE:
+    if not _load_mutagen():
         return metadata
 
     try:
@@ -185,7 +323,7 @@ def get_audio_duration(file_path):
     Returns:
         Duration in seconds as a float, or 0 if duration cannot be determined
     """
-    if not MUTAGEN_AVAILABLE:
+    if not _load_mutagen():
         return 0
 
     try:
@@ -203,6 +341,216 @@ def get_audio_duration(file_path):
 
     return 0
 
+def _parse_number(value):
+    """Parse a track/disc number such as '3', '3/12' or (3, 12) into an int."""
+    if isinstance(value, tuple):
+        value = value[0]
+    try:
+        return int(str(value).split('/')[0])
+    except (TypeError, ValueError):
+        return 0
+
+def _first_tag(tags, key):
+    """Return the first value of a tag as a string, or None if it is missing."""
+    if key not in tags:
+        return None
+    value = tags[key]
+    if isinstance(value, list):
+        if not value:
+            return None
+        value = value[0]
+    return str(value)
+
+def _parse_gain(value):
+    """Parse a ReplayGain value such as '-6.52 dB' or '0.988' into a float, or None."""
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    try:
+        return float(str(value).split()[0])
+    except (IndexError, ValueError):
+        return None
+
+def _read_replaygain(tags):
+    """Read the ReplayGain values from a file's tags.
+
+    Returns:
+        A (track gain, track peak, album gain, album peak) tuple; missing
+        values are None
+    """
+    values = {}
+    if isinstance(tags, ID3):
+        for frame in tags.getall('TXXX'):
+            if frame.text:
+                values[frame.desc.lower()] = frame.text[0]
+    else:
+        # Vorbis comments, APEv2 tags and MP4 freeform atoms, which are
+        # named like '----:com.apple.iTunes:replaygain_track_gain'
+        for key, value in tags.items():
+            name = key.lower().rsplit(':', 1)[-1]
+            if name in REPLAYGAIN_TAGS:
+                if isinstance(value, list):
+                    value = value[0] if value else None
+                values[name] = value
+    return tuple(_parse_gain(values[name]) if name in values else None
+                 for name in REPLAYGAIN_TAGS)
+
+@tracing.traced("scan")
+def probe_track(file_path):
+    """Read tags, stream info and cover art from an audio file in one pass.
+
+    The file is opened and parsed by mutagen exactly once, replacing separate
+    calls to extract_album_art, get_audio_metadata and get_audio_duration.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        A TrackInfo record. Missing values fall back to the same defaults as
+        get_audio_metadata, zero for numbers and None for the cover.
+    """
+    artist = 'Unknown Artist'
+    album = 'Unknown Album'
+    title = os.path.basename(file_path)
+    track_number = 0
+    disc_number = 0
+    duration = 0
+    duration_exact = False
+    codec = os.path.splitext(file_path)[1].lower().lstrip('.')
+    bitrate = 0
+    sample_rate = 0
+    channels = 0
+    cover_data = None
+    replaygain = (None, None, None, None)
+
+    if _load_mutagen():
+        try:
+            audio = MutagenFile(file_path)
+        except Exception as e:
+            print(f"Error probing track: {e}")
+            audio = None
+
+        if audio is not None:
+            info = getattr(audio, 'info', None)
+            if info is not None:
+                duration = getattr(info, 'length', 0) or 0
+                bitrate = getattr(info, 'bitrate', 0) or 0
+                sample_rate = getattr(info, 'sample_rate', 0) or 0
+                channels = getattr(info, 'channels', 0) or 0
+                codec = getattr(info, 'codec', None) or type(audio).__name__.lower()
+                # Without a Xing/VBRI header mutagen guesses an MP3's length
+                # from its first frame's bitrate, which is wrong for VBR files
+                duration_exact = (duration > 0 and
+                                  getattr(info, 'bitrate_mode', None) != BitrateMode.UNKNOWN)
+
+            tags = audio.tags
+            if isinstance(tags, ID3):
+                # MP3 (and WAV/AIFF with ID3 chunks)
+                artist = _first_tag(tags, 'TPE1') or artist
+                album = _first_tag(tags, 'TALB') or album
+                title = _first_tag(tags, 'TIT2') or title
+                track_number = _parse_number(_first_tag(tags, 'TRCK'))
+                disc_number = _parse_number(_first_tag(tags, 'TPOS'))
+                pictures = tags.getall('APIC')
+                if pictures:
+                    # Prefer the front cover (type 3) if there is one
+                    front = [p for p in pictures if p.type == 3]
+                    cover_data = (front or pictures)[0].data
+            elif isinstance(audio, MP4):
+                if tags:
+                    artist = _first_tag(tags, '©ART') or artist
+                    album = _first_tag(tags, '©alb') or album
+                    title = _first_tag(tags, '©nam') or title
+                    if tags.get('trkn'):
+                        track_number = _parse_number(tags['trkn'][0])
+                    if tags.get('disk'):
+                        disc_number = _parse_number(tags['disk'][0])
+                    if tags.get('covr'):
+                        cover_data = bytes(tags['covr'][0])
+            elif tags:
+                # Vorbis comments (FLAC, Ogg) and other key/value tag formats
+                artist = _first_tag(tags, 'artist') or artist
+                album = _first_tag(tags, 'album') or album
+                title = _first_tag(tags, 'title') or title
+                track_number = _parse_number(_first_tag(tags, 'tracknumber'))
+                disc_number = _parse_number(_first_tag(tags, 'discnumber'))
+
+            if cover_data is None and getattr(audio, 'pictures', None):
+                cover_data = audio.pictures[0].data
+
+            if tags:
+                replaygain = _read_replaygain(tags)
+
+    return TrackInfo(
+        path=file_path,
+        artist=artist,
+        album=album,
+        title=title,
+        track_number=track_number,
+        disc_number=disc_number,
+        duration=duration,
+        duration_exact=duration_exact,
+        codec=codec,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        channels=channels,
+        cover_data=cover_data,
+        track_gain=replaygain[0],
+        track_peak=replaygain[1],
+        album_gain=replaygain[2],
+        album_peak=replaygain[3],
+    )
+
+# Orders offered for audio files in the file list
+SORT_MODES = ("track", "name", "album", "artist", "duration")
+
+_DIGITS = re.compile(r'\d+')
+
+def natural_sort_key(text):
+    """Get a key that sorts text naturally, e.g. "Track 2" before "Track 10".
+
+    Runs of digits are zero-padded, so the key is a plain string that can be
+    compared directly and stored alongside the metadata.
+
+    Args:
+        text: Text to build the key for, typically a file name
+
+    Returns:
+        A case-insensitive sort key string
+    """
+    return _DIGITS.sub(lambda match: match.group().zfill(12), text.casefold())
+
+def track_sort_key(mode, file_name, track=None):
+    """Get the sort key of an audio file for one of the SORT_MODES.
+
+    Args:
+        mode: One of SORT_MODES
+        file_name: The file's name, used when the metadata is not known yet
+        track: The file's CachedTrack record, or None
+
+    Returns:
+        A tuple that can be compared with the keys of other files
+    """
+    if track is None:
+        name, artist, album, disc, number, duration = natural_sort_key(file_name), "", "", 0, 0, 0
+    else:
+        name = track.sort_name or natural_sort_key(file_name)
+        artist = (track.artist or "").casefold()
+        album = (track.album or "").casefold()
+        disc = track.disc_number or 0
+        number = track.track_number or 0
+        duration = track.duration or 0
+
+    if mode == "name":
+        return (name,)
+    elif mode == "album":
+        return (album, disc, number, name)
+    elif mode == "artist":
+        return (artist, album, disc, number, name)
+    elif mode == "duration":
+        return (duration, name)
+    # "track": album order within a folder
+    return (disc, number, name)
+
 def format_duration(seconds):
     """Format duration in seconds to MM:SS format.
 
@@ -229,6 +577,16 @@ def get_settings_path():
     os.makedirs(config_dir, exist_ok=True)
     return os.path.join(config_dir, "settings.ini")
 
+def get_cache_dir():
+    """Get the path to the application's cache directory.
+
+    Returns:
+        Path to the cache directory, created if it does not exist
+    """
+    cache_dir = os.path.join(GLib.get_user_cache_dir(), "folder-audio-player")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
 def save_setting(key, value):
     """Save a setting to the settings file.
 